@@ -1,57 +1,21 @@
-import sys, os
-import logging
+import time
+# 启动计时从导入其他模块之前开始
+STARTED_AT = time.perf_counter()
+
+import sys
+# 导入计时需要在导入其他模块之前安装
+IMPORT_TIMER = None
+if '--startup-report' in sys.argv:
+    from utils.startup import ImportTimer
+    IMPORT_TIMER = ImportTimer()
+    IMPORT_TIMER.install()
+
+import os
 import argparse
-import wx
-from utils.audio_analyzer import AudioAnalyzer
-from utils.volume_controller import VolumeController
 from utils.config import Config
-from utils.logger import setup_logger
-from utils.gui import MainFrame
-from utils.service_manager import ServiceManager
-
-class OfficeGuardianWorker:
-    """音频均衡器工作类"""
-
-    def __init__(self, audio_analyzer, volume_controller, config, gui=None):
-        self.logger = logging.getLogger('OfficeGuardian.Worker')
-        self.audio_analyzer = audio_analyzer
-        self.volume_controller = volume_controller
-        self.config = config
-        self.gui = gui
-        self.running = False
-
-    def start(self):
-        """开始音频均衡处理"""
-        self.running = True
-        self.audio_analyzer.start_analyzing(callback=self.on_audio_event)
-        self.logger.debug("音频均衡处理已启动")
-
-    def stop(self):
-        """停止音频均衡处理"""
-        self.running = False
-        self.audio_analyzer.stop_analyzing()
-        self.logger.info("音频均衡处理已停止")
-
-    def on_audio_event(self, event_type, current_db):
-        """音频事件回调"""
-        if not self.running:
-            return
-
-        if event_type == "over_max":
-            self.logger.debug(
-                f"响度过高: {current_db:.2f} dB > {self.config.max_db:.2f} dB")
-            new_volume = self.volume_controller.adjust_volume_for_db(
-                current_db, self.config.max_db)
-            if self.gui:
-                wx.CallAfter(self.gui.update_volume, new_volume)
-
-        elif event_type == "under_min":
-            self.logger.debug(
-                f"响度过低: {current_db:.2f} dB < {self.config.min_db:.2f} dB")
-            new_volume = self.volume_controller.adjust_volume_for_db(
-                current_db, self.config.min_db)
-            if self.gui:
-                wx.CallAfter(self.gui.update_volume, new_volume)
+from utils.logger import setup_logger, shutdown_logger
+from utils.startup import StartupTrace
+
 
 def main():
     """程序主入口"""
@@ -59,7 +23,16 @@ def main():
     parser = argparse.ArgumentParser(description='办公室的大盾 - 音频响度均衡器')
     parser.add_argument('--minimized', action='store_true', help='以最小化方式启动')
     parser.add_argument('--service', action='store_true', help='以服务方式启动')
+    parser.add_argument('--headless', action='store_true', help='无界面运行（不加载 wx），Ctrl+C 或 SIGTERM 停止')
+    parser.add_argument('--startup-report', action='store_true', help='启动后打印各阶段和模块导入耗时')
+    parser.add_argument('--control', action='store_true', help='启动本地控制接口（python -m utils.control）')
+    parser.add_argument('--metrics', action='store_true', help='在本机提供 Prometheus 指标（/metrics）')
+    parser.add_argument('--record-trace', action='store_true', help='录制原始采样轨迹（python -m utils.trace 回放）')
+    parser.add_argument('--backend', choices=['pycaw', 'fake'], default='pycaw',
+                        help='音频后端：pycaw（系统音频）或 fake（内存模拟的合成节目，用于冒烟测试）')
     args = parser.parse_args()
+    trace = StartupTrace(STARTED_AT, IMPORT_TIMER)
+    trace.mark("解析参数")
 
     # 获取程序路径
     if getattr(sys, 'frozen', False):
@@ -71,54 +44,93 @@ def main():
 
     # 加载配置
     config = Config(application_path)
+    # 命令行开关只在本次运行中生效，不写入配置文件
+    if args.control:
+        config.override(control_server=True)
+    if args.metrics:
+        config.override(metrics_server=True)
+    if args.record_trace:
+        config.override(trace_record=True)
+    trace.mark("加载配置")
 
     # 设置日志
     logger = setup_logger(config)
     logger.info("音频响度均衡器启动中...")
-
-    # 创建wxPython应用实例
-    app = wx.App()
+    trace.mark("初始化日志")
 
     try:
-        # 创建必要的组件
-        volume_controller = VolumeController(config)
-        audio_analyzer = AudioAnalyzer(config)
-        service_manager = ServiceManager()
-
-        # 创建主窗口
-        frame = MainFrame(None, audio_analyzer, volume_controller, config, service_manager)
-        app.SetTopWindow(frame)
-
-        # 创建工作线程
-        worker = OfficeGuardianWorker(audio_analyzer, volume_controller, config, frame)
-        frame.set_worker(worker)  # 设置 worker 实例
-        worker.start()
-
-        # 根据参数和配置决定是否最小化启动
-        if args.minimized or (config.start_minimized and not args.service):
-            logger.info("程序以最小化方式启动")
-            frame.Hide()
-        else:
-            frame.Show()
-
-        # 检查开机自启动设置
-        if config.auto_start:
-            if not service_manager.add_to_startup():
-                logger.warning("添加开机启动项失败")
-
-        # 开始应用主循环
-        exit_code = app.MainLoop()
-
-        # 清理资源
-        worker.stop()
-        logger.info("程序正常退出")
-        return exit_code
+        from utils.engine import create_backend
+        backend = create_backend(args.backend)
+        if args.headless:
+            from utils.engine import run_headless
+            return run_headless(config, trace, args.startup_report, backend)
+        return run_gui(config, args, logger, trace, backend)
 
     except Exception as e:
         logger.critical(f"程序启动失败: {e}", exc_info=True)
         return 1
     finally:
-        logger.info("程序退出")
+        # 写入尚未保存的配置修改
+        config.flush()
+        logger.info("程序退出（配置写入 %d 次，合并省去 %d 次）", config.writes, config.writes_saved)
+        shutdown_logger()
+
+def run_gui(config, args, logger, trace, backend=None):
+    """带界面运行（托盘图标和主窗口）"""
+    import wx
+    from utils.engine import Engine, report_startup
+    from utils.gui import MainFrame
+    from utils.service_manager import ServiceManager
+    trace.mark("导入界面和引擎模块")
+
+    # 创建wxPython应用实例
+    app = wx.App()
+
+    # 创建音频均衡引擎（分析器和音量控制共用同一个音频后端）
+    engine = Engine(config, backend)
+    service_manager = ServiceManager()
+    trace.mark("创建引擎（打开音频设备）")
+
+    # 创建主窗口
+    frame = MainFrame(None, engine.audio_analyzer, engine.volume_controller, config, service_manager,
+                      device_hub=engine.device_hub)
+    app.SetTopWindow(frame)
+
+    # 音量调整后更新界面显示
+    engine.worker.on_volume_change = lambda volume: wx.CallAfter(frame.update_volume, volume)
+    frame.set_worker(engine.worker)  # 设置 worker 实例
+    engine.start()
+    trace.mark("启动分析线程")
+
+    # 根据参数和配置决定是否最小化启动
+    if args.minimized or (config.start_minimized and not args.service):
+        logger.info("程序以最小化方式启动")
+        frame.Hide()
+    else:
+        frame.Show()
+
+    # 检查开机自启动设置
+    if config.auto_start:
+        if not service_manager.add_to_startup():
+            logger.warning("添加开机启动项失败")
+
+    trace.mark("创建主窗口")
+
+    def on_ready():
+        # 主循环开始处理事件后记录启动完成
+        if engine.audio_analyzer.first_sample.is_set():
+            trace.mark("第一个采样")
+        report_startup(logger, trace, "界面模式", args.startup_report)
+
+    wx.CallAfter(on_ready)
+
+    # 开始应用主循环
+    exit_code = app.MainLoop()
+
+    # 清理资源
+    engine.stop()
+    logger.info("程序正常退出")
+    return exit_code
 
 if __name__ == "__main__":
     sys.exit(main())
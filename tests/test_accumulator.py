@@ -0,0 +1,65 @@
+import random
+import pytest
+from utils.accumulator import MultiWindowAccumulator
+
+
+def brute_force_mean(samples, window, capacity):
+    """最近 capacity 个采样中时间在 (t - window, t] 内的平均值（至少包含最新的采样）"""
+    recent = samples[-capacity:]
+    now = recent[-1][0]
+    values = [value for timestamp, value in recent if timestamp > now - window] or [recent[-1][1]]
+    return sum(values) / len(values)
+
+
+def intervals(rng, count):
+    """采样间隔：20Hz、降频到 2Hz、带抖动和停顿的混合，窗口内的采样数随之变化"""
+    for i in range(count):
+        phase = (i // 500) % 4
+        if phase == 0:
+            yield 0.05
+        elif phase == 1:
+            yield 0.5
+        elif phase == 2:
+            yield rng.uniform(0.01, 0.12)
+        else:
+            yield 5.0 if rng.random() < 0.01 else 0.05
+
+
+@pytest.mark.parametrize('windows, capacity', [
+    ((0.4, 3.0, 60.0), 1801),
+    ((1.0, 10.0), 64),          # 容量不足以覆盖最长窗口，按容量淘汰
+    ((0.05,), 16),              # 窗口短于采样间隔，只保留最新的采样
+])
+def test_means_match_brute_force(windows, capacity):
+    # 6000 个采样跨过多次定期重新求和（RESUM_INTERVAL），并多次绕回环形缓冲区
+    rng = random.Random(1)
+    accumulator = MultiWindowAccumulator(windows, capacity)
+    samples = []
+    t = 0.0
+    for dt in intervals(rng, 6000):
+        t += dt
+        value = rng.random() if rng.random() > 0.1 else 0.0
+        samples.append((t, value))
+        accumulator.append(t, value)
+        if len(samples) % 7 == 0:
+            for index, window in enumerate(windows):
+                assert accumulator.mean(index) == pytest.approx(
+                    brute_force_mean(samples, window, capacity), rel=1e-9, abs=1e-12)
+
+
+def test_clear():
+    accumulator = MultiWindowAccumulator((1.0, 3.0), 32)
+    for i in range(100):
+        accumulator.append(i * 0.1, 1.0)
+    accumulator.clear()
+    assert accumulator.mean(0) == 0.0 and accumulator.count(1) == 0
+    accumulator.append(20.0, 0.5)
+    assert accumulator.mean(1) == 0.5 and accumulator.count(1) == 1
+
+
+def test_mean_db_and_window_index():
+    accumulator = MultiWindowAccumulator((0.4, 3.0, 60.0), 16)
+    assert accumulator.mean_db(0) == -100.0
+    accumulator.append(0.0, 0.1)
+    assert accumulator.mean_db(0) == pytest.approx(-20.0)
+    assert accumulator.window_index(2.0) == 1 and accumulator.window_index(100) == 2
@@ -0,0 +1,56 @@
+import math
+import pytest
+from utils.config import Config
+from utils.audio_backend import FakeBackend
+from utils.audio_analyzer import AudioAnalyzer
+from utils.metrics import MetricsRegistry
+
+DT = 0.05
+PEAKS = [0.5, 0.1]
+
+
+@pytest.fixture
+def config(tmp_path):
+    return Config(str(tmp_path))
+
+
+def run(config, metric, ticks=40, volume=0.5):
+    config.update(channel_metric=metric)
+    backend = FakeBackend(peaks=[PEAKS], volume=volume, channels=len(PEAKS))
+    analyzer = AudioAnalyzer(config, backend, registry=MetricsRegistry())
+    analyzer.last_check_time = 0.0
+    for i in range(ticks):
+        sample = analyzer.read_sample()
+        analyzer.process_tick(sample._replace(timestamp=i * DT))
+    # 每个周期只读取一次峰值表
+    assert backend.peak_reads == ticks
+    return analyzer, sample
+
+
+def test_mono_uses_mixed_peak(config):
+    analyzer, sample = run(config, 'mono')
+    assert sample.channel_peaks is None
+    assert analyzer.output_level == pytest.approx(0.5 * 0.5)
+    assert analyzer.get_channel_db() == []
+
+
+def test_max_uses_loudest_channel(config):
+    analyzer, sample = run(config, 'max')
+    assert list(sample.channel_peaks) == PEAKS
+    assert analyzer.output_level == pytest.approx(0.5 * 0.5)
+    assert analyzer.get_channel_db() == pytest.approx([20 * math.log10(p * 0.5) for p in PEAKS])
+
+
+def test_energy_sums_channel_energy(config):
+    analyzer, _ = run(config, 'energy')
+    assert analyzer.output_level == pytest.approx(math.sqrt(sum((p * 0.5) ** 2 for p in PEAKS)))
+
+
+
+def test_channel_metric_change_takes_effect(config):
+    analyzer, _ = run(config, 'max')
+    config.update(channel_metric='energy')
+    assert analyzer.channel_metric == 'energy'
+    sample = analyzer.read_sample()
+    analyzer.process_tick(sample._replace(timestamp=100 * DT))
+    assert analyzer.output_level == pytest.approx(math.sqrt(sum((p * 0.5) ** 2 for p in PEAKS)))
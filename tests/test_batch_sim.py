@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from utils.config import Config
+from utils.batch_sim import BatchSimulator, cross_check, synthetic_signal
+
+
+@pytest.fixture
+def config(tmp_path):
+    return Config(str(tmp_path))
+
+
+def random_params(rows, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        'interval_max': rng.uniform(0.5, 5.0, rows),
+        'interval_min': rng.uniform(1.0, 15.0, rows),
+        'volume_change_k': rng.uniform(0.1, 0.8, rows),
+        'max_db': rng.uniform(-25.0, -6.0, rows),
+        'min_db': rng.uniform(-50.0, -30.0, rows),
+        'audio_threshold': rng.uniform(-70.0, -30.0, rows),
+    }
+
+
+def assert_matches(deviation):
+    assert deviation['events'] == 0
+    assert deviation['adjustments'] == 0
+    assert deviation['volume'] < 1e-9
+    assert deviation['output_db'] < 1e-6
+    assert deviation['out_of_band'] < 1e-9
+    assert deviation['score'] < 1e-6
+
+
+def test_matches_scalar_loop(config):
+    timestamps, peaks = synthetic_signal(300.0, 0.05, seed=0)
+    assert_matches(cross_check(timestamps, peaks, config, random_params(8, seed=1)))
+
+
+def test_matches_scalar_loop_with_window_overflow(config):
+    # 50Hz 采样时 60 秒窗口超出累加器容量，覆盖容量淘汰和重新求和
+    timestamps, peaks = synthetic_signal(200.0, 0.02, seed=2)
+    assert_matches(cross_check(timestamps, peaks, config, random_params(4, seed=3), volume=0.5))
+
+
+def test_volume_floor_matches_scalar_loop(config):
+    # 很响的信号、很低的上限和很大的步进系数，把音量压到下限
+    timestamps = np.arange(2000) * 0.05
+    peaks = np.full(2000, 0.95)
+    params = {'max_db': np.array([-45.0, -40.0]), 'min_db': np.array([-60.0, -55.0]),
+              'volume_change_k': np.array([2.0, 1.0])}
+    deviation = cross_check(timestamps, peaks, config, params)
+    assert_matches(deviation)
+    assert BatchSimulator(config, params).run(timestamps, peaks)['volume'].min() == pytest.approx(0.01)
+
+
+def test_rejects_unsupported_configuration(config):
+    with pytest.raises(ValueError):
+        BatchSimulator(config, {'pi_kp': [1.0]})
+    config.control_mode = 'pi'
+    with pytest.raises(ValueError):
+        BatchSimulator(config)
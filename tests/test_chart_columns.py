@@ -0,0 +1,57 @@
+import threading
+from types import SimpleNamespace
+from utils.chart_columns import ColumnAggregator, NORMAL, OVER_MAX, UNDER_MIN
+
+
+def snap(timestamp, level=0.1, state='normal', volume=0.5):
+    return SimpleNamespace(timestamp=timestamp, output_level=level, state=state, volume=volume)
+
+
+def test_columns():
+    aggregator = ColumnAggregator(seconds=1.0, capacity=10)
+    aggregator.on_snapshot(snap(0.0, 0.1))
+    aggregator.on_snapshot(snap(0.5, 0.3, 'over_max'))
+    aggregator.on_snapshot(snap(1.0, 0.2, 'under_min', volume=0.4))
+    aggregator.on_snapshot(snap(1.5, 0.0, 'silent', volume=0.3))
+    aggregator.on_snapshot(snap(2.0, 0.1))
+    produced, columns = aggregator.get_columns()
+    assert produced == 2
+    assert columns == [(0.1, 0.3, 0.5, OVER_MAX), (0.2, 0.2, 0.3, UNDER_MIN)]
+
+
+def test_gap_fills_empty_columns_and_respects_capacity():
+    aggregator = ColumnAggregator(seconds=1.0, capacity=4)
+    aggregator.on_snapshot(snap(0.0))
+    aggregator.on_snapshot(snap(3.2))
+    produced, columns = aggregator.get_columns()
+    assert produced == 3
+    assert columns[0] == (0.1, 0.1, 0.5, NORMAL)
+    assert columns[1:] == [(None, None, 0.5, NORMAL)] * 2
+    # 超过容量的空白只补满队列
+    aggregator.on_snapshot(snap(100.0))
+    produced, columns = aggregator.get_columns()
+    assert len(columns) == 4 and produced == 3 + 1 + 4
+
+
+def test_get_columns_consistent_while_producing():
+    aggregator = ColumnAggregator(seconds=1.0, capacity=50)
+    stop = threading.Event()
+
+    def produce():
+        t = 0.0
+        while not stop.is_set():
+            # 每列的音量等于列的序号，可以从列本身核对 produced
+            aggregator.on_snapshot(snap(t, volume=float(int(t))))
+            t += 0.5
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    try:
+        for _ in range(2000):
+            produced, columns = aggregator.get_columns()
+            if columns:
+                assert columns[-1][2] == produced - 1
+                assert [c[2] for c in columns] == list(range(produced - len(columns), produced))
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,59 @@
+import json
+from utils.config import Config
+
+
+def read_file(config):
+    with open(config.config_file) as f:
+        return json.load(f)
+
+
+def test_override_is_not_saved(tmp_path):
+    config = Config(str(tmp_path))
+    config.override(trace_record=True)
+    assert config.trace_record is True
+    config.update(max_db=-12.0)
+    config.flush()
+    data = read_file(config)
+    assert data['trace_record'] is False
+    assert data['max_db'] == -12.0
+    # 下次启动时不再录制
+    assert Config(str(tmp_path)).trace_record is False
+
+
+def test_update_replaces_override(tmp_path):
+    config = Config(str(tmp_path))
+    config.override(trace_record=True)
+    config.update(trace_record=True)
+    config.flush()
+    assert read_file(config)['trace_record'] is True
+
+
+def test_update_reports_changes(tmp_path):
+    config = Config(str(tmp_path))
+    notified = []
+    config.subscribe(notified.append)
+    assert config.update(max_db=-12.0) is True
+    assert config.update(max_db=-12.0) is False
+    assert config.update(nope=1) is False
+    assert notified == [['max_db']]
+    config.flush()
+    assert config.writes == 1
+
+
+def test_unchanged_update_does_not_save(tmp_path):
+    config = Config(str(tmp_path))
+    config.update(max_db=config.max_db, min_db=config.min_db)
+    assert config.flush() is True
+    assert config.writes == 0
+    assert not (tmp_path / 'config' / 'config.json').exists()
+
+
+def test_debounced_writes_are_merged(tmp_path):
+    config = Config(str(tmp_path))
+    for value in (-11.0, -12.0, -13.0):
+        config.update(max_db=value)
+    config.update(max_db=-13.0)
+    config.flush()
+    assert config.writes == 1
+    assert config.writes_saved == 2
+    assert read_file(config)['max_db'] == -13.0
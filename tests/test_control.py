@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import asyncio
+import threading
+import pytest
+from utils.config import Config
+from utils.audio_backend import FakeBackend
+from utils.engine import Engine
+from utils.control import ControlServer, open_connection, request
+
+
+@pytest.fixture
+def server(tmp_path):
+    config = Config(str(tmp_path))
+    config.history = False
+    engine = Engine(config, backend=FakeBackend())
+    if sys.platform == 'win32':
+        address = r'\\.\pipe\OfficeGuardianTest-' + str(os.getpid())
+    else:
+        address = str(tmp_path / 'control.sock')
+    server = ControlServer(engine, address)
+    assert server.start()
+    yield server
+    server.stop()
+    engine.volume_controller.close()
+
+
+def send(server, message):
+    return asyncio.run(request(server.address, message))
+
+
+def send_raw(server, line):
+    async def exchange():
+        reader, writer = await open_connection(server.address)
+        try:
+            writer.write(line)
+            await writer.drain()
+            return json.loads(await reader.readline())
+        finally:
+            writer.close()
+    return asyncio.run(exchange())
+
+
+def test_get(server):
+    response = send(server, {'cmd': 'get', 'key': 'max_db', 'id': 7})
+    assert response == {'ok': True, 'result': {'max_db': server.config.max_db}, 'id': 7}
+    response = send(server, {'cmd': 'get'})
+    assert response['ok'] and set(response['result']) == set(Config.DEFAULT_CONFIG)
+    response = send(server, {'cmd': 'get', 'key': 'nope'})
+    assert not response['ok'] and 'nope' in response['error']
+
+
+def test_set(server):
+    response = send(server, {'cmd': 'set', 'values': {'max_db': -12, 'min_db': -35.5}})
+    assert response == {'ok': True, 'result': {'max_db': -12, 'min_db': -35.5}}
+    assert server.config.max_db == -12 and server.config.min_db == -35.5
+
+
+def test_set_rejects_invalid_values(server):
+    before = (server.config.max_db, server.config.min_db)
+    for values in ({'max_db': 'loud'}, {'history': 1}, {'nope': 1}, {},
+                   {'min_db': -5.0}, {'max_db': -50.0}, {'max_db': -20.0, 'min_db': -20.0}):
+        response = send(server, {'cmd': 'set', 'values': values})
+        assert not response['ok'], values
+    assert (server.config.max_db, server.config.min_db) == before
+
+
+def test_set_validates_nullable_and_list_values(server):
+    for values in ({'device_id': 3}, {'device_id': ['a']}, {'device_id': {'id': 'a'}},
+                   {'loudness_windows': []}, {'loudness_windows': ['a', 3.0]},
+                   {'loudness_windows': [0.4, True]}, {'loudness_windows': [0.0, 3.0]},
+                   {'loudness_windows': 3.0}):
+        response = send(server, {'cmd': 'set', 'values': values})
+        assert not response['ok'], values
+    assert server.config.loudness_windows == Config.DEFAULT_CONFIG['loudness_windows']
+    response = send(server, {'cmd': 'set', 'values': {'device_id': 'fake-0', 'loudness_windows': [0.5, 3.0]}})
+    assert response['ok'] and server.config.device_id == 'fake-0'
+    response = send(server, {'cmd': 'set', 'values': {'device_id': None}})
+    assert response['ok'] and server.config.device_id is None
+
+
+def test_concurrent_clients(server):
+    clients, requests_per_client = 20, 25
+
+    async def client(index):
+        reader, writer = await open_connection(server.address)
+        try:
+            for i in range(requests_per_client):
+                if i % 5 == 0:
+                    message = {'cmd': 'set', 'values': {'max_db': -10.0 - index % 3}, 'id': [index, i]}
+                else:
+                    message = {'cmd': 'get', 'key': 'min_db', 'id': [index, i]}
+                writer.write(json.dumps(message).encode('utf-8') + b'\n')
+                await writer.drain()
+                response = json.loads(await reader.readline())
+                assert response['ok'] and response['id'] == [index, i]
+        finally:
+            writer.close()
+
+    async def run():
+        await asyncio.gather(*(client(index) for index in range(clients)))
+
+    requests = server.requests
+    asyncio.run(run())
+    assert server.requests - requests == clients * requests_per_client
+    assert server.config.max_db in (-10.0, -11.0, -12.0)
+    assert send(server, {'cmd': 'status'})['ok']
+
+
+def test_malformed_json(server):
+    response = send_raw(server, b'{"cmd": "get"\n')
+    assert not response['ok']
+    response = send_raw(server, b'[1, 2]\n')
+    assert not response['ok']
+
+
+def test_unknown_command(server):
+    response = send(server, {'cmd': 'explode', 'id': 'x'})
+    assert response['ok'] is False and response['id'] == 'x' and 'explode' in response['error']
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='Unix 套接字')
+def test_socket_permissions(server):
+    assert os.stat(server.address).st_mode & 0o777 == 0o600
+
+
+def test_device_commands_run_on_initialized_thread(server):
+    backend = server.engine.backend
+    seen = []
+    original = backend.list_devices
+
+    def list_devices():
+        seen.append(threading.get_ident() in backend.initialized_threads)
+        return original()
+
+    backend.list_devices = list_devices
+    response = send(server, {'cmd': 'devices'})
+    assert response == {'ok': True, 'result': [{'id': 'fake-0', 'name': '虚拟扬声器'}]}
+    response = send(server, {'cmd': 'device', 'id': None})
+    assert response == {'ok': True, 'result': {'device_id': 'fake-0'}}
+    assert seen == [True]
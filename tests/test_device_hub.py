@@ -0,0 +1,70 @@
+import threading
+from utils.audio_backend import FakeBackend
+from utils.device_hub import DeviceHub
+
+DEVICES = [('speakers', '扬声器'), ('headset', '耳机')]
+
+
+def make_hub(device_id=None):
+    backend = FakeBackend(devices=list(DEVICES))
+    hub = DeviceHub(backend, device_id)
+    switches = []
+    hub.subscribe(switches.append)
+    threads = []
+    original_open = backend.open
+
+    def open_device(device_id=None):
+        threads.append(threading.get_ident() in backend.initialized_threads)
+        return original_open(device_id)
+
+    backend.open = open_device
+    hub.start()
+    return hub, backend, switches, threads
+
+
+def drain(hub):
+    hub._events.join()
+
+
+def test_removed_and_added_switch_devices():
+    hub, backend, switches, threads = make_hub('headset')
+    try:
+        assert hub.device_id == 'headset'
+        backend.remove_device('headset')
+        drain(hub)
+        assert hub.device_id == 'speakers' and switches == ['speakers']
+        backend.add_device('headset', '耳机')
+        drain(hub)
+        assert hub.device_id == 'headset' and switches == ['speakers', 'headset']
+        # 设备在设备中心的线程中打开，该线程已初始化
+        assert threads == [True, True]
+    finally:
+        hub.stop()
+    assert not backend.initialized_threads
+
+
+def test_default_device_followed_only_without_preference():
+    hub, backend, switches, _ = make_hub()
+    try:
+        backend.set_default('headset')
+        drain(hub)
+        assert hub.device_id == 'headset' and switches == ['headset']
+        hub.switch('speakers')
+        backend.set_default('headset')
+        drain(hub)
+        assert hub.device_id == 'speakers' and switches == ['headset', 'speakers']
+    finally:
+        hub.stop()
+
+
+def test_device_list_listeners_notified():
+    hub, backend, _, _ = make_hub()
+    changes = []
+    hub.subscribe_device_list(lambda: changes.append(True))
+    try:
+        backend.add_device('hdmi', 'HDMI')
+        backend.remove_device('hdmi')
+        drain(hub)
+        assert changes == [True, True]
+    finally:
+        hub.stop()
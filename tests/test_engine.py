@@ -0,0 +1,22 @@
+import pytest
+from utils.config import Config
+from utils.engine import Engine, create_backend
+
+
+def test_headless_engine_runs_on_fake_backend(tmp_path):
+    config = Config(str(tmp_path))
+    config.history = False
+    engine = Engine(config, create_backend('fake'))
+    engine.start()
+    try:
+        assert engine.audio_analyzer.first_sample.wait(2.0)
+        assert engine.worker.running
+    finally:
+        engine.request_stop()
+        engine.run()
+    assert not engine.worker.running
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend('alsa')
@@ -0,0 +1,126 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from utils.config import Config
+from utils.audio_backend import FakeBackend
+from utils.engine import Engine
+from utils.history import HistoryWriter, HistoryReader, HEADER_SIZE, RECORD_SIZE
+
+
+def write(writer, start, n):
+    for i in range(start, start + n):
+        writer.append(1000.0 + i, -20.0 - i % 10, 0.5, 'normal' if i % 2 else 'silent')
+
+
+def test_rejects_zero_capacity(tmp_path):
+    with pytest.raises(ValueError):
+        HistoryWriter(str(tmp_path / 'h.ring'), 0)
+
+
+def test_engine_ignores_history_shorter_than_interval(tmp_path):
+    config = Config(str(tmp_path))
+    config.history = True
+    config.history_days = 0
+    engine = Engine(config, backend=FakeBackend())
+    assert engine.history is None
+    engine.volume_controller.close()
+
+
+def test_wraparound(tmp_path):
+    path = str(tmp_path / 'h.ring')
+    writer = HistoryWriter(path, 8)
+    write(writer, 0, 20)
+    with HistoryReader(path) as reader:
+        records = reader.read()
+    writer.close()
+    # 环形文件写满后，下一条将要覆盖的最旧记录不返回
+    assert [r.timestamp for r in records] == [1000.0 + i for i in range(13, 20)]
+    assert records[0].db == pytest.approx(-23.0) and records[0].state == 'normal'
+    assert records[1].volume == pytest.approx(0.5, abs=1e-4) and records[1].state == 'silent'
+
+
+def test_read_range(tmp_path):
+    path = str(tmp_path / 'h.ring')
+    writer = HistoryWriter(path, 16)
+    write(writer, 0, 10)
+    with HistoryReader(path) as reader:
+        records = reader.read(since=1003.0, until=1007.0)
+    writer.close()
+    assert [r.timestamp for r in records] == [1003.0, 1004.0, 1005.0, 1006.0]
+
+
+def test_reopen_continues(tmp_path):
+    path = str(tmp_path / 'h.ring')
+    writer = HistoryWriter(path, 8)
+    write(writer, 0, 5)
+    writer.close()
+    writer = HistoryWriter(path, 8)
+    assert writer.count == 5
+    write(writer, 5, 5)
+    writer.close()
+    with HistoryReader(path) as reader:
+        assert [r.timestamp for r in reader.read()] == [1000.0 + i for i in range(3, 10)]
+
+
+def test_capacity_change_recreates(tmp_path):
+    path = str(tmp_path / 'h.ring')
+    writer = HistoryWriter(path, 8)
+    write(writer, 0, 5)
+    writer.close()
+    writer = HistoryWriter(path, 16)
+    assert writer.count == 0
+    writer.close()
+    with HistoryReader(path) as reader:
+        assert reader.capacity == 16 and reader.read() == []
+
+
+def test_header_mismatch_recreates(tmp_path):
+    path = str(tmp_path / 'h.ring')
+    writer = HistoryWriter(path, 8)
+    write(writer, 0, 5)
+    writer.close()
+    # 大小相同但魔数不同
+    with open(path, 'r+b') as f:
+        f.write(b'NOTHIST!')
+    writer = HistoryWriter(path, 8)
+    assert writer.count == 0
+    writer.close()
+    with HistoryReader(path) as reader:
+        assert reader.read() == []
+    assert (tmp_path / 'h.ring').stat().st_size == HEADER_SIZE + 8 * RECORD_SIZE
+
+
+def test_on_snapshot_interval(tmp_path):
+    writer = HistoryWriter(str(tmp_path / 'h.ring'), 8, interval=1.0)
+    for i in range(25):
+        writer.on_snapshot(SimpleNamespace(timestamp=i * 0.1, output_level=0.1, volume=0.5, state='normal'))
+    assert writer.count == 3
+    writer.close()
+
+
+def test_read_while_writing(tmp_path):
+    path = str(tmp_path / 'h.ring')
+    writer = HistoryWriter(path, 64)
+    stop = threading.Event()
+
+    def produce():
+        i = 0
+        while not stop.is_set():
+            write(writer, i, 1)
+            i += 1
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    try:
+        with HistoryReader(path) as reader:
+            for _ in range(500):
+                records = reader.read()
+                timestamps = [r.timestamp for r in records]
+                # 读到的记录连续、按时间顺序，且不超过容量
+                assert len(timestamps) <= 64
+                if timestamps:
+                    assert timestamps == [timestamps[0] + i for i in range(len(timestamps))]
+    finally:
+        stop.set()
+        thread.join()
+        writer.close()
@@ -0,0 +1,65 @@
+import threading
+from utils.metrics import MetricsRegistry
+
+
+def hammer(func, threads=8, calls=20000):
+    workers = [threading.Thread(target=lambda: [func() for _ in range(calls)]) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * calls
+
+
+def test_counter_concurrent_increments():
+    registry = MetricsRegistry()
+    counter = registry.counter('test_total', '测试')
+    total = hammer(counter.inc)
+    assert counter.value == total
+
+
+def test_histogram_concurrent_observations():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('test_seconds', '测试', buckets=(0.1, 1.0))
+    total = hammer(lambda: histogram.observe(0.5))
+    assert histogram.count == total
+    assert histogram.counts == [0, total, 0]
+    assert abs(histogram.sum - total * 0.5) < 1e-6
+
+
+def test_render():
+    registry = MetricsRegistry()
+    registry.counter('og_test_total', '测试计数', path='a').inc(3)
+    registry.histogram('og_test_seconds', '测试耗时', buckets=(0.1,)).observe(0.05)
+    text = registry.render()
+    assert '# TYPE og_test_total counter' in text
+    assert 'og_test_total{path="a"} 3' in text
+    assert 'og_test_seconds_bucket{le="0.1"} 1' in text
+    assert 'og_test_seconds_bucket{le="+Inf"} 1' in text
+    assert 'og_test_seconds_count 1' in text
+
+
+def test_replay_does_not_touch_default_registry(tmp_path):
+    from utils.config import Config
+    from utils.audio_backend import AudioSample
+    from utils.metrics import REGISTRY
+    from utils.trace import replay
+
+    ticks = REGISTRY.counter('og_analyzer_ticks_total', '分析周期数')
+    gauge = REGISTRY.gauge('og_volume', '最近一次采样的系统音量')
+    before = (ticks.value, gauge.func)
+    samples = [AudioSample(0.9, 0.8, i * 0.05) for i in range(400)]
+    assert replay(samples, Config(str(tmp_path)))['ticks'] == 400
+    assert (ticks.value, gauge.func) == before
+
+
+def test_engine_registers_on_given_registry(tmp_path):
+    from utils.config import Config
+    from utils.audio_backend import FakeBackend
+    from utils.engine import Engine
+
+    registry = MetricsRegistry()
+    engine = Engine(Config(str(tmp_path)), FakeBackend(), registry=registry)
+    engine.volume_controller.close()
+    text = registry.render()
+    assert 'og_analyzer_ticks_total 0' in text and 'og_volume_adjustments_total' in text
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from utils.quantile import QuantileSketch
+
+
+def fill(values, **kwargs):
+    sketch = QuantileSketch(**kwargs)
+    for value in values:
+        sketch.add(float(value))
+    return sketch
+
+
+@pytest.mark.parametrize('values', [
+    np.random.default_rng(0).normal(-30.0, 8.0, 50000),
+    np.random.default_rng(1).uniform(-70.0, -5.0, 20000),
+    np.concatenate([np.random.default_rng(2).normal(-50.0, 2.0, 3000),
+                    np.random.default_rng(3).normal(-15.0, 3.0, 7000)]),
+])
+def test_matches_numpy_percentile(values):
+    values = np.clip(values, -99.9, -0.1)
+    sketch = fill(values)
+    qs = [0, 1, 5, 25, 50, 75, 95, 99, 100]
+    estimates = sketch.quantiles(qs)
+    reference = np.percentile(values, qs)
+    # 误差不超过一个分箱宽度
+    assert np.max(np.abs(np.array(estimates) - reference)) <= sketch.resolution
+    assert sketch.quantile(50) == estimates[4]
+    assert sketch.count == len(values) == sum(sketch.counts)
+
+
+def test_constant_values():
+    sketch = fill([-20.0] * 5)
+    assert sketch.quantiles([5, 50, 95]) == [-20.0, -20.0, -20.0]
+
+
+def test_empty_sketch():
+    sketch = QuantileSketch()
+    assert sketch.count == 0
+    assert sketch.quantiles([5, 50, 95]) == [None, None, None]
+    assert sketch.quantile(50) is None
+    assert sketch.histogram(-80.0, 0.0, 80) == [0] * 80
+
+
+def test_out_of_range_values_are_counted_in_edge_bins():
+    rng = np.random.default_rng(4)
+    inside = rng.uniform(-60.0, -20.0, 1000)
+    values = np.concatenate([inside, [-150.0] * 10, [20.0] * 10])
+    sketch = fill(values)
+    assert sketch.count == 1020
+    assert sketch.counts[0] >= 10 and sketch.counts[-1] >= 10
+    # 范围外的值参与排名，但估计值限制在分箱范围内
+    assert sketch.quantile(50) == pytest.approx(np.percentile(values, 50), abs=sketch.resolution)
+    assert sketch.low <= sketch.quantile(0) < sketch.low + sketch.resolution
+    assert sketch.high - sketch.resolution < sketch.quantile(100) <= sketch.high
+    assert sketch.minimum == -150.0 and sketch.maximum == 20.0
+
+
+def test_histogram_rebins():
+    sketch = fill([-10.05, -10.05, -55.0, -95.0])
+    histogram = sketch.histogram(-80.0, 0.0, 8)
+    assert sum(histogram) == 3  # -95 在显示范围外
+    assert histogram[6] == 2 and histogram[2] == 1
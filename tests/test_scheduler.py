@@ -0,0 +1,101 @@
+import pytest
+from utils.scheduler import AdaptiveScheduler
+
+
+class FakeClock:
+    """虚拟时钟；FakeEvent.wait 推进时钟而不是真正等待"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeEvent:
+    def __init__(self, clock, late=0.0):
+        self.clock = clock
+        self.late = late
+        self.set_at = None
+        self.waits = []
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        if self.set_at is not None and self.clock.now + timeout >= self.set_at:
+            self.clock.now = self.set_at
+            return True
+        self.clock.now += timeout + self.late
+        return False
+
+    def is_set(self):
+        return self.set_at is not None and self.clock.now >= self.set_at
+
+
+def make(active_rate=20.0, idle_rate=2.0, silence_hold=10.0, late=0.0):
+    clock = FakeClock()
+    scheduler = AdaptiveScheduler(active_rate, idle_rate, silence_hold, clock=clock)
+    scheduler.start()
+    return scheduler, clock, FakeEvent(clock, late)
+
+
+def test_deadlines_do_not_drift_with_processing_time():
+    scheduler, clock, event = make()
+    start = clock.now
+    for i in range(1, 101):
+        clock.now += 0.03          # 处理耗时，小于周期
+        assert scheduler.wait(event)
+        assert clock.now == pytest.approx(start + i * 0.05)
+    assert scheduler.missed == 0
+    assert scheduler.get_stats()['achieved_rate'] == pytest.approx(20.0)
+
+
+def test_missed_deadline_is_dropped_not_caught_up():
+    scheduler, clock, event = make()
+    clock.now += 0.32              # 一次处理超过 6 个周期
+    assert scheduler.wait(event)
+    assert scheduler.missed == 1 and event.waits == []
+    assert scheduler.next_deadline == clock.now
+    # 之后从当前时刻重新按周期计时，不连续补采落后的周期
+    resumed = clock.now
+    assert scheduler.wait(event)
+    assert event.waits == [pytest.approx(0.05)]
+    assert clock.now == pytest.approx(resumed + 0.05)
+
+
+def test_jitter_statistics():
+    scheduler, clock, event = make(late=0.002)
+    for _ in range(200):
+        scheduler.wait(event)
+    stats = scheduler.get_stats()
+    assert stats['jitter'] == pytest.approx(0.002, rel=1e-3)
+    assert stats['max_jitter'] == pytest.approx(0.002)
+    assert stats['ticks'] == 200
+
+
+def test_switches_to_idle_rate_after_silence_hold():
+    scheduler, clock, event = make(silence_hold=10.0)
+    assert not scheduler.update(True)
+    clock.now += 9.9
+    assert not scheduler.update(False) and scheduler.rate == 20.0
+    clock.now += 0.2
+    assert scheduler.update(False) and scheduler.rate == 2.0
+    before = clock.now
+    scheduler.wait(event)
+    assert clock.now - before <= 0.5 + 1e-9
+    assert scheduler.update(True) and scheduler.rate == 20.0
+
+
+def test_configure_keeps_current_mode():
+    scheduler, clock, _ = make()
+    scheduler.configure(active_rate=10.0, idle_rate=1.0)
+    assert scheduler.rate == 10.0
+    clock.now += 20.0
+    scheduler.update(False)
+    scheduler.configure(idle_rate=4.0)
+    assert scheduler.rate == 4.0
+
+
+def test_stop_event_interrupts_wait():
+    scheduler, clock, event = make()
+    event.set_at = clock.now + 0.01
+    assert not scheduler.wait(event)
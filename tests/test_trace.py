@@ -0,0 +1,26 @@
+import os
+from utils.audio_backend import AudioSample
+from utils.trace import TraceRecorder, read_trace, RECORD, HEADER
+
+
+def test_recorder_stops_at_size_limit(tmp_path):
+    path = str(tmp_path / 'limit.ogtrace')
+    recorder = TraceRecorder(path, max_bytes=HEADER.size + RECORD.size * 10)
+    for i in range(100):
+        recorder.record(AudioSample(0.5, 0.6, i * 0.05))
+    recorder.close()
+    assert recorder.samples == 10
+    assert os.path.getsize(path) == HEADER.size + RECORD.size * 10
+    assert len(list(read_trace(path)[1])) == 10
+
+
+def test_replay_restores_volume_ramp(tmp_path):
+    from utils.config import Config
+    from utils.trace import replay
+    config = Config(str(tmp_path))
+    config.volume_ramp = True
+    samples = [AudioSample(0.9, 0.8, i * 0.05) for i in range(200)]
+    result = replay(samples, config)
+    assert result['adjustments'] > 0
+    assert result['volume_writes'] > 0
+    assert config.volume_ramp is True
@@ -0,0 +1,23 @@
+import os
+import tempfile
+from utils.audio_backend import AudioSample
+from utils.trace import TraceRecorder
+from utils.tuner import tune
+
+
+def test_tune_ranks_candidates_and_cleans_up(tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.ogtrace')
+    recorder = TraceRecorder(path)
+    for i in range(1200):
+        recorder.record(AudioSample(0.9 if i < 600 else 0.02, 0.8, i * 0.05))
+    recorder.close()
+
+    temp = tmp_path / 'temp'
+    temp.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(temp))
+    candidates = [{'interval_max': 1}, {'interval_max': 4}]
+    results = tune([path], candidates, {}, -10.0, -40.0, workers=2)
+    assert len(results) == 3
+    assert [score for score, _, _ in results] == sorted(score for score, _, _ in results)
+    assert {} in [params for _, params, _ in results]
+    assert os.listdir(str(temp)) == []
@@ -0,0 +1,122 @@
+import math
+import pytest
+from utils.config import Config
+from utils.audio_backend import AudioSample, FakeBackend
+from utils.trace import replay
+from utils.volume_controller import PIController, VolumeController
+
+DT = 0.05
+SEGMENT = 40.0
+# 过响 -> 过轻 -> 适中 -> 过响（与 bench_controller 相同的响度阶跃）
+LEVELS = [0.9, 0.02, 0.3, 0.6]
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config(str(tmp_path))
+    config.volume_ramp = False
+    return config
+
+
+def step_response(config):
+    per_segment = int(SEGMENT / DT)
+    samples = [AudioSample(level, 0.8, (i * per_segment + j) * DT)
+               for i, level in enumerate(LEVELS) for j in range(per_segment)]
+    trajectory = replay(samples, config)['trajectory']
+    return [trajectory[i * per_segment:(i + 1) * per_segment] for i in range(len(LEVELS))]
+
+
+def test_pi_settles_within_band(config):
+    config.control_mode = 'pi'
+    for segment in step_response(config):
+        volumes = [volume for _, _, volume, _ in segment]
+        adjustments = sum(1 for a, b in zip(volumes, volumes[1:]) if a != b)
+        assert adjustments <= 3
+        # 过轻时先等 interval_min（8 秒）才调整，25 秒后应一直在响度范围内
+        settled = [db for t, db, _, _ in segment if t - segment[0][0] >= 25.0]
+        assert all(config.min_db <= db <= config.max_db for db in settled)
+
+
+def plant_errors(pi, raw_db=0.0, target_db=-10.0, volume=1.0, steps=10):
+    """在 输出响度 = 原始响度 + 音量分贝 的对象上每个周期调整一次，返回各次的误差"""
+    errors = []
+    for i in range(steps):
+        error = target_db - (raw_db + 20 * math.log10(volume))
+        errors.append(error)
+        volume = pi.update(error, i * pi.period, volume)
+    return errors
+
+
+def test_pi_controller_converges_on_plant():
+    errors = plant_errors(PIController(margin=0.0))
+    assert abs(errors[1]) < 1.0
+    assert abs(errors[-1]) < 0.01
+
+
+def test_pi_controller_does_not_oscillate():
+    # 比例项只作用于误差的变化：不越过目标，误差每两个周期至少减小一半
+    errors = plant_errors(PIController(margin=0.0), raw_db=-10.0, target_db=-30.0, volume=0.05, steps=20)
+    assert all(error >= 0 for error in errors)
+    assert all(abs(b) <= abs(a) / 2 for a, b in zip(errors, errors[2:]))
+    assert abs(errors[-1]) < 0.01
+
+
+def test_pi_anti_windup_at_max_volume():
+    pi = PIController()
+    for i in range(20):
+        assert pi.update(10.0, i * 2.0, 1.0) == 1.0
+    once = PIController()
+    once.update(10.0, 0.0, 1.0)
+    # 限幅期间没有累积：误差反向时的响应与只限幅过一次相同
+    volume = pi.update(-5.0, 40.0, 1.0)
+    assert volume == pytest.approx(once.update(-5.0, 2.0, 1.0))
+    assert volume == pytest.approx(10 ** ((0.2 * (-6.0 - 11.0) + 0.25 * 3.0 * -6.0) / 20))
+
+
+def test_pi_anti_windup_at_min_volume():
+    pi = PIController(min_volume=0.01)
+    for i in range(20):
+        assert pi.update(-30.0, i * 2.0, 0.01) == 0.01
+    volume = pi.update(5.0, 40.0, 0.01)
+    assert volume == pytest.approx(0.01 * 10 ** ((0.2 * (6.0 + 31.0) + 0.25 * 3.0 * 6.0) / 20))
+
+
+def test_pi_restarts_after_long_gap():
+    pi = PIController()
+    pi.update(-10.0, 0.0, 0.5)
+    volume = pi.update(-10.0, 100.0, 0.5)
+    assert volume == pytest.approx(0.5 * 10 ** ((0.2 + 0.25 * 3.0) * -11.0 / 20))
+
+
+def test_step_keeps_volume_floor(config):
+    backend = FakeBackend(volume=0.02)
+    controller = VolumeController(config, backend)
+    assert controller.adjust_volume_for_db(0.0, -40.0) == 0.01
+    assert backend.volume == 0.01
+    # 已在下限时不再写入
+    writes = backend.volume_writes
+    controller.adjust_volume_for_db(0.0, -40.0)
+    assert backend.volume == 0.01 and backend.volume_writes == writes
+
+
+def test_device_change_cancels_pending_ramp(tmp_path):
+    import time
+    config = Config(str(tmp_path))
+    config.volume_ramp = True
+    config.ramp_step = 0.01
+    config.ramp_interval = 0.05
+    backend = FakeBackend(volume=0.5, devices=[('fake-0', 'A'), ('fake-1', 'B')])
+    controller = VolumeController(config, backend)
+    try:
+        controller.set_volume(0.1)
+        assert controller.get_target_volume() == 0.1
+        backend.open('fake-1')
+        controller.on_device_changed('fake-1')
+        assert controller.actuator.pending_target() is None
+        volume = backend.volume
+        assert controller.get_target_volume() == volume
+        time.sleep(0.3)
+        # 最多还有取消前已开始的一步
+        assert backend.volume >= volume - config.ramp_step - 1e-9
+    finally:
+        controller.close()
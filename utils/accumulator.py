@@ -0,0 +1,99 @@
+import math
+
+
+class MultiWindowAccumulator:
+    """多时间窗口的滑动平均累加器
+
+    所有窗口共用一个预分配的环形缓冲区，每个窗口维护自己的起点和累加和。
+    追加一个采样的代价与历史长度无关（均摊 O(1)），窗口以秒为单位定义，
+    不依赖实际采样率。
+
+    Args:
+        windows: 窗口长度（秒）序列，例如 (0.4, 3.0, 60.0)
+        capacity: 环形缓冲区容量（采样点数），应覆盖最长窗口内的最多采样数
+    """
+
+    # 每隔多少次淘汰重新求和一次，消除浮点累加误差
+    RESUM_INTERVAL = 4096
+
+    def __init__(self, windows=(0.4, 3.0, 60.0), capacity=2048):
+        self.windows = tuple(float(w) for w in windows)
+        self.capacity = capacity
+        self._times = [0.0] * capacity
+        self._values = [0.0] * capacity
+        self._head = 0   # 已写入的采样总数
+        self._starts = [0] * len(self.windows)
+        self._sums = [0.0] * len(self.windows)
+        self._evictions = 0
+
+    def clear(self):
+        """清空所有窗口"""
+        self._head = 0
+        self._starts = [0] * len(self.windows)
+        self._sums = [0.0] * len(self.windows)
+
+    def append(self, timestamp, value):
+        """追加一个采样（timestamp 为单调时钟秒数）"""
+        capacity = self.capacity
+        times = self._times
+        values = self._values
+        starts = self._starts
+        sums = self._sums
+        head = self._head
+        index = head % capacity
+
+        # 环形缓冲区已满时，先从各窗口中淘汰即将被覆盖的最旧采样
+        for i in range(len(starts)):
+            if head - starts[i] >= capacity:
+                sums[i] -= values[index]
+                starts[i] += 1
+
+        times[index] = timestamp
+        values[index] = value
+        head += 1
+        self._head = head
+
+        for i, window in enumerate(self.windows):
+            total = sums[i] + value
+            start = starts[i]
+            limit = timestamp - window
+            # 淘汰超出时间窗口的采样（始终保留最新的一个）
+            while start < head - 1 and times[start % capacity] <= limit:
+                total -= values[start % capacity]
+                start += 1
+                self._evictions += 1
+            starts[i] = start
+            sums[i] = total
+
+        if self._evictions >= self.RESUM_INTERVAL:
+            self._resum()
+
+    def _resum(self):
+        """重新计算各窗口的累加和"""
+        self._evictions = 0
+        capacity = self.capacity
+        values = self._values
+        for i, start in enumerate(self._starts):
+            self._sums[i] = math.fsum(values[j % capacity] for j in range(start, self._head))
+
+    def count(self, index=0):
+        """窗口内的采样数"""
+        return self._head - self._starts[index]
+
+    def mean(self, index=0):
+        """窗口内的平均值，窗口为空时返回 0.0"""
+        count = self._head - self._starts[index]
+        if count <= 0:
+            return 0.0
+        return self._sums[index] / count
+
+    def mean_db(self, index=0, floor=-100.0):
+        """窗口内平均线性幅度对应的分贝值"""
+        mean = self.mean(index)
+        if mean <= 0:
+            return floor
+        return 20 * math.log10(mean)
+
+    def window_index(self, seconds):
+        """查找与给定长度最接近的窗口序号"""
+        return min(range(len(self.windows)), key=lambda i: abs(self.windows[i] - seconds))
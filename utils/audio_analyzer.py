@@ -1,102 +1,148 @@
-import numpy as np
-import threading
+import math
 import time
+import threading
 import logging
-from comtypes import CLSCTX_ALL
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume, IAudioMeterInformation
-from collections import deque
+from collections import namedtuple
+from utils.accumulator import MultiWindowAccumulator
+from utils.audio_backend import AudioSample, PycawBackend
+from utils.decision import DecisionKernel, level_to_db
+from utils.metrics import REGISTRY
+from utils.scheduler import AdaptiveScheduler
+
+
+class AnalyzerSnapshot(namedtuple('AnalyzerSnapshot', ['output_level', 'peak', 'volume', 'state', 'timestamp'])):
+    """分析器状态快照（不可变），每个采样周期发布一次，界面读取时没有副作用
+
+    电平为线性幅度，分贝值在读取时才换算。
+    state: 'silent' 无音频, 'over_max' 响度过高, 'under_min' 响度过低, 'normal' 正常
+    """
+    __slots__ = ()
+
+    @property
+    def current_db(self):
+        """输出响度（分贝）"""
+        return level_to_db(self.output_level)
+
+    @property
+    def real_db(self):
+        """真实响度（分贝，未经音量调节）"""
+        return level_to_db(self.peak)
+
+
+_new_snapshot = tuple.__new__
 
 
 class AudioAnalyzer:
-    """负责分析音频输出的响度大小"""
+    """负责分析音频输出的响度大小
 
-    def __init__(self, config):
+    Args:
+        config: 配置
+        backend: 音频后端，默认使用 pycaw
+        registry: 指标注册表；回放、基准测试等离线使用的分析器传入独立的注册表，
+            不影响程序导出的指标
+    """
+
+    def __init__(self, config, backend=None, registry=REGISTRY):
         self.config = config
+        self.registry = registry
         self.logger = logging.getLogger('OfficeGuardian.AudioAnalyzer')
         self.stop_event = threading.Event()
+        # 启动后第一个采样处理完成时设置（用于冷启动计时）
+        self.first_sample = threading.Event()
         self.analysis_thread = None
-        self.current_db = -100.0
-        self.is_audio_playing = False
-        self.over_max_duration = 0
-        self.under_min_duration = 0
-        self.last_check_time = time.time()
+        self.sample = AudioSample(0.0, 0.0, 0.0)
+        # 最近一次采样的平均输出电平（线性幅度）
+        self.output_level = 0.0
         self.callback = None
-        self.db_history = deque(maxlen=60)  # 3秒的历史数据(60个采样点，采样率20Hz)
-        self.last_average_update = time.time()
-        self.current_average_db = -100.0
+        # 阈值判断内核，配置变化时重新计算线性阈值
+        self.kernel = DecisionKernel(config)
+        config.subscribe(self._on_config_changed)
+        # 最近一次发布的状态快照及其订阅者
+        self.snapshot = AnalyzerSnapshot(0.0, 0.0, 0.0, 'silent', 0.0)
+        self.snapshot_listeners = []
+        # 自适应采样调度器（有音频时快速采样，长时间静音后降频）
+        self.scheduler = AdaptiveScheduler(
+            active_rate=config.sample_rate_active,
+            idle_rate=config.sample_rate_idle,
+            silence_hold=config.silence_hold)
+        self.clock = self.scheduler.clock
+        self.kernel.reset(self.clock())
+        # 多时间窗口的输出响度（线性幅度）滑动平均，窗口以秒为单位
+        windows = config.loudness_windows
+        capacity = int(math.ceil(max(windows) * config.sample_rate_active * 1.5)) + 1
+        self.loudness = MultiWindowAccumulator(windows, capacity)
+        self.decision_window = self.loudness.window_index(config.average_window)
+        # 各声道的滑动平均（channel_metric 不为 mono 时按声道数创建）
+        self.channel_loudness = []
+        # 多声道判断方式，与阈值一样在配置变化时更新，分析线程不再逐周期查询配置
+        self.channel_metric = config.channel_metric
         self.device_id = config.device_id  # 初始化设备ID
-        self.meter = None
-        self.volume = None
+        # 音频后端，默认使用 pycaw
+        self.backend = backend if backend is not None else PycawBackend()
+        # 回环采集引擎（capture_mode 为 loopback 或使用 LUFS 指标时启用）
+        self.capture = None
+        self.lufs = None
+        # 设备中心切换设备后，由分析线程在下一个周期重置状态
+        self._device_changed = False
+        # 采样轨迹录制器（utils.trace.TraceRecorder），设置后分析线程记录每个原始采样
+        self.recorder = None
+        self._register_metrics()
         self._set_audio_interface()
 
+    def _register_metrics(self):
+        """注册分析线程的指标（在分析线程中不加锁更新）"""
+        registry = self.registry
+        self.m_ticks = registry.counter('og_analyzer_ticks_total', '分析周期数')
+        self.m_tick_seconds = registry.histogram('og_analyzer_tick_seconds', '一个分析周期（读取+处理）的耗时')
+        self.m_read_seconds = registry.histogram('og_backend_read_seconds', '读取峰值/音量（COM调用）的耗时')
+        self.m_events = {
+            DecisionKernel.OVER_MAX: registry.counter('og_analyzer_events_total', '阈值事件数', event='over_max'),
+            DecisionKernel.UNDER_MIN: registry.counter('og_analyzer_events_total', '阈值事件数', event='under_min'),
+        }
+        self.m_out_of_band = {
+            'over_max': registry.counter('og_analyzer_out_of_band_seconds_total', '响度超出范围的时长（秒）',
+                                         band='over_max'),
+            'under_min': registry.counter('og_analyzer_out_of_band_seconds_total', '响度超出范围的时长（秒）',
+                                          band='under_min'),
+        }
+        self.m_errors = registry.counter('og_analyzer_errors_total', '分析周期中的错误数')
+        registry.gauge('og_analyzer_rate_hz', '实际采样率（Hz）',
+                       lambda: self.scheduler.get_stats()['achieved_rate'])
+        registry.gauge('og_analyzer_jitter_seconds', '平均唤醒抖动（秒）', lambda: self.scheduler.avg_jitter)
+        registry.gauge('og_analyzer_missed_deadlines', '错过的采样截止时间数', lambda: self.scheduler.missed)
+        registry.gauge('og_output_db', '最近一次采样的输出响度（分贝）', lambda: self.snapshot.current_db)
+        registry.gauge('og_volume', '最近一次采样的系统音量', lambda: self.snapshot.volume)
+
+    @property
+    def current_db(self):
+        """输出响度（分贝）"""
+        return level_to_db(self.output_level)
+
+    @property
+    def real_db(self):
+        """真实响度（分贝）"""
+        return level_to_db(self.sample.peak)
+
+    @property
+    def is_audio_playing(self):
+        return self.kernel.playing
+
+    @property
+    def last_check_time(self):
+        return self.kernel.last_time
+
+    @last_check_time.setter
+    def last_check_time(self, value):
+        self.kernel.last_time = value
+
+    def _on_config_changed(self, keys):
+        """配置变化后重新计算线性阈值和多声道判断方式"""
+        self.kernel.configure(self.config)
+        self.channel_metric = self.config.channel_metric
+
     def _set_audio_interface(self):
         """根据设备ID设置音频接口"""
-        try:
-            if self.device_id is None:
-                # 使用默认音频设备
-                speakers = AudioUtilities.GetSpeakers()
-                self.logger.debug("使用默认音频设备")
-            else:
-                # 尝试找到指定ID的设备
-                devices = AudioUtilities.GetAllDevices()
-
-                # 查找匹配的设备
-                matching_device = None
-                for device in devices:
-                    try:
-                        if device.id == self.device_id:
-                            matching_device = device
-                            break
-                    except Exception as e:
-                        self.logger.warning(f"在查找设备时发生异常: {e}")
-                        continue
-
-                if matching_device:
-                    # 获取设备的音频接口
-                    device_enumerator = AudioUtilities.GetDeviceEnumerator()
-                    speakers = device_enumerator.GetDevice(self.device_id)
-                    self.logger.debug(f"使用设备: {matching_device.FriendlyName}")
-                else:
-                    # 找不到指定设备，使用默认设备
-                    self.logger.warning(f"找不到设备ID {self.device_id}，使用默认设备")
-                    speakers = AudioUtilities.GetSpeakers()
-
-            # 激活音频接口
-            interface = speakers.Activate(
-                IAudioMeterInformation._iid_, CLSCTX_ALL, None)
-            self.meter = interface.QueryInterface(IAudioMeterInformation)
-
-            volume_interface = speakers.Activate(
-                IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-            self.volume = volume_interface.QueryInterface(IAudioEndpointVolume)
-
-            # 保存当前设备ID
-            self.device_id = speakers.GetId()
-            self.logger.debug(f"音频接口已初始化，设备ID: {self.device_id}")
-
-        except Exception as e:
-            self.logger.error(f"设置音频接口失败: {str(e)}")
-            self.logger.debug("尝试回退到默认设备")
-            try:
-                # 回退到默认设备
-                speakers = AudioUtilities.GetSpeakers()
-                interface = speakers.Activate(
-                    IAudioMeterInformation._iid_, CLSCTX_ALL, None)
-                self.meter = interface.QueryInterface(IAudioMeterInformation)
-
-                volume_interface = speakers.Activate(
-                    IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-                self.volume = volume_interface.QueryInterface(
-                    IAudioEndpointVolume)
-
-                self.device_id = speakers.GetId()
-                self.logger.warning("已回退到默认音频设备")
-            except Exception as e2:
-                self.logger.error(f"回退到默认设备也失败: {str(e2)}")
-                self.meter = None
-                self.volume = None
-        finally:
-            self.logger.debug("音频接口设置完成")
+        self.device_id = self.backend.open(self.device_id)
 
     def set_device(self, device_id):
         """切换设备"""
@@ -107,15 +153,36 @@ class AudioAnalyzer:
             if self.analysis_thread:
                 self.start_analyzing(self.callback)
 
+    def on_device_changed(self, device_id):
+        """设备中心切换设备后的回调（后端已切换，分析线程无需停止）"""
+        self.device_id = device_id
+        self._device_changed = True
+
+    def _apply_device_change(self):
+        """在分析线程中清空旧设备的响度历史，并为新设备重启回环采集"""
+        self._device_changed = False
+        self.loudness.clear()
+        self.channel_loudness = []
+        if self.capture is not None:
+            self._stop_capture()
+            self._start_capture()
+
     def start_analyzing(self, callback=None):
         """开始分析音频输出"""
         try:
-            if not self.meter or not self.volume:
+            if not self.backend.is_ready():
                 self.logger.error("音频接口未正确初始化，无法启动分析")
                 return
 
             self.callback = callback
             self.stop_event.clear()
+            self.first_sample.clear()
+            if self.config.capture_mode == 'loopback' or self.config.loudness_metric == 'lufs':
+                self._start_capture()
+            self.scheduler.configure(
+                active_rate=self.config.sample_rate_active,
+                idle_rate=self.config.sample_rate_idle,
+                silence_hold=self.config.silence_hold)
             self.analysis_thread = threading.Thread(target=self._analysis_loop)
             self.analysis_thread.daemon = True
             self.analysis_thread.start()
@@ -131,111 +198,214 @@ class AudioAnalyzer:
         self.stop_event.set()
         if self.analysis_thread and self.analysis_thread.is_alive():
             self.analysis_thread.join(timeout=1.0)
+        self._stop_capture()
         self.logger.info("音频分析已停止")
 
     def _analysis_loop(self):
         """分析音频的线程函数"""
+        perf_counter = time.perf_counter
+        m_ticks = self.m_ticks
+        m_tick_seconds = self.m_tick_seconds
+        m_read_seconds = self.m_read_seconds
+        m_out_of_band = self.m_out_of_band
         try:
+            self.scheduler.start()
+            self.kernel.reset(self.clock())
+            last_timestamp = None
             while not self.stop_event.is_set():
                 try:
-                    # 获取真实响度
-                    real_db = self.get_real_db()
-                    # 获取输出响度（现在是平均值）
-                    output_db = self.get_current_db()
-                    self.current_db = output_db
-
-                    # 使用真实响度判断是否有音频播放
-                    if real_db > self.config.audio_threshold:
-                        self.is_audio_playing = True
-                        current_time = time.time()
-                        time_diff = current_time - self.last_check_time
-
-                        # 使用平均输出响度进行阈值判断
-                        if output_db > self.config.max_db:
-                            self.over_max_duration += time_diff
-                            self.under_min_duration = 0
-                        elif output_db < self.config.min_db:
-                            self.under_min_duration += time_diff
-                            self.over_max_duration = 0
-                        else:
-                            self.over_max_duration = 0
-                            self.under_min_duration = 0
-
-                        self.last_check_time = current_time
-
-                        # 使用较短的时间阈值，因为现在使用的是平均值
-                        if self.over_max_duration >= self.config.interval_max and self.callback:
-                            self.callback("over_max", output_db)
-                            self.over_max_duration = 0
-                        elif self.under_min_duration >= self.config.interval_min and self.callback:
-                            self.callback("under_min", output_db)
-                            self.under_min_duration = 0
-                    else:
-                        self.is_audio_playing = False
-                        self.over_max_duration = 0
-                        self.under_min_duration = 0
-
-                    time.sleep(0.05)  # 20Hz采样率
+                    if self._device_changed:
+                        self._apply_device_change()
+                    # 每个周期只读取一次硬件，真实响度和输出响度来自同一时刻
+                    started = perf_counter()
+                    sample = self.read_sample()
+                    read_done = perf_counter()
+                    recorder = self.recorder
+                    if recorder is not None:
+                        recorder.record(sample)
+                    self.process_tick(sample)
+                    m_tick_seconds.observe(perf_counter() - started)
+                    m_read_seconds.observe(read_done - started)
+                    m_ticks.inc()
+                    counter = m_out_of_band.get(self.snapshot.state)
+                    if counter is not None and last_timestamp is not None:
+                        counter.inc(sample.timestamp - last_timestamp)
+                    last_timestamp = sample.timestamp
+                    self.first_sample.set()
+
+                    # 根据是否有音频调整采样率
+                    if self.scheduler.update(self.is_audio_playing):
+                        stats = self.scheduler.get_stats()
+                        self.logger.debug(
+                            "采样率切换为 %.1fHz (实际 %.1fHz, 抖动 %.1fms)",
+                            stats['target_rate'], stats['achieved_rate'], stats['jitter'] * 1000)
+
+                    if not self.scheduler.wait(self.stop_event):
+                        break
 
                 except Exception as e:
-                    self.logger.error(f"音频分析错误: {e}")
-                    time.sleep(0.1)
+                    self.m_errors.inc()
+                    self.logger.error("音频分析错误: %s", e)
+                    self.stop_event.wait(0.1)
         except Exception as e:
             self.logger.critical(f"音频分析线程崩溃: {e}", exc_info=True)
 
-    def get_current_db(self):
-        """获取当前分贝值（经过系统音量调节后的输出响度）"""
+    def process_tick(self, sample):
+        """处理一次采样：更新响度、进行阈值判断并触发回调
+
+        分析线程每个周期调用一次；也可以直接传入构造的采样（例如离线仿真）。
+        判断全部在线性幅度域进行，只有触发回调时才换算分贝值。
+        """
+        level = self._process_sample(sample)
+        kernel = self.kernel
+        event = kernel.step(sample.peak, level, sample.timestamp)
+        if event:
+            self.m_events[event].inc()
+            if self.callback:
+                self.callback("over_max" if event == DecisionKernel.OVER_MAX else "under_min",
+                              level_to_db(level))
+
+        # 发布新的状态快照（整体替换引用，读取方无需加锁）
+        if not kernel.playing:
+            state = 'silent'
+        elif level > kernel.max_level:
+            state = 'over_max'
+        elif level < kernel.min_level:
+            state = 'under_min'
+        else:
+            state = 'normal'
+        # tuple.__new__ 直接构造，省去 namedtuple 生成的 __new__ 的函数调用开销
+        snapshot = _new_snapshot(AnalyzerSnapshot, (level, sample.peak, sample.volume, state, sample.timestamp))
+        self.snapshot = snapshot
+        for listener in self.snapshot_listeners:
+            listener(snapshot)
+
+    def subscribe_snapshot(self, listener):
+        """订阅状态快照，listener(snapshot) 在分析线程中调用，应尽快返回"""
+        self.snapshot_listeners.append(listener)
+
+    def unsubscribe_snapshot(self, listener):
+        """取消订阅状态快照（替换整个列表，分析线程正在遍历的旧列表不受影响）"""
+        self.snapshot_listeners = [item for item in self.snapshot_listeners if item != listener]
+
+    def get_snapshot(self):
+        """获取最近一次发布的状态快照"""
+        return self.snapshot
+
+    def get_sampling_stats(self):
+        """获取采样统计（实际采样率和抖动）"""
+        return self.scheduler.get_stats()
+
+    def _start_capture(self):
+        """启动回环采集，失败时回退到峰值表"""
         try:
-            if not self.meter or not self.volume:
-                return -100.0
-
+            from utils.capture import LoopbackCapture
+            device_name = None
+            for device_id, name in self.backend.list_devices():
+                if device_id == self.device_id:
+                    device_name = name
+                    break
+            self.capture = LoopbackCapture(device_name)
+            self.capture.start()
+            if self.config.loudness_metric == 'lufs':
+                from utils.lufs import LufsMeter
+                self.lufs = LufsMeter(self.capture.samplerate, self.capture.channels)
+        except Exception as e:
+            self.logger.warning(f"启动回环采集失败，使用峰值表: {e}")
+            self.capture = None
+            self.lufs = None
+
+    def _stop_capture(self):
+        """停止回环采集并记录CPU占用"""
+        if self.capture is not None:
+            self.capture.stop()
+            stats = self.capture.get_stats()
+            self.logger.debug(f"回环采集CPU占用: {stats['cpu_load'] * 100:.3f}%，共 {stats['blocks']} 块")
+            self.capture = None
+            self.lufs = None
+
+    def read_sample(self):
+        """读取一次硬件数据（峰值和音量），本次循环内的所有计算共用这一快照"""
+        if not self.backend.is_ready():
+            self.sample = AudioSample(0.0, 0.0, self.clock())
+            return self.sample
+        # 获取当前系统音量（后端由音量变化通知维护缓存，不产生COM调用）
+        volume = self.backend.get_volume()
+        if self.capture is not None:
+            # 回环采集：上次读取以来所有采样的峰值和RMS，不会漏掉两次读取之间的瞬态
+            peak, rms = self.capture.read_levels()
+            if self.lufs is not None:
+                for frames in self.capture.read_frames():
+                    self.lufs.process(frames)
+            self.sample = AudioSample(peak, volume, self.clock(), rms)
+        elif self.channel_metric != 'mono' and self.backend.get_channel_count() > 0:
+            # 一次调用读取所有声道峰值（替代 GetPeakValue，不增加COM调用）
+            channel_peaks = self.backend.get_channel_peaks()
+            peak = max(channel_peaks)
+            self.sample = AudioSample(peak, volume, self.clock(), None, channel_peaks)
+        else:
             # 获取原始峰值
-            peak = self.meter.GetPeakValue()
-            # 获取当前系统音量
-            volume = self.volume.GetMasterVolumeLevelScalar()
-
-            if peak > 0:
-                # 原始分贝值
-                original_db = 20 * np.log10(peak)
-                # 补偿系统音量的影响（音量越小，削减越多）
-                volume_db = 20 * np.log10(volume) if volume > 0 else -100.0
-                output_db = original_db + volume_db
-
-                # 更新历史数据
-                self.db_history.append(output_db)
-
-                # 每50ms更新一次平均值
-                current_time = time.time()
-                if current_time - self.last_average_update >= 0.05:
-                    self._update_average_db()
-                    self.last_average_update = current_time
-
-                return self.current_average_db
-            return -100.0
-        except:
-            return -100.0
-
-    def _update_average_db(self):
-        """更新平均分贝值"""
-        if len(self.db_history) > 0:
-            # 将分贝值转换回能量域进行平均
-            energies = [10 ** (db/20) for db in self.db_history]
-            avg_energy = sum(energies) / len(energies)
-            # 将平均能量转换回分贝域
-            self.current_average_db = 20 * np.log10(avg_energy)
+            peak = self.backend.get_peak()
+            self.sample = AudioSample(peak, volume, self.clock())
+        return self.sample
+
+    def _process_sample(self, sample):
+        """根据采样快照计算判断窗口内的平均输出电平（线性幅度）"""
+        if sample.peak > 0:
+            # 输出幅度 = 原始电平 × 系统音量（音量越小，削减越多）
+            # 回环采集模式使用RMS（能量），否则使用峰值
+            level = sample.rms if sample.rms is not None else sample.peak
+            # 在线性幅度域累加，各时间窗口的平均值随之更新
+            self.loudness.append(sample.timestamp, level * sample.volume)
+            level = self.loudness.mean(self.decision_window)
+            if sample.channel_peaks is not None:
+                level = self._update_channels(sample)
+            if self.lufs is not None:
+                # LUFS 指标：K加权短期响度（3s）加上系统音量的影响，换算为等效线性幅度
+                level = self.lufs.short_term_level() * sample.volume
+        else:
+            level = 0.0
+        self.output_level = level
+        return level
+
+    def _update_channels(self, sample):
+        """更新各声道的滑动平均，按 channel_metric 返回判断用的电平（线性幅度）"""
+        channel_peaks = sample.channel_peaks
+        if len(self.channel_loudness) != len(channel_peaks):
+            self.channel_loudness = [
+                MultiWindowAccumulator(self.loudness.windows, self.loudness.capacity)
+                for _ in channel_peaks]
+
+        volume = sample.volume
+        window = self.decision_window
+        loudest = 0.0
+        energy = 0.0
+        for accumulator, peak in zip(self.channel_loudness, channel_peaks):
+            accumulator.append(sample.timestamp, peak * volume)
+            mean = accumulator.mean(window)
+            if mean > loudest:
+                loudest = mean
+            energy += mean * mean
+
+        # max: 最响声道；energy: 各声道能量之和
+        return loudest if self.channel_metric == 'max' else math.sqrt(energy)
+
+    def get_channel_db(self):
+        """获取各声道在判断窗口内的平均输出响度"""
+        return [accumulator.mean_db(self.decision_window) for accumulator in self.channel_loudness]
+
+    def get_current_db(self):
+        """获取当前分贝值（经过系统音量调节后的输出响度，取自最近一次采样）"""
+        return self.current_db
+
+    def get_window_db(self, seconds):
+        """获取最接近给定长度（秒）的时间窗口内的平均输出响度"""
+        return self.loudness.mean_db(self.loudness.window_index(seconds))
 
     def get_real_db(self):
-        """获取真实响度（未经音量调节的原始分贝值）"""
-        try:
-            if not self.meter:
-                return -100.0
-            peak = self.meter.GetPeakValue()
-            if peak > 0:
-                return 20 * np.log10(peak)
-            return -100.0
-        except:
-            return -100.0
+        """获取真实响度（未经音量调节的原始分贝值，取自最近一次采样）"""
+        return self.real_db
 
     def is_playing(self):
         """判断当前是否有音频播放"""
-        return self.is_audio_playing
+        return self.kernel.playing
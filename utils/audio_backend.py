@@ -0,0 +1,499 @@
+import math
+import logging
+import platform
+import threading
+from collections import namedtuple
+from ctypes import cast, POINTER, c_float, c_uint
+
+# IMMDevice 的启用状态
+DEVICE_STATE_ACTIVE = 1
+
+# Windows音频接口
+if platform.system() == 'Windows':
+    import comtypes
+    from ctypes import HRESULT
+    from comtypes import CLSCTX_ALL, COMMETHOD
+    from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume, IAudioMeterInformation
+
+    class _IAudioMeterChannels(comtypes.IUnknown):
+        """IAudioMeterInformation 的前三个方法，GetChannelsPeakValues 的数组参数声明为输入
+
+        pycaw 把 afPeakValues 声明为输出参数，生成的包装方法只返回第一个声道；
+        这里按原始签名声明，调用方传入复用的 c_float 数组，由 COM 写入所有声道。
+        """
+        _iid_ = IAudioMeterInformation._iid_
+        _methods_ = (
+            COMMETHOD([], HRESULT, 'GetPeakValue', (['out'], POINTER(c_float), 'pfPeak')),
+            COMMETHOD([], HRESULT, 'GetMeteringChannelCount', (['out'], POINTER(c_uint), 'pnChannelCount')),
+            COMMETHOD([], HRESULT, 'GetChannelsPeakValues',
+                      (['in'], c_uint, 'u32ChannelCount'), (['in'], POINTER(c_float), 'afPeakValues')),
+        )
+    try:
+        from pycaw.callbacks import AudioEndpointVolumeCallback, MMNotificationClient
+    except ImportError:  # 旧版 pycaw 没有回调封装，退化为轮询
+        AudioEndpointVolumeCallback = None
+        MMNotificationClient = None
+
+    if AudioEndpointVolumeCallback is not None:
+        class _VolumeCacheCallback(AudioEndpointVolumeCallback):
+            """IAudioEndpointVolumeCallback 实现，音量变化时更新设备的音量缓存"""
+
+            def __init__(self, endpoint):
+                super().__init__()
+                self.endpoint = endpoint
+
+            def on_notify(self, new_volume, new_mute, event_context, channels, channel_volumes):
+                self.endpoint.cached_volume = new_volume
+
+    if MMNotificationClient is not None:
+        class _DeviceNotificationClient(MMNotificationClient):
+            """IMMNotificationClient 实现，把播放设备的变化转发给监听者"""
+
+            def __init__(self, listener):
+                super().__init__()
+                self.listener = listener
+
+            def on_default_device_changed(self, flow, flow_id, role, role_id, default_device_id):
+                # 只关心播放设备（eRender）的多媒体默认设备（eMultimedia）
+                if flow_id == 0 and role_id == 1:
+                    self.listener.on_default_device_changed(default_device_id)
+
+            def on_device_added(self, added_device_id):
+                self.listener.on_device_added(added_device_id)
+
+            def on_device_removed(self, removed_device_id):
+                self.listener.on_device_removed(removed_device_id)
+
+            def on_device_state_changed(self, device_id, new_state, new_state_id):
+                if new_state_id == DEVICE_STATE_ACTIVE:
+                    self.listener.on_device_added(device_id)
+                else:
+                    self.listener.on_device_removed(device_id)
+
+            def on_property_value_changed(self, device_id, property_struct, fmtid, pid):
+                pass
+
+
+# 一次采样的快照：峰值、主音量、采样时间（单调时钟）、RMS（仅回环采集模式提供）
+# 和各声道峰值（峰值表模式提供，为后端复用的缓冲区）
+AudioSample = namedtuple('AudioSample', ['peak', 'volume', 'timestamp', 'rms', 'channel_peaks'],
+                         defaults=(None, None))
+
+
+class AudioBackend:
+    """音频后端接口，封装峰值表读取和端点音量控制
+
+    AudioAnalyzer 和 VolumeController 只通过该接口访问音频硬件，
+    因此可以替换为其他实现（例如用于无Windows环境的 FakeBackend）。
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self.device_id = None
+
+    def open(self, device_id=None):
+        """打开指定设备（None 表示默认设备），返回实际使用的设备ID"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放设备接口"""
+
+    def is_ready(self):
+        """设备接口是否可用"""
+        raise NotImplementedError
+
+    def get_peak(self):
+        """获取混合峰值 (0.0 到 1.0)"""
+        raise NotImplementedError
+
+    def get_channel_count(self):
+        """峰值表的声道数"""
+        raise NotImplementedError
+
+    def get_channel_peaks(self):
+        """一次读取所有声道的峰值
+
+        返回复用的缓冲区，内容在下一次调用时会被覆盖，需要保存时请复制。
+        """
+        raise NotImplementedError
+
+    def get_volume(self):
+        """获取主音量 (0.0 到 1.0)"""
+        raise NotImplementedError
+
+    def get_volume_db(self):
+        """获取主音量分贝值"""
+        raise NotImplementedError
+
+    def set_volume(self, volume_level):
+        """设置主音量 (0.0 到 1.0)"""
+        raise NotImplementedError
+
+    def list_devices(self):
+        """列出可用设备，返回 [(设备ID, 设备名称), ...]"""
+        raise NotImplementedError
+
+    def forget(self, device_id):
+        """丢弃设备的缓存接口（设备被移除时调用）"""
+
+    def init_thread(self):
+        """在当前线程中准备访问后端（Windows 上为初始化COM），需要打开设备或枚举设备的
+        后台线程在开始时调用，结束前调用 exit_thread"""
+
+    def exit_thread(self):
+        """释放 init_thread 在当前线程中初始化的资源"""
+
+    def watch(self, listener):
+        """注册设备变化通知，不支持时返回 False"""
+        return False
+
+    def stop_watching(self):
+        """注销设备变化通知"""
+
+
+class _Endpoint:
+    """一个已激活设备的接口集合（峰值表、音量接口、声道缓冲区、音量缓存）"""
+
+    def __init__(self, device_id, meter, volume, channel_meter=None):
+        self.device_id = device_id
+        self.meter = meter
+        self.volume = volume
+        # 同一峰值表对象按原始签名声明的接口，用于一次读取所有声道
+        self.channel_meter = channel_meter
+        # 声道峰值缓冲区，按声道数分配并在每次读取时复用
+        self.channel_peaks = (c_float * meter.GetMeteringChannelCount())()
+        # 由音量变化通知维护的主音量缓存，None 表示需要直接读取
+        self.cached_volume = None
+        self.volume_callback = None
+
+
+class PycawBackend(AudioBackend):
+    """基于 pycaw 的 Windows 音频后端
+
+    已激活的设备接口按设备ID缓存，切换回用过的设备时无需重新激活。
+    当前设备整体保存在 self.endpoint 中，切换设备是一次引用赋值，
+    其他线程读取时看到的要么是旧设备要么是新设备。
+    """
+
+    name = 'pycaw'
+
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger('OfficeGuardian.AudioBackend')
+        self.os_type = platform.system()
+        self.endpoint = None
+        self._endpoints = {}
+        self._notification_client = None
+        # 记录各线程是否由 init_thread 成功初始化了COM
+        self._com_state = threading.local()
+
+    def open(self, device_id=None):
+        """根据设备ID激活峰值表和音量接口，失败时回退到默认设备
+
+        已激活过的设备直接从缓存取用，重复打开同一设备的代价很小。
+        """
+        if self.os_type != 'Windows':
+            self.logger.error(f"不支持的操作系统: {self.os_type}")
+            self.endpoint = None
+            return self.device_id
+
+        try:
+            if device_id is None:
+                # 使用默认音频设备
+                speakers = AudioUtilities.GetSpeakers()
+                self.logger.debug("使用默认音频设备")
+            else:
+                # 按ID直接获取设备，不再遍历全部设备
+                try:
+                    speakers = AudioUtilities.GetDeviceEnumerator().GetDevice(device_id)
+                    if speakers.GetState() != DEVICE_STATE_ACTIVE:
+                        raise RuntimeError("设备未启用")
+                    self.logger.debug(f"使用设备ID: {device_id}")
+                except Exception as e:
+                    # 找不到指定设备，使用默认设备
+                    self.logger.warning(f"找不到设备ID {device_id}，使用默认设备: {e}")
+                    speakers = AudioUtilities.GetSpeakers()
+
+            self.endpoint = self._get_endpoint(speakers)
+            self.device_id = self.endpoint.device_id
+            self.logger.debug(f"音频接口已初始化，设备ID: {self.device_id}")
+
+        except Exception as e:
+            self.logger.error(f"设置音频接口失败: {str(e)}")
+            self.logger.debug("尝试回退到默认设备")
+            try:
+                self.endpoint = self._get_endpoint(AudioUtilities.GetSpeakers())
+                self.device_id = self.endpoint.device_id
+                self.logger.warning("已回退到默认音频设备")
+            except Exception as e2:
+                self.logger.error(f"回退到默认设备也失败: {str(e2)}")
+                self.endpoint = None
+        finally:
+            self.logger.debug("音频接口设置完成")
+
+        return self.device_id
+
+    def _get_endpoint(self, speakers):
+        """获取设备的接口集合，已激活过的设备直接使用缓存"""
+        device_id = speakers.GetId()
+        endpoint = self._endpoints.get(device_id)
+        if endpoint is not None:
+            return endpoint
+
+        interface = speakers.Activate(
+            IAudioMeterInformation._iid_, CLSCTX_ALL, None)
+        meter = interface.QueryInterface(IAudioMeterInformation)
+
+        volume_interface = speakers.Activate(
+            IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        volume = cast(volume_interface, POINTER(IAudioEndpointVolume))
+
+        endpoint = _Endpoint(device_id, meter, volume, meter.QueryInterface(_IAudioMeterChannels))
+        self._register_volume_callback(endpoint)
+        self._endpoints[device_id] = endpoint
+        return endpoint
+
+    def _register_volume_callback(self, endpoint):
+        """注册音量变化通知，之后 get_volume 直接返回缓存值"""
+        if AudioEndpointVolumeCallback is None:
+            return
+        try:
+            callback = _VolumeCacheCallback(endpoint)
+            endpoint.volume.RegisterControlChangeNotify(callback)
+            endpoint.volume_callback = callback
+            endpoint.cached_volume = endpoint.volume.GetMasterVolumeLevelScalar()
+        except Exception as e:
+            self.logger.warning(f"注册音量变化通知失败，改为轮询音量: {e}")
+            endpoint.volume_callback = None
+            endpoint.cached_volume = None
+
+    def _release_endpoint(self, endpoint):
+        if endpoint.volume_callback is not None:
+            try:
+                endpoint.volume.UnregisterControlChangeNotify(endpoint.volume_callback)
+            except Exception as e:
+                self.logger.debug(f"注销音量变化通知失败: {e}")
+        endpoint.volume_callback = None
+        endpoint.cached_volume = None
+
+    def forget(self, device_id):
+        """丢弃设备的缓存接口（设备被移除时调用）"""
+        endpoint = self._endpoints.pop(device_id, None)
+        if endpoint is not None:
+            self._release_endpoint(endpoint)
+            if endpoint is self.endpoint:
+                self.endpoint = None
+
+    def init_thread(self):
+        """在当前线程中初始化COM（多线程套间）
+
+        未初始化COM的线程创建设备枚举器或激活接口会失败（CO_E_NOTINITIALIZED）。
+        """
+        if self.os_type != 'Windows' or getattr(self._com_state, 'initialized', False):
+            return
+        try:
+            comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+            self._com_state.initialized = True
+        except OSError as e:
+            # 线程已按其他套间模式初始化过COM，可以直接使用
+            self.logger.debug(f"当前线程已初始化COM: {e}")
+
+    def exit_thread(self):
+        if getattr(self._com_state, 'initialized', False):
+            self._com_state.initialized = False
+            comtypes.CoUninitialize()
+
+    def close(self):
+        self.stop_watching()
+        for endpoint in self._endpoints.values():
+            self._release_endpoint(endpoint)
+        self._endpoints.clear()
+        self.endpoint = None
+
+    def watch(self, listener):
+        """注册设备变化通知（IMMNotificationClient），事件转发给 listener
+
+        listener 需提供 on_default_device_changed(device_id)、on_device_added(device_id)
+        和 on_device_removed(device_id)，这些方法在COM通知线程中调用。
+        """
+        if self.os_type != 'Windows' or MMNotificationClient is None:
+            self.logger.warning("当前 pycaw 不支持设备变化通知")
+            return False
+        try:
+            self._notification_client = _DeviceNotificationClient(listener)
+            AudioUtilities.GetDeviceEnumerator().RegisterEndpointNotificationCallback(
+                self._notification_client)
+            return True
+        except Exception as e:
+            self.logger.warning(f"注册设备变化通知失败: {e}")
+            self._notification_client = None
+            return False
+
+    def stop_watching(self):
+        """注销设备变化通知"""
+        if self._notification_client is not None:
+            try:
+                AudioUtilities.GetDeviceEnumerator().UnregisterEndpointNotificationCallback(
+                    self._notification_client)
+            except Exception as e:
+                self.logger.debug(f"注销设备变化通知失败: {e}")
+            self._notification_client = None
+
+    def is_ready(self):
+        return self.endpoint is not None
+
+    def get_peak(self):
+        return self.endpoint.meter.GetPeakValue()
+
+    def get_channel_count(self):
+        return len(self.endpoint.channel_peaks)
+
+    def get_channel_peaks(self):
+        endpoint = self.endpoint
+        peaks = endpoint.channel_peaks
+        # 一次COM调用把所有声道的峰值写入复用的缓冲区
+        endpoint.channel_meter.GetChannelsPeakValues(len(peaks), peaks)
+        return peaks
+
+    def get_volume(self):
+        endpoint = self.endpoint
+        volume = endpoint.cached_volume
+        if volume is not None:
+            return volume
+        return endpoint.volume.GetMasterVolumeLevelScalar()
+
+    def get_volume_db(self):
+        return self.endpoint.volume.GetMasterVolumeLevel()
+
+    def set_volume(self, volume_level):
+        endpoint = self.endpoint
+        endpoint.volume.SetMasterVolumeLevelScalar(volume_level, None)
+        if endpoint.volume_callback is not None:
+            endpoint.cached_volume = volume_level
+
+    def list_devices(self):
+        if self.os_type != 'Windows':
+            return []
+        devices = []
+        for device in AudioUtilities.GetAllDevices():
+            try:
+                devices.append((device.id, device.FriendlyName))
+            except Exception as e:
+                self.logger.warning(f"读取设备信息失败: {e}")
+        return devices
+
+
+class FakeBackend(AudioBackend):
+    """确定性的内存音频后端，用于无音频硬件的环境（测试、性能分析、基准测试）
+
+    Args:
+        peaks: 峰值序列（循环读取）或 callable(index) -> 峰值，
+            每个峰值可以是单个数值（所有声道相同）或各声道峰值的序列
+        volume: 初始主音量 (0.0 到 1.0)
+        channels: 声道数
+        devices: 设备列表 [(设备ID, 设备名称), ...]
+    """
+
+    name = 'fake'
+
+    def __init__(self, peaks=None, volume=0.5, channels=2, devices=None):
+        super().__init__()
+        self.peaks = peaks if peaks is not None else [0.0]
+        self.volume = volume
+        self.channels = channels
+        self._channel_peaks = [0.0] * channels
+        self.devices = devices if devices is not None else [('fake-0', '虚拟扬声器')]
+        self.default_id = self.devices[0][0]
+        self.listener = None
+        self.ready = False
+        self.index = 0
+        # 调用过 init_thread 且尚未 exit_thread 的线程
+        self.initialized_threads = set()
+        # 调用计数，用于统计“硬件”访问次数
+        self.peak_reads = 0
+        self.volume_reads = 0
+        self.volume_writes = 0
+
+    def open(self, device_id=None):
+        ids = [dev_id for dev_id, _ in self.devices]
+        self.device_id = device_id if device_id in ids else self.default_id
+        self.ready = True
+        return self.device_id
+
+    def close(self):
+        self.ready = False
+
+    def is_ready(self):
+        return self.ready
+
+    def _next_peak(self):
+        if callable(self.peaks):
+            peak = self.peaks(self.index)
+        else:
+            peak = self.peaks[self.index % len(self.peaks)]
+        self.index += 1
+        return peak
+
+    def get_peak(self):
+        self.peak_reads += 1
+        peak = self._next_peak()
+        return max(peak) if isinstance(peak, (list, tuple)) else peak
+
+    def get_channel_count(self):
+        return self.channels
+
+    def get_channel_peaks(self):
+        self.peak_reads += 1
+        peak = self._next_peak()
+        peaks = self._channel_peaks
+        for i in range(self.channels):
+            peaks[i] = peak[i] if isinstance(peak, (list, tuple)) else peak
+        return peaks
+
+    def get_volume(self):
+        self.volume_reads += 1
+        return self.volume
+
+    def get_volume_db(self):
+        self.volume_reads += 1
+        return 20 * math.log10(self.volume) if self.volume > 0 else -100.0
+
+    def set_volume(self, volume_level):
+        self.volume_writes += 1
+        self.volume = volume_level
+
+    def list_devices(self):
+        return list(self.devices)
+
+    def init_thread(self):
+        self.initialized_threads.add(threading.get_ident())
+
+    def exit_thread(self):
+        self.initialized_threads.discard(threading.get_ident())
+
+    def watch(self, listener):
+        self.listener = listener
+        return True
+
+    def stop_watching(self):
+        self.listener = None
+
+    # 以下方法模拟系统设备变化，并像真实通知一样回调监听者
+
+    def add_device(self, device_id, name):
+        self.devices.append((device_id, name))
+        if self.listener:
+            self.listener.on_device_added(device_id)
+
+    def remove_device(self, device_id):
+        self.devices = [dev for dev in self.devices if dev[0] != device_id]
+        if self.default_id == device_id and self.devices:
+            self.default_id = self.devices[0][0]
+        if self.listener:
+            self.listener.on_device_removed(device_id)
+
+    def set_default(self, device_id):
+        self.default_id = device_id
+        if self.listener:
+            self.listener.on_default_device_changed(device_id)
@@ -0,0 +1,358 @@
+"""控制回路的批量仿真（NumPy）
+
+同一段峰值序列上同时推进多个仿真房间（每行一组参数），每个采样周期对所有房间做一次向量运算，
+用于快速评估大量参数组合。模型与程序运行时的逻辑一致：
+
+    AudioAnalyzer._process_sample（峰值 × 音量的判断窗口滑动平均，单声道峰值模式）
+    DecisionKernel.step（线性幅度域的阈值和持续时间判断）
+    VolumeController.adjust_volume_for_db 的 step 模式（dB 差 / 20 × k，小于 1dB 不调整）
+
+判断窗口的成员只取决于时间戳和是否有峰值（与音量无关），因此用 MultiWindowAccumulator
+预先算出每个周期淘汰哪些采样，所有房间共用；每个房间只维护自己的累加和。
+
+cross_check() 把结果与逐个采样的标量实现（utils.trace.replay）逐项对比。
+
+用法:
+    python -m utils.batch_sim            随机参数的批量仿真与标量实现的对比
+"""
+import sys
+import math
+import numpy as np
+from utils.accumulator import MultiWindowAccumulator
+from utils.decision import db_to_level, FLOOR_DB
+
+# 步进调节的音量下限（与 PIController 的默认 min_volume 相同）
+MIN_VOLUME = 0.01
+
+# 每行可以不同的配置项；其余配置项（判断窗口、采样率等）所有房间共用
+PARAMS = ('max_db', 'min_db', 'audio_threshold', 'interval_max', 'interval_min', 'volume_change_k')
+
+
+def _level_to_db(level):
+    """level_to_db 的向量版本"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(level > 0, 20 * np.log10(level), FLOOR_DB)
+
+
+class _ScheduleAccumulator(MultiWindowAccumulator):
+    """记录是否发生了重新求和的累加器（只用于计算窗口成员）"""
+
+    resummed = False
+
+    def _resum(self):
+        self.resummed = True
+        super()._resum()
+
+
+def window_schedule(timestamps, peaks, config):
+    """计算判断窗口在每个周期的变化
+
+    Returns:
+        list: 每个周期一项；无峰值时为 None，否则为
+            (写入位置的累计序号, 是否因容量淘汰, 淘汰后的窗口起点, 是否重新求和)
+    """
+    windows = config.loudness_windows
+    capacity = int(math.ceil(max(windows) * config.sample_rate_active * 1.5)) + 1
+    accumulator = _ScheduleAccumulator(windows, capacity)
+    window = accumulator.window_index(config.average_window)
+    schedule = []
+    for timestamp, peak in zip(timestamps, peaks):
+        if not peak > 0:
+            schedule.append(None)
+            continue
+        head = accumulator._head
+        evict_full = head - accumulator._starts[window] >= capacity
+        accumulator.resummed = False
+        accumulator.append(timestamp, 0.0)
+        schedule.append((head, evict_full, accumulator._starts[window], accumulator.resummed))
+    return schedule, capacity
+
+
+class BatchSimulator:
+    """批量仿真多个房间
+
+    Args:
+        config: 基础配置（未在 params 中给出的参数和共用参数取自这里）
+        params: {配置项: 每行的取值序列或单个值}，配置项见 PARAMS
+        rooms: 房间数（params 中都是单个值时使用）
+        volume: 初始音量（单个值或每行的序列）
+    """
+
+    def __init__(self, config, params=None, rooms=None, volume=0.8):
+        params = params or {}
+        unknown = set(params) - set(PARAMS)
+        if unknown:
+            raise ValueError(f"不支持的参数: {', '.join(sorted(unknown))}")
+        if config.control_mode != 'step':
+            raise ValueError("批量仿真只支持 step 调节模式")
+        sizes = {len(value) for value in params.values() if np.ndim(value) == 1}
+        if len(sizes) > 1:
+            raise ValueError("各参数的行数不一致")
+        self.rooms = sizes.pop() if sizes else (rooms or 1)
+        self.config = config
+
+        def column(key):
+            value = params.get(key, getattr(config, key))
+            return np.broadcast_to(np.asarray(value, dtype=float), (self.rooms,)).copy()
+
+        self.params = {key: column(key) for key in PARAMS}
+        # 阈值与标量实现一样用 db_to_level 逐个换算，保证比较结果一致
+        self.max_level = np.array([db_to_level(db) for db in self.params['max_db']])
+        self.min_level = np.array([db_to_level(db) for db in self.params['min_db']])
+        self.threshold = np.array([db_to_level(db) for db in self.params['audio_threshold']])
+        self.initial_volume = np.broadcast_to(np.asarray(volume, dtype=float), (self.rooms,)).copy()
+
+    def run(self, timestamps, peaks, target_max=None, target_min=None, record=False):
+        """在峰值序列上推进所有房间
+
+        Args:
+            timestamps: 采样时间（秒）
+            peaks: 原始峰值（线性幅度）
+            target_max / target_min: 评分用的目标范围，默认为基础配置的 max_db / min_db
+            record: 是否返回每个周期的输出响度和音量（周期数 × 房间数）
+
+        Returns:
+            dict: 每个房间的 volume（最终音量）, adjustments, over_max / under_min（事件数）,
+                out_of_band_over / out_of_band_under（按各自阈值的越界时长）,
+                playing / outside / overshoot（按目标范围，与 utils.tuner.score_trajectory 相同）
+                record 时另有 output_db, volumes
+        """
+        timestamps = np.asarray(timestamps, dtype=float)
+        peaks = np.asarray(peaks, dtype=float)
+        ticks = len(timestamps)
+        rooms = self.rooms
+        config = self.config
+        target_max = config.max_db if target_max is None else target_max
+        target_min = config.min_db if target_min is None else target_min
+
+        schedule, capacity = window_schedule(timestamps.tolist(), peaks.tolist(), config)
+        ring = np.zeros((capacity, rooms))
+        sums = np.zeros(rooms)
+        start = 0
+
+        max_level = self.max_level
+        min_level = self.min_level
+        threshold = self.threshold
+        interval_max = self.params['interval_max']
+        interval_min = self.params['interval_min']
+        k = self.params['volume_change_k']
+        max_db = self.params['max_db']
+        min_db = self.params['min_db']
+
+        volume = self.initial_volume.copy()
+        over_duration = np.zeros(rooms)
+        under_duration = np.zeros(rooms)
+        adjustments = np.zeros(rooms, dtype=np.int64)
+        over_events = np.zeros(rooms, dtype=np.int64)
+        under_events = np.zeros(rooms, dtype=np.int64)
+        out_over = np.zeros(rooms)
+        out_under = np.zeros(rooms)
+        outside = np.zeros(rooms)
+        overshoot = np.zeros(rooms)
+        playing_time = np.zeros(rooms)
+        if record:
+            output_db = np.empty((ticks, rooms))
+            volumes = np.empty((ticks, rooms))
+
+        previous = timestamps[0] if ticks else 0.0
+        for i in range(ticks):
+            timestamp = timestamps[i]
+            peak = peaks[i]
+            dt = timestamp - previous
+            previous = timestamp
+
+            # 判断窗口内的平均输出电平（与 MultiWindowAccumulator 的累加顺序相同）
+            entry = schedule[i]
+            if entry is None:
+                # 没有峰值：电平为 0，不可能有音频，持续时间清零
+                over_duration.fill(0.0)
+                under_duration.fill(0.0)
+                if record:
+                    output_db[i] = FLOOR_DB
+                    volumes[i] = volume
+                continue
+            head, evict_full, new_start, resummed = entry
+            index = head % capacity
+            if evict_full:
+                sums -= ring[index]
+                start += 1
+            np.multiply(volume, peak, out=ring[index])
+            sums += ring[index]
+            while start < new_start:
+                sums -= ring[start % capacity]
+                start += 1
+            if resummed:
+                sums = ring[np.arange(start, head + 1) % capacity].sum(axis=0)
+            level = sums / (head + 1 - start)
+
+            # DecisionKernel.step
+            playing = peak > threshold
+            over = playing & (level > max_level)
+            under = playing & (level < min_level)
+            under &= ~over
+            over_duration += dt
+            over_duration *= over
+            under_duration += dt
+            under_duration *= under
+            fire_over = over_duration >= interval_max
+            fire_over &= over
+            fire_under = under_duration >= interval_min
+            fire_under &= under
+
+            # adjust_volume_for_db（step 模式）
+            fire = fire_over | fire_under
+            if fire.any():
+                over_duration[fire_over] = 0.0
+                under_duration[fire_under] = 0.0
+                over_events += fire_over
+                under_events += fire_under
+                rows = np.flatnonzero(fire)
+                current_db = _level_to_db(level[rows])
+                target = np.where(fire_over[rows], max_db[rows], min_db[rows])
+                db_diff = target - current_db
+                act = np.abs(db_diff) >= 1.0
+                rows = rows[act]
+                new_volume = np.clip(volume[rows] + db_diff[act] / 20.0 * k[rows], MIN_VOLUME, 1.0)
+                # 与当前音量相差不到 0.0005 时不写入
+                write = np.abs(new_volume - volume[rows]) >= 0.0005
+                volume[rows[write]] = new_volume[write]
+                adjustments[rows] += 1
+
+            # 统计（状态按调整前的电平，与快照一致）
+            np.add(out_over, dt, out=out_over, where=over)
+            np.add(out_under, dt, out=out_under, where=under)
+            np.add(playing_time, dt, out=playing_time, where=playing)
+            db = _level_to_db(level)
+            above = playing & (db > target_max)
+            below = playing & (db < target_min)
+            np.add(outside, dt, out=outside, where=above | below)
+            np.add(overshoot, (db - target_max) * dt, out=overshoot, where=above)
+            np.add(overshoot, (target_min - db) * dt, out=overshoot, where=below)
+            if record:
+                output_db[i] = db
+                volumes[i] = volume
+
+        result = {
+            'volume': volume,
+            'adjustments': adjustments,
+            'over_max': over_events,
+            'under_min': under_events,
+            'out_of_band_over': out_over,
+            'out_of_band_under': out_under,
+            'playing': playing_time,
+            'outside': outside,
+            'overshoot': overshoot,
+        }
+        if record:
+            result['output_db'] = output_db
+            result['volumes'] = volumes
+        return result
+
+
+def cross_check(timestamps, peaks, config, params, rows=None, volume=0.8):
+    """把批量仿真与标量实现（utils.trace.replay）逐行对比
+
+    Args:
+        rows: 参与对比的行号（默认全部）
+
+    Returns:
+        dict: 各项的最大偏差（事件数和调整次数为整数差，音量和响度为绝对误差）
+    """
+    from utils.audio_backend import AudioSample
+    from utils.trace import replay
+    from utils.tuner import score_trajectory
+
+    simulator = BatchSimulator(config, params, volume=volume)
+    batch = simulator.run(timestamps, peaks, record=True)
+    rows = range(simulator.rooms) if rows is None else rows
+    base = {key: getattr(config, key) for key in PARAMS}
+    deviation = {'adjustments': 0, 'events': 0, 'volume': 0.0, 'output_db': 0.0, 'out_of_band': 0.0,
+                 'score': 0.0}
+    for row in rows:
+        for key in PARAMS:
+            setattr(config, key, float(simulator.params[key][row]))
+        samples = [AudioSample(float(peak), float(simulator.initial_volume[row]), float(timestamp))
+                   for timestamp, peak in zip(timestamps, peaks)]
+        result = replay(samples, config)
+        trajectory = result['trajectory']
+        scalar_db = np.array([point[1] for point in trajectory])
+        scalar_volume = np.array([point[2] for point in trajectory])
+        deviation['adjustments'] = max(deviation['adjustments'],
+                                       abs(result['adjustments'] - int(batch['adjustments'][row])))
+        deviation['events'] = max(deviation['events'],
+                                  abs(result['events']['over_max'] - int(batch['over_max'][row])),
+                                  abs(result['events']['under_min'] - int(batch['under_min'][row])))
+        # 快照中的音量是该周期开始时的音量，批量仿真记录的是调整后的音量
+        batch_volume = np.concatenate(([simulator.initial_volume[row]], batch['volumes'][:-1, row]))
+        deviation['volume'] = max(deviation['volume'], float(np.max(np.abs(scalar_volume - batch_volume))))
+        deviation['output_db'] = max(deviation['output_db'],
+                                     float(np.max(np.abs(scalar_db - batch['output_db'][:, row]))))
+        deviation['out_of_band'] = max(
+            deviation['out_of_band'],
+            abs(result['out_of_band']['over_max'] - float(batch['out_of_band_over'][row])),
+            abs(result['out_of_band']['under_min'] - float(batch['out_of_band_under'][row])))
+        scores = score_trajectory(trajectory, base['max_db'], base['min_db'])
+        for key, value in zip(('playing', 'outside', 'overshoot'), scores):
+            deviation['score'] = max(deviation['score'], abs(value - float(batch[key][row])))
+    for key in PARAMS:
+        setattr(config, key, base[key])
+    return deviation
+
+
+def synthetic_signal(seconds=600.0, dt=0.05, seed=0):
+    """合成测试信号：响度随机跳变的节目片段，中间夹着静音"""
+    rng = np.random.default_rng(seed)
+    ticks = int(seconds / dt)
+    timestamps = np.arange(ticks) * dt
+    segment = int(30 / dt)
+    levels = rng.choice([0.0, 0.02, 0.1, 0.3, 0.6, 0.95], size=ticks // segment + 1)
+    peaks = np.repeat(levels, segment)[:ticks] * (1 + 0.3 * np.sin(np.arange(ticks) / 7.0))
+    return timestamps, peaks
+
+
+def main(argv=None):
+    import time
+    import logging
+    import argparse
+    import tempfile
+    from utils.config import Config
+
+    parser = argparse.ArgumentParser(description='办公室的大盾 - 批量仿真与标量实现的对比')
+    parser.add_argument('--rooms', type=int, default=1000, help='仿真房间数（随机参数）')
+    parser.add_argument('--seconds', type=float, default=600.0, help='合成信号时长（秒）')
+    parser.add_argument('--check', type=int, default=20, help='与标量实现对比的行数')
+    args = parser.parse_args(argv)
+
+    logging.getLogger('OfficeGuardian').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = Config(temp_dir)
+        rng = np.random.default_rng(1)
+        params = {
+            'interval_max': rng.integers(1, 6, args.rooms).astype(float),
+            'interval_min': rng.integers(2, 16, args.rooms).astype(float),
+            'volume_change_k': rng.uniform(0.1, 0.4, args.rooms).round(3),
+            'max_db': rng.uniform(-16, -6, args.rooms).round(2),
+            'min_db': rng.uniform(-45, -30, args.rooms).round(2),
+        }
+        timestamps, peaks = synthetic_signal(args.seconds)
+
+        start = time.perf_counter()
+        result = BatchSimulator(config, params).run(timestamps, peaks)
+        elapsed = time.perf_counter() - start
+        print(f"批量仿真: {args.rooms} 个房间 x {len(timestamps)} 个周期 ({args.seconds:.0f}s 信号), "
+              f"耗时 {elapsed:.2f}s, 每个房间 {elapsed / args.rooms * 1000:.2f} ms "
+              f"({args.seconds * args.rooms / elapsed:.0f}x 实时)")
+        print(f"  平均调整 {result['adjustments'].mean():.1f} 次, 平均最终音量 {result['volume'].mean():.3f}")
+
+        start = time.perf_counter()
+        deviation = cross_check(timestamps, peaks, config, params, rows=range(min(args.check, args.rooms)))
+        elapsed = time.perf_counter() - start
+        print(f"与标量实现对比 {min(args.check, args.rooms)} 行 (标量每行 {elapsed / max(1, args.check) * 1000:.0f} ms): "
+              f"调整次数差 {deviation['adjustments']}, 事件数差 {deviation['events']}, "
+              f"音量误差 {deviation['volume']:.2e}, 响度误差 {deviation['output_db']:.2e} dB, "
+              f"越界时长误差 {deviation['out_of_band']:.2e}s, 评分统计误差 {deviation['score']:.2e}")
+        return 0 if deviation['adjustments'] == 0 and deviation['events'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,653 @@
+"""性能基准测试
+
+用法:
+    python -m utils.benchmark            运行全部基准测试
+    python -m utils.benchmark capture    只运行指定的基准测试
+"""
+import sys
+import time
+import argparse
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """注册基准测试函数"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+@benchmark('capture')
+def bench_capture(seconds=60.0, samplerate=48000, channels=2, blocksize=480):
+    """回环采集回调的CPU开销（不打开真实音频流，直接喂入合成采样块）"""
+    import numpy as np
+    from utils.capture import LoopbackCapture
+
+    capture = LoopbackCapture(blocksize=blocksize)
+    capture.allocate(samplerate, channels)
+    rng = np.random.default_rng(0)
+    block = (rng.standard_normal((blocksize, channels)) * 0.1).astype(np.float32)
+
+    blocks = int(seconds * samplerate / blocksize)
+    start = time.perf_counter()
+    for i in range(blocks):
+        capture._callback(block, blocksize, None, None)
+        if i % 5 == 4:  # 模拟分析线程以 20Hz 读取
+            capture.read_levels()
+    elapsed = time.perf_counter() - start
+
+    stats = capture.get_stats()
+    print(f"capture: {blocks} 块 x {blocksize} 帧, {channels} 声道 {samplerate}Hz")
+    print(f"  每块 {elapsed / blocks * 1e6:.1f} us, "
+          f"CPU占用 {stats['cpu_load'] * 100:.3f}% (单核，相对实时)")
+
+
+@benchmark('lufs')
+def bench_lufs(seconds=60.0, samplerate=48000, channels=2, blocksize=4800):
+    """BS.1770 响度计处理立体声采样的吞吐量"""
+    import numpy as np
+    from utils.lufs import LufsMeter
+
+    meter = LufsMeter(samplerate, channels)
+    rng = np.random.default_rng(0)
+    block = rng.standard_normal((blocksize, channels)) * 0.1
+
+    blocks = int(seconds * samplerate / blocksize)
+    start = time.perf_counter()
+    for _ in range(blocks):
+        meter.process(block)
+        meter.short_term()
+    elapsed = time.perf_counter() - start
+
+    print(f"lufs: {seconds:.0f}s 音频, {channels} 声道 {samplerate}Hz, 块长 {blocksize} 帧")
+    print(f"  耗时 {elapsed * 1000:.1f} ms, {seconds / elapsed:.0f}x 实时, "
+          f"CPU占用 {elapsed / seconds * 100:.2f}% (单核), 综合响度 {meter.integrated():.2f} LUFS")
+
+
+def simulate_control(config, levels, dt=0.05, volume=0.8):
+    """用虚拟时钟离线运行分析器和音量控制，返回每个采样的 (时间, 输出响度, 音量) 与调整次数
+
+    levels 为每个采样的原始峰值序列。
+    """
+    from utils.audio_backend import AudioSample, FakeBackend
+    from utils.audio_analyzer import AudioAnalyzer
+    from utils.volume_controller import VolumeController
+    from utils.metrics import MetricsRegistry
+
+    now = [0.0]
+    # 离线仿真中同步写入音量，不使用渐变执行线程；指标记在独立的注册表中
+    config.volume_ramp = False
+    backend = FakeBackend(volume=volume)
+    registry = MetricsRegistry()
+    controller = VolumeController(config, backend, clock=lambda: now[0], registry=registry)
+    analyzer = AudioAnalyzer(config, backend, registry=registry)
+
+    def on_event(event_type, current_db):
+        target = config.max_db if event_type == 'over_max' else config.min_db
+        controller.adjust_volume_for_db(current_db, target)
+
+    analyzer.callback = on_event
+    analyzer.last_check_time = 0.0
+    trajectory = []
+    for i, level in enumerate(levels):
+        now[0] = i * dt
+        analyzer.process_tick(AudioSample(level, backend.volume, now[0]))
+        trajectory.append((now[0], analyzer.current_db, backend.volume))
+    return trajectory, controller.adjust_count
+
+
+@benchmark('controller')
+def bench_controller(dt=0.05):
+    """固定步进与PI控制在合成响度阶跃下的收敛对比"""
+    import logging
+    import tempfile
+    from utils.config import Config
+
+    logging.getLogger('OfficeGuardian').setLevel(logging.WARNING)
+    # 每段 40 秒：过响 -> 过轻 -> 适中 -> 过响
+    segments = [0.9, 0.02, 0.3, 0.6]
+    per_segment = int(40 / dt)
+    levels = [level for level in segments for _ in range(per_segment)]
+
+    print(f"controller: {len(segments)} 段响度阶跃，每段 {per_segment * dt:.0f}s")
+    for mode in ('step', 'pi'):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = Config(temp_dir)
+            config.control_mode = mode
+            trajectory, adjustments = simulate_control(config, levels, dt)
+
+        settle_times = []
+        out_of_band = 0.0
+        for segment in range(len(segments)):
+            rows = trajectory[segment * per_segment:(segment + 1) * per_segment]
+            settled = None
+            for t, db, _ in rows:
+                inside = config.min_db <= db <= config.max_db
+                if not inside:
+                    out_of_band += dt
+                    settled = None
+                elif settled is None:
+                    settled = t - rows[0][0]
+            settle_times.append('-' if settled is None else f"{settled:.1f}s")
+        print(f"  {mode:>4}: 调整 {adjustments:3d} 次, 范围外 {out_of_band:5.1f}s, "
+              f"各段进入范围用时 {' / '.join(settle_times)}")
+
+
+class _ReferenceTick:
+    """改为线性域判断内核之前的每周期处理，作为对比基准
+
+    与改造前的 AudioAnalyzer.process_tick/_process_sample 相同：numpy 标量对数、
+    分贝域比较、每次读取配置，并按分贝值发布状态快照。
+    """
+
+    def __init__(self, config, accumulator, window):
+        import numpy as np
+        from collections import namedtuple
+        self.np = np
+        self.snapshot_type = namedtuple('Snapshot', ['current_db', 'real_db', 'volume', 'state', 'timestamp'])
+        self.config = config
+        self.loudness = accumulator
+        self.decision_window = window
+        self.lufs = None
+        self.real_db = self.current_db = self.current_average_db = -100.0
+        self.is_audio_playing = False
+        self.over_max_duration = 0
+        self.under_min_duration = 0
+        self.last_check_time = 0.0
+        self.callback = None
+        self.snapshot = None
+        self.snapshot_listeners = []
+
+    def process_tick(self, sample):
+        self.decide(sample, *self._process_sample(sample))
+
+    def _process_sample(self, sample):
+        np = self.np
+        if sample.peak > 0:
+            self.real_db = 20 * np.log10(sample.peak)
+            level = sample.rms if sample.rms is not None else sample.peak
+            self.loudness.append(sample.timestamp, level * sample.volume)
+            self.current_average_db = self.loudness.mean_db(self.decision_window)
+            if self.lufs is not None:
+                short_term = self.lufs.short_term()
+                if short_term > -100.0 and sample.volume > 0:
+                    self.current_average_db = short_term + 20 * np.log10(sample.volume)
+                else:
+                    self.current_average_db = -100.0
+            self.current_db = self.current_average_db
+        else:
+            self.real_db = -100.0
+            self.current_db = -100.0
+        return self.real_db, self.current_db
+
+    def decide(self, sample, real_db=None, output_db=None):
+        if real_db is None:
+            # 只测判断步骤时，按改造前的方式从累加器换算分贝值
+            real_db = 20 * self.np.log10(sample.peak) if sample.peak > 0 else -100.0
+            output_db = self.loudness.mean_db(self.decision_window) if sample.peak > 0 else -100.0
+        current_time = sample.timestamp
+        if real_db > self.config.audio_threshold:
+            self.is_audio_playing = True
+            time_diff = current_time - self.last_check_time
+            if output_db > self.config.max_db:
+                self.over_max_duration += time_diff
+                self.under_min_duration = 0
+            elif output_db < self.config.min_db:
+                self.under_min_duration += time_diff
+                self.over_max_duration = 0
+            else:
+                self.over_max_duration = 0
+                self.under_min_duration = 0
+            if self.over_max_duration >= self.config.interval_max and self.callback:
+                self.callback("over_max", output_db)
+                self.over_max_duration = 0
+            elif self.under_min_duration >= self.config.interval_min and self.callback:
+                self.callback("under_min", output_db)
+                self.under_min_duration = 0
+        else:
+            self.is_audio_playing = False
+            self.over_max_duration = 0
+            self.under_min_duration = 0
+        self.last_check_time = current_time
+
+        if not self.is_audio_playing:
+            state = 'silent'
+        elif output_db > self.config.max_db:
+            state = 'over_max'
+        elif output_db < self.config.min_db:
+            state = 'under_min'
+        else:
+            state = 'normal'
+        snapshot = self.snapshot_type(output_db, real_db, sample.volume, state, sample.timestamp)
+        self.snapshot = snapshot
+        for listener in self.snapshot_listeners:
+            listener(snapshot)
+
+
+@benchmark('kernel')
+def bench_kernel(ticks=200000, dt=0.05):
+    """每个采样周期的开销（ns/周期）：改造前的分贝域实现 vs 线性域判断内核"""
+    import logging
+    import tempfile
+    from utils.config import Config
+    from utils.accumulator import MultiWindowAccumulator
+    from utils.audio_backend import AudioSample, FakeBackend
+    from utils.audio_analyzer import AudioAnalyzer
+    from utils.metrics import MetricsRegistry
+
+    logging.getLogger('OfficeGuardian').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = Config(temp_dir)
+        # 有音频和静音交替，过响时段足够长以触发调整事件
+        samples = [AudioSample(0.0 if i % 400 >= 300 else (0.9 if i % 800 < 400 else 0.3), 0.5, i * dt)
+                   for i in range(ticks)]
+
+        def run(process_tick):
+            start = time.perf_counter()
+            for sample in samples:
+                process_tick(sample)
+            return (time.perf_counter() - start) / ticks * 1e9
+
+        def best(process_tick):
+            return min(run(process_tick) for _ in range(3))
+
+        events = [0]
+
+        def on_event(event_type, current_db):
+            events[0] += 1
+
+        analyzer = AudioAnalyzer(config, FakeBackend(), registry=MetricsRegistry())
+        analyzer.callback = on_event
+        reference = _ReferenceTick(
+            config, MultiWindowAccumulator(analyzer.loudness.windows, analyzer.loudness.capacity),
+            analyzer.decision_window)
+        reference.callback = on_event
+
+        before = best(reference.process_tick)
+        after = best(analyzer.process_tick)
+        print(f"kernel: {ticks} 个采样, 每种实现取3次最好成绩, 共 {events[0] // 6} 次调整事件/轮")
+        print(f"  完整周期(含累加器): 改造前 {before:6.0f} ns, 改造后 {after:6.0f} ns (含快照发布)")
+
+        # 只比较判断步骤（累加器已填满，不再追加；不含快照发布）
+        kernel = analyzer.kernel
+        accumulator = analyzer.loudness
+        window = analyzer.decision_window
+        reference.snapshot_type = lambda *args: None
+        before = best(reference.decide)
+        after = best(lambda sample: kernel.step(sample.peak, accumulator.mean(window), sample.timestamp))
+        print(f"  判断步骤:           改造前 {before:6.0f} ns, 改造后 {after:6.0f} ns")
+
+
+@benchmark('control')
+def bench_control(clients=50, requests_per_client=200, seconds=2.0):
+    """本地控制接口负载测试：并发客户端的吞吐量和延迟，以及对分析线程采样抖动的影响"""
+    import asyncio
+    import json
+    import logging
+    import os
+    import tempfile
+    from utils.config import Config
+    from utils.audio_backend import FakeBackend
+    from utils.control import ControlServer, open_connection
+    from utils.engine import Engine
+    from utils.metrics import MetricsRegistry
+
+    logging.getLogger('OfficeGuardian').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = Config(temp_dir)
+        engine = Engine(config, FakeBackend(peaks=[0.3] * 1000), registry=MetricsRegistry())
+        address = None
+        if sys.platform != 'win32':
+            address = os.path.join(temp_dir, 'control.sock')
+        server = ControlServer(engine, address)
+        engine.start()
+        server.start()
+
+        # 空载时的采样抖动
+        time.sleep(seconds)
+        idle = engine.audio_analyzer.get_sampling_stats()
+
+        latencies = []
+
+        async def client(index):
+            reader, writer = await open_connection(server.address)
+            for i in range(requests_per_client):
+                cmd = 'set' if i % 50 == 49 else 'status'
+                message = {'cmd': cmd, 'id': i}
+                if cmd == 'set':
+                    message['values'] = {'max_db': -10.0 - (index % 3)}
+                start = time.perf_counter()
+                writer.write(json.dumps(message).encode() + b'\n')
+                await writer.drain()
+                response = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - start)
+                assert response['ok'] and response['id'] == i, response
+            writer.close()
+
+        async def load():
+            await asyncio.gather(*(client(i) for i in range(clients)))
+
+        engine.audio_analyzer.scheduler.start()  # 重置采样统计
+        start = time.perf_counter()
+        asyncio.run(load())
+        elapsed = time.perf_counter() - start
+        loaded = engine.audio_analyzer.get_sampling_stats()
+        server.stop()
+        engine.stop()
+        # set 命令安排的后台保存在删除临时目录之前完成
+        config.flush()
+
+        latencies.sort()
+        total = len(latencies)
+        print(f"control: {clients} 个并发客户端 x {requests_per_client} 个请求 (2% 为 set)")
+        print(f"  吞吐量 {total / elapsed:.0f} 请求/秒, 延迟 p50 {latencies[total // 2] * 1000:.2f} ms, "
+              f"p99 {latencies[int(total * 0.99)] * 1000:.2f} ms")
+        print(f"  分析线程采样: 空载 {idle['achieved_rate']:.1f}Hz 抖动 {idle['jitter'] * 1000:.2f}ms, "
+              f"负载 {loaded['achieved_rate']:.1f}Hz 抖动 {loaded['jitter'] * 1000:.2f}ms "
+              f"(最大 {loaded['max_jitter'] * 1000:.2f}ms, 错过 {loaded['missed']} 次)")
+
+
+@benchmark('metrics')
+def bench_metrics(calls=500000):
+    """指标更新的开销（ns/次）：计数器、直方图观测、分析线程每周期的全部埋点，以及一次抓取的耗时"""
+    from utils.metrics import MetricsRegistry, DURATION_BUCKETS
+
+    registry = MetricsRegistry()
+    counter = registry.counter('bench_total', '基准测试计数器')
+    histogram = registry.histogram('bench_seconds', '基准测试直方图')
+    values = [DURATION_BUCKETS[i % len(DURATION_BUCKETS)] * 0.7 for i in range(1000)]
+    perf_counter = time.perf_counter
+
+    def per_call(func):
+        best = None
+        for _ in range(3):
+            start = perf_counter()
+            func()
+            cost = (perf_counter() - start) / calls * 1e9
+            best = cost if best is None else min(best, cost)
+        return best
+
+    def empty():
+        for i in range(calls):
+            values[i % 1000]
+
+    def inc():
+        for i in range(calls):
+            values[i % 1000]
+            counter.inc()
+
+    def observe():
+        for i in range(calls):
+            histogram.observe(values[i % 1000])
+
+    def tick():
+        # 与 _analysis_loop 相同：3 次计时、2 次直方图、1 次计数器和超限时长
+        out_of_band = {'over_max': counter}
+        for i in range(calls):
+            started = perf_counter()
+            read_done = perf_counter()
+            histogram.observe(perf_counter() - started)
+            histogram.observe(read_done - started)
+            counter.inc()
+            c = out_of_band.get('normal')
+            if c is not None:
+                c.inc(0.05)
+
+    base = per_call(empty)
+    print(f"metrics: 每次操作取3次最好成绩 ({calls} 次)")
+    print(f"  计数器 inc {per_call(inc) - base:5.0f} ns, 直方图 observe {per_call(observe) - base:5.0f} ns, "
+          f"分析周期全部埋点 {per_call(tick) - base:5.0f} ns")
+
+    for i in range(30):
+        registry.counter('bench_labeled_total', '带标签的计数器', index=str(i)).inc(i)
+    start = perf_counter()
+    text = registry.render()
+    print(f"  抓取: {len(text.splitlines())} 行, {(perf_counter() - start) * 1000:.2f} ms")
+
+
+@benchmark('history')
+def bench_history(records=200000, days=7, interval=1.0):
+    """响度历史：每条记录的写入开销，以及读取一天 / 整个文件的耗时"""
+    import os
+    import tempfile
+    from utils.history import HistoryWriter, HistoryReader
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'loudness.ring')
+        capacity = int(days * 86400 / interval)
+        writer = HistoryWriter(path, capacity, interval)
+        now = time.time() - capacity * interval
+        # 先填满整个文件（首次写入每个页面时有缺页开销），再测量覆盖写入的开销
+        for i in range(capacity):
+            writer.append(now + i * interval, -20.0 - i % 30, 0.5, 'normal')
+        now += capacity * interval
+        start = time.perf_counter()
+        for i in range(records):
+            writer.append(now + i * interval, -20.0 - i % 30, 0.5, 'normal')
+        per_record = (time.perf_counter() - start) / records * 1e9
+        now += records * interval - capacity * interval
+
+        print(f"history: {capacity} 条记录 ({days} 天, 间隔 {interval}s), 文件 {os.path.getsize(path) / 1e6:.1f} MB")
+        print(f"  写入每条 {per_record:.0f} ns (只写内存映射，无系统调用)")
+        with HistoryReader(path) as reader:
+            start = time.perf_counter()
+            day = reader.read(since=now + (capacity - 86400 / interval) * interval)
+            one_day = time.perf_counter() - start
+            start = time.perf_counter()
+            everything = reader.read()
+            full = time.perf_counter() - start
+        print(f"  读取最近一天 {len(day)} 条 {one_day * 1000:.0f} ms, 全部 {len(everything)} 条 {full * 1000:.0f} ms")
+        writer.close()
+
+
+@benchmark('replay')
+def bench_replay(hours=1.0, dt=0.05):
+    """采样轨迹录制每个采样的开销，以及虚拟时钟回放相对实时的速度"""
+    import os
+    import math
+    import logging
+    import tempfile
+    from utils.config import Config
+    from utils.audio_backend import AudioSample
+    from utils.trace import TraceRecorder, read_trace, replay
+
+    logging.getLogger('OfficeGuardian').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'bench.ogtrace')
+        ticks = int(hours * 3600 / dt)
+        # 响、轻交替的节目，中间夹着静音
+        samples = []
+        for i in range(ticks):
+            level = 0.0 if (i // 2000) % 5 == 4 else (0.9 if (i // 6000) % 2 else 0.05)
+            samples.append(AudioSample(level * (1 + 0.3 * math.sin(i / 9)), 0.6, i * dt, None, [level, level * 0.5]))
+
+        recorder = TraceRecorder(path)
+        start = time.perf_counter()
+        for sample in samples:
+            recorder.record(sample)
+        recorder.close()
+        per_sample = (time.perf_counter() - start) / ticks * 1e9
+        print(f"replay: {hours:.1f} 小时 {1 / dt:.0f}Hz 立体声轨迹, {ticks} 个采样, "
+              f"文件 {os.path.getsize(path) / 1e6:.1f} MB, 录制每个采样 {per_sample:.0f} ns")
+
+        for mode in ('step', 'pi'):
+            config = Config(os.path.join(temp_dir, mode))
+            config.control_mode = mode
+            result = replay(read_trace(path)[1], config)
+            print(f"  {mode:4s}: 回放 {result['elapsed'] * 1000:.0f} ms ({result['speed']:.0f}x 实时), "
+                  f"调整 {result['adjustments']} 次, 过响 {result['out_of_band']['over_max']:.0f}s, "
+                  f"过轻 {result['out_of_band']['under_min']:.0f}s")
+
+
+@benchmark('batch')
+def bench_batch(hours=1.0, dt=0.05, rooms=(10, 100, 1000, 5000)):
+    """批量仿真每个房间的耗时随房间数的变化，与标量回放对比"""
+    import logging
+    import tempfile
+    import numpy as np
+    from utils.config import Config
+    from utils.audio_backend import AudioSample
+    from utils.trace import replay
+    from utils.batch_sim import BatchSimulator, synthetic_signal
+
+    logging.getLogger('OfficeGuardian').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = Config(temp_dir)
+        timestamps, peaks = synthetic_signal(hours * 3600, dt)
+        samples = [AudioSample(peak, 0.8, timestamp) for timestamp, peak in zip(timestamps.tolist(), peaks.tolist())]
+        scalar = replay(samples, config)['elapsed']
+        print(f"batch: {hours:.1f} 小时 {1 / dt:.0f}Hz 信号, {len(timestamps)} 个周期; 标量回放每个房间 {scalar * 1000:.0f} ms")
+        rng = np.random.default_rng(0)
+        for count in rooms:
+            params = {'interval_max': rng.integers(1, 6, count).astype(float),
+                      'volume_change_k': rng.uniform(0.1, 0.4, count)}
+            start = time.perf_counter()
+            BatchSimulator(config, params).run(timestamps, peaks)
+            elapsed = time.perf_counter() - start
+            print(f"  {count:5d} 个房间: {elapsed * 1000:7.0f} ms, 每个房间 {elapsed / count * 1000:8.2f} ms "
+                  f"(标量的 {scalar * count / elapsed:.1f} 倍)")
+
+
+@benchmark('quantile')
+def bench_quantile(samples=200000):
+    """校准用的流式分位数估计：每个采样的开销和与 numpy.percentile 的误差"""
+    import numpy as np
+    from utils.quantile import QuantileSketch
+
+    rng = np.random.default_rng(0)
+    # 两种节目混合的双峰分布
+    values = np.concatenate([rng.normal(-45, 4, samples // 3), rng.normal(-18, 5, samples - samples // 3)])
+    rng.shuffle(values)
+    values = values.tolist()
+
+    sketch = QuantileSketch()
+    start = time.perf_counter()
+    for value in values:
+        sketch.add(value)
+    per_sample = (time.perf_counter() - start) / samples * 1e9
+    start = time.perf_counter()
+    estimates = sketch.quantiles([5, 50, 95])
+    histogram = sketch.histogram(-80.0, 0.0, 80)
+    read = (time.perf_counter() - start) * 1000
+    reference = np.percentile(values, [5, 50, 95])
+    error = max(abs(a - b) for a, b in zip(estimates, reference))
+    print(f"quantile: {samples} 个采样, 每个采样 {per_sample:.0f} ns, {sketch.bins} 个分箱（内存固定）, "
+          f"读取分位数和直方图 {read:.2f} ms")
+    print(f"  5/50/95%: {' / '.join(f'{v:.2f}' for v in estimates)} dB, "
+          f"numpy.percentile {' / '.join(f'{v:.2f}' for v in reference)} dB, 最大误差 {error:.3f} dB, "
+          f"直方图合计 {sum(histogram)}")
+
+
+@benchmark('logging')
+def bench_logging(calls=200000, ticks=20000, dt=0.05):
+    """日志开销：被过滤的调试日志、每个采样周期的日志开销、队列与同步输出的调用方耗时"""
+    import os
+    import queue
+    import logging
+    import logging.handlers
+    import tempfile
+    from utils.config import Config
+    from utils.audio_backend import AudioSample, FakeBackend
+    from utils.audio_analyzer import AudioAnalyzer
+    from utils.logger import _QueueHandler
+    from utils.metrics import MetricsRegistry
+
+    logger = logging.getLogger('OfficeGuardian.Benchmark')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    value = -12.345
+
+    def per_call(func, n=calls):
+        start = time.perf_counter()
+        func(n)
+        return (time.perf_counter() - start) / n * 1e9
+
+    def fstring(n):
+        for _ in range(n):
+            logger.debug(f"响度过高: {value:.2f} dB")
+
+    def lazy(n):
+        for _ in range(n):
+            logger.debug("响度过高: %.2f dB", value)
+
+    def empty(n):
+        for _ in range(n):
+            pass
+
+    base = per_call(empty)
+    print("logging: 调试级别关闭时每次 debug 调用的开销")
+    print(f"  f-string {per_call(fstring) - base:6.0f} ns, %-格式 {per_call(lazy) - base:6.0f} ns")
+
+    # 分析器每个采样周期的开销：正常日志级别 vs 完全禁用日志
+    # process_tick 本身不记录日志，两者的差值应在测量波动以内；交替测量，避免机器状态的漂移
+    # 只落在其中一种条件上，并给出同条件重复测量的波动作为参照
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = Config(temp_dir)
+        samples = [AudioSample(0.3 if i % 400 < 300 else 0.0, 0.5, i * dt) for i in range(ticks)]
+
+        def tick_cost():
+            analyzer = AudioAnalyzer(config, FakeBackend(), registry=MetricsRegistry())
+            analyzer.last_check_time = 0.0
+            start = time.perf_counter()
+            for sample in samples:
+                analyzer.process_tick(sample)
+            elapsed = time.perf_counter() - start
+            config.unsubscribe(analyzer._on_config_changed)
+            return elapsed / ticks * 1e9
+
+        logging.getLogger('OfficeGuardian').setLevel(logging.INFO)
+        enabled = []
+        disabled = []
+        for _ in range(7):
+            enabled.append(tick_cost())
+            logging.disable(logging.CRITICAL)
+            disabled.append(tick_cost())
+            logging.disable(logging.NOTSET)
+        enabled.sort()
+        disabled.sort()
+        noise = max(enabled[3] - enabled[0], disabled[3] - disabled[0])
+        print(f"  每周期（7 次交替测量的最好成绩）: INFO级别 {enabled[0]:.0f} ns, 禁用日志 {disabled[0]:.0f} ns, "
+              f"差值 {enabled[0] - disabled[0]:.0f} ns（同条件重复测量的波动 {noise:.0f} ns）")
+
+        # 实际输出一条日志时调用线程的耗时：同步写文件 vs 只放入队列
+        path = os.path.join(temp_dir, 'bench.log')
+        file_handler = logging.FileHandler(path, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+        def info(n):
+            for _ in range(n):
+                logger.info("系统音量已设置为: %.2f", value)
+
+        records = calls // 10
+        logger.handlers = [file_handler]
+        sync = per_call(info, records)
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, file_handler)
+        logger.handlers = [_QueueHandler(log_queue)]
+        queued = per_call(info, records)
+        # 后台线程随后输出队列中的记录
+        listener.start()
+        listener.stop()
+        logger.handlers = []
+        file_handler.close()
+        print(f"  每条输出的日志: 同步写文件 {sync / 1000:.1f} us, 队列 {queued / 1000:.1f} us (调用线程)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='办公室的大盾 - 性能基准测试')
+    parser.add_argument('names', nargs='*', help=f"基准测试名称: {', '.join(BENCHMARKS)}")
+    args = parser.parse_args(argv)
+
+    names = args.names or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"未知的基准测试: {name}")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,79 @@
 import logging
-import numpy as np
 import wx
+from utils.quantile import QuantileSketch
+
+
+class HistogramPanel(wx.Panel):
+    """校准时的响度分布直方图，竖线标出当前步骤使用的分位数"""
+
+    DB_LOW = -80.0
+    DB_HIGH = 0.0
+    BINS = 80
+
+    BACKGROUND = wx.Colour(255, 255, 255)
+    BAR = wx.Colour(0, 120, 215)
+    MARKER = wx.Colour(255, 0, 0)
+    AXIS = wx.Colour(120, 120, 120)
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.SetMinSize((480, 90))
+        self.counts = [0] * self.BINS
+        self.marker = None
+        self.Bind(wx.EVT_PAINT, self._on_paint)
+        self.Bind(wx.EVT_SIZE, lambda event: self.Refresh())
+
+    def set_data(self, counts, marker):
+        self.counts = counts
+        self.marker = marker
+        self.Refresh()
+
+    def _on_paint(self, event):
+        dc = wx.AutoBufferedPaintDC(self)
+        width, height = self.GetClientSize()
+        dc.SetBackground(wx.Brush(self.BACKGROUND))
+        dc.Clear()
+        plot_height = height - 14
+        if plot_height <= 0 or width <= 0:
+            return
+
+        # 横坐标：每 10 dB 一个刻度
+        dc.SetPen(wx.Pen(self.AXIS))
+        dc.SetTextForeground(self.AXIS)
+        dc.SetFont(wx.Font(7, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL))
+        dc.DrawLine(0, plot_height, width, plot_height)
+        span = self.DB_HIGH - self.DB_LOW
+        for db in range(int(self.DB_LOW), int(self.DB_HIGH) + 1, 10):
+            x = int((db - self.DB_LOW) / span * (width - 1))
+            dc.DrawLine(x, plot_height, x, plot_height + 3)
+            label = str(db)
+            text_width = dc.GetTextExtent(label)[0]
+            dc.DrawText(label, min(max(0, x - text_width // 2), width - text_width), plot_height + 3)
+
+        peak = max(self.counts)
+        if peak:
+            dc.SetPen(wx.TRANSPARENT_PEN)
+            dc.SetBrush(wx.Brush(self.BAR))
+            bar_width = width / self.BINS
+            for index, count in enumerate(self.counts):
+                if count:
+                    bar_height = max(1, int(count / peak * (plot_height - 2)))
+                    x = int(index * bar_width)
+                    dc.DrawRectangle(x, plot_height - bar_height, max(1, int((index + 1) * bar_width) - x - 1),
+                                     bar_height)
+
+        if self.marker is not None:
+            x = int((self.marker - self.DB_LOW) / span * (width - 1))
+            dc.SetPen(wx.Pen(self.MARKER, 2))
+            dc.DrawLine(x, 0, x, plot_height)
+
 
 class CalibrationDialog(wx.Dialog):
     """校准对话框，用于帮助用户设置最大和最小响度阈值"""
 
     def __init__(self, parent, audio_analyzer, volume_controller):
-        super().__init__(parent, title="音频响度校准", size=(600, 470))
+        super().__init__(parent, title="音频响度校准", size=(600, 640))
         self.logger = logging.getLogger('OfficeGuardian.Calibration')
         self.audio_analyzer = audio_analyzer
         self.volume_controller = volume_controller
@@ -18,9 +85,12 @@ class CalibrationDialog(wx.Dialog):
 
         # 状态变量
         self.current_step = 0  # 0=准备, 1=校准最大响度, 2=校准最小响度, 3=校准音频阈值
-        self.collected_db_values = []
+        # 有音频时的输出响度分布（分析线程按完整采样率写入，内存固定）
+        self.sketch = QuantileSketch()
+        self._ticks = 0
 
         self._init_ui()
+        self.audio_analyzer.subscribe_snapshot(self._on_snapshot)
         self.start_timer()
 
     def _init_ui(self):
@@ -61,6 +131,17 @@ class CalibrationDialog(wx.Dialog):
         db_sizer.Add(self.db_label, 0, wx.ALL, 5)
         main_sizer.Add(db_sizer, 0, wx.ALL | wx.EXPAND, 5)
 
+        # 本步骤采集到的响度分布
+        stats_box = wx.StaticBox(self, label="响度分布")
+        stats_sizer = wx.StaticBoxSizer(stats_box, wx.VERTICAL)
+
+        self.histogram = HistogramPanel(self)
+        self.stats_label = wx.StaticText(self, label="")
+
+        stats_sizer.Add(self.histogram, 1, wx.ALL | wx.EXPAND, 5)
+        stats_sizer.Add(self.stats_label, 0, wx.ALL, 5)
+        main_sizer.Add(stats_sizer, 1, wx.ALL | wx.EXPAND, 5)
+
         # 按钮
         button_sizer = wx.BoxSizer(wx.HORIZONTAL)
         self.start_button = wx.Button(self, label="开始校准")
@@ -85,16 +166,49 @@ class CalibrationDialog(wx.Dialog):
         """启动定时器"""
         self.timer = wx.Timer(self)
         self.Bind(wx.EVT_TIMER, self.on_timer)
+        self.Bind(wx.EVT_CLOSE, self.on_cancel)
         self.timer.Start(100)  # 100ms
 
+    def _stop(self):
+        """停止定时器并取消订阅分析器"""
+        self.timer.Stop()
+        self.audio_analyzer.unsubscribe_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, snapshot):
+        """分析线程中调用：校准步骤中有音频时记录输出响度
+
+        界面线程在每个步骤开始时换上新的 QuantileSketch（不在原对象上清零），
+        这里只读取一次引用，换下的旧对象即使再被写入一次也不影响新步骤。
+        """
+        sketch = self.sketch
+        if self.current_step and snapshot.state != 'silent':
+            sketch.add(snapshot.current_db)
+
     def on_timer(self, event):
         """定时器事件处理"""
         current_db = self.audio_analyzer.get_current_db()
         self.db_label.SetLabel(f"{current_db:.1f} dB")
-        self.db_gauge.SetValue(int(current_db + 80))  # 转换到0-80范围
+        self.db_gauge.SetValue(max(0, min(80, int(current_db + 80))))  # 转换到0-80范围
 
-        if self.current_step in [1, 2, 3] and self.audio_analyzer.is_playing():
-            self.collected_db_values.append(current_db)
+        # 分布和分位数每 0.5 秒刷新一次
+        self._ticks += 1
+        if self.current_step and self._ticks % 5 == 0:
+            self._update_stats()
+
+    def _update_stats(self):
+        """显示本步骤的分位数估计和直方图"""
+        sketch = self.sketch
+        p5, p50, p95 = sketch.quantiles([5, 50, 95])
+        step_value = {1: p95, 2: p50, 3: p5}.get(self.current_step)
+        if step_value is None:
+            self.stats_label.SetLabel("等待音频...")
+        else:
+            name = {1: "最大响度", 2: "最小响度", 3: "音频检测阈值"}[self.current_step]
+            self.stats_label.SetLabel(f"已采集 {sketch.count} 个采样  5%: {p5:.1f} dB  "
+                                      f"50%: {p50:.1f} dB  95%: {p95:.1f} dB  "
+                                      f"→ {name}将设为 {step_value:.1f} dB")
+        self.histogram.set_data(
+            sketch.histogram(HistogramPanel.DB_LOW, HistogramPanel.DB_HIGH, HistogramPanel.BINS), step_value)
 
     def on_volume_changed(self, event):
         """音量滑块改变事件"""
@@ -104,42 +218,44 @@ class CalibrationDialog(wx.Dialog):
 
     def on_start(self, event):
         """开始校准"""
+        self.sketch = QuantileSketch()
         self.current_step = 1
         self.progress.SetValue(1)
         self.start_button.Disable()
         self.next_button.Enable()
         self._update_step_ui()
+        self._update_stats()
 
     def on_next(self, event):
         """下一步"""
         if self.current_step == 1:
             # 完成最大响度校准
-            if len(self.collected_db_values) > 0:
-                self.max_db = np.percentile(self.collected_db_values, 95)
-            self.collected_db_values = []
+            if self.sketch.count > 0:
+                self.max_db = self.sketch.quantile(95)
             self.current_step = 2
 
         elif self.current_step == 2:
             # 完成最小响度校准
-            if len(self.collected_db_values) > 0:
-                self.min_db = np.percentile(self.collected_db_values, 50)
-            self.collected_db_values = []
+            if self.sketch.count > 0:
+                self.min_db = self.sketch.quantile(50)
             self.current_step = 3
 
         elif self.current_step == 3:
             # 完成音频阈值校准
-            if len(self.collected_db_values) > 0:
-                self.audio_threshold = np.percentile(self.collected_db_values, 5)
-            self.timer.Stop()
+            if self.sketch.count > 0:
+                self.audio_threshold = self.sketch.quantile(5)
+            self._stop()
             self.EndModal(wx.ID_OK)
             return
 
+        self.sketch = QuantileSketch()
         self.progress.SetValue(self.current_step)
         self._update_step_ui()
+        self._update_stats()
 
     def on_cancel(self, event):
         """取消校准"""
-        self.timer.Stop()
+        self._stop()
         self.EndModal(wx.ID_CANCEL)
 
     def _update_step_ui(self):
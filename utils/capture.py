@@ -0,0 +1,201 @@
+import time
+import logging
+import numpy as np
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # 未安装 sounddevice 或缺少 PortAudio
+    sd = None
+
+
+class LoopbackCapture:
+    """基于 sounddevice 的回环采集引擎
+
+    音频回调把每个采样块写入预分配的环形缓冲区，并用向量化运算计算块峰值和能量，
+    回调中不分配新的数组。分析线程通过 read_levels() 读取上次读取以来的峰值和RMS，
+    通过 read_frames() 以视图形式读取原始采样（单写单读，无需加锁）。
+
+    Args:
+        device_name: 输出设备名称，None 表示默认输出设备
+        channels: 采集声道数，None 表示使用设备的声道数
+        blocksize: 每个回调块的帧数
+        buffer_seconds: 环形缓冲区能保存的时长（秒）
+    """
+
+    # 块统计环形缓冲区长度
+    STATS_SIZE = 1024
+
+    def __init__(self, device_name=None, channels=None, blocksize=480, buffer_seconds=4.0):
+        self.logger = logging.getLogger('OfficeGuardian.Capture')
+        self.device_name = device_name
+        self.channels = channels
+        self.blocksize = blocksize
+        self.buffer_seconds = buffer_seconds
+        self.samplerate = None
+        self.stream = None
+        self.ring = None
+        self._scratch = None
+        # 写入/读取计数（帧数、块数），写端只在回调中更新
+        self.frames_written = 0
+        self.frames_read = 0
+        self.blocks_written = 0
+        self.blocks_read = 0
+        self._block_peak = np.zeros(self.STATS_SIZE, dtype=np.float32)
+        self._block_energy = np.zeros(self.STATS_SIZE, dtype=np.float64)
+        self._block_frames = np.zeros(self.STATS_SIZE, dtype=np.int64)
+        # 回调耗时统计
+        self.callback_time = 0.0
+        self.status_errors = 0
+
+    @staticmethod
+    def is_available():
+        """sounddevice 是否可用"""
+        return sd is not None
+
+    def _resolve_device(self):
+        """查找输出设备对应的回环采集设备，返回 (设备序号, extra_settings)"""
+        if sd is None:
+            raise RuntimeError("sounddevice 不可用")
+
+        devices = sd.query_devices()
+        wasapi = None
+        for index, api in enumerate(sd.query_hostapis()):
+            if 'WASAPI' in api['name']:
+                wasapi = index
+                break
+        if wasapi is None:
+            raise RuntimeError("找不到 WASAPI 音频接口")
+
+        name = self.device_name
+        if name is None:
+            output = sd.query_hostapis(wasapi)['default_output_device']
+            name = devices[output]['name']
+
+        # 新版 PortAudio 把回环设备列为名称带 [Loopback] 的输入设备
+        for index, dev in enumerate(devices):
+            if (dev['hostapi'] == wasapi and dev['max_input_channels'] > 0
+                    and 'Loopback' in dev['name'] and dev['name'].startswith(name)):
+                return index, None
+
+        # 旧版 sounddevice 通过 WasapiSettings(loopback=True) 打开输出设备
+        for index, dev in enumerate(devices):
+            if dev['hostapi'] == wasapi and dev['max_output_channels'] > 0 and dev['name'].startswith(name):
+                try:
+                    return index, sd.WasapiSettings(loopback=True)
+                except TypeError:
+                    break
+        raise RuntimeError(f"找不到设备 {name} 的回环采集接口")
+
+    def start(self):
+        """打开回环采集流"""
+        device, extra_settings = self._resolve_device()
+        info = sd.query_devices(device)
+        if self.channels is None:
+            self.channels = max(info['max_input_channels'], info['max_output_channels'], 1)
+        self.allocate(int(info['default_samplerate']), self.channels)
+
+        self.stream = sd.InputStream(
+            device=device, channels=self.channels, samplerate=self.samplerate,
+            blocksize=self.blocksize, dtype='float32',
+            extra_settings=extra_settings, callback=self._callback)
+        self.stream.start()
+        self.logger.info(f"回环采集已启动: {info['name']}, {self.samplerate}Hz, {self.channels}声道")
+
+    def allocate(self, samplerate, channels):
+        """按采样率和声道数预分配缓冲区并重置计数"""
+        self.samplerate = samplerate
+        self.channels = channels
+        capacity = int(samplerate * self.buffer_seconds)
+        self.ring = np.zeros((capacity, channels), dtype=np.float32)
+        self._scratch = np.zeros((self.blocksize * 4, channels), dtype=np.float32)
+        self.frames_written = self.frames_read = 0
+        self.blocks_written = self.blocks_read = 0
+        self.callback_time = 0.0
+        self.status_errors = 0
+
+    def stop(self):
+        """关闭回环采集流"""
+        if self.stream is not None:
+            try:
+                self.stream.stop()
+                self.stream.close()
+            except Exception as e:
+                self.logger.warning(f"关闭采集流失败: {e}")
+            self.stream = None
+            self.logger.info("回环采集已停止")
+
+    def _callback(self, indata, frames, time_info, status):
+        """音频回调（PortAudio线程），只做预分配缓冲区上的向量化运算"""
+        start = time.perf_counter()
+        if status:
+            self.status_errors += 1
+
+        # 写入环形缓冲区（回调缓冲区会被复用，这里是唯一的一次拷贝）
+        ring = self.ring
+        capacity = len(ring)
+        pos = self.frames_written % capacity
+        first = min(frames, capacity - pos)
+        np.copyto(ring[pos:pos + first], indata[:first])
+        if first < frames:
+            np.copyto(ring[:frames - first], indata[first:])
+
+        # 块峰值和能量
+        if frames > len(self._scratch):
+            self._scratch = np.zeros((frames, self.channels), dtype=np.float32)
+        scratch = self._scratch[:frames]
+        np.abs(indata, out=scratch)
+        slot = self.blocks_written % self.STATS_SIZE
+        self._block_peak[slot] = scratch.max()
+        np.square(scratch, out=scratch)
+        self._block_energy[slot] = scratch.sum(dtype=np.float64)
+        self._block_frames[slot] = frames * self.channels
+
+        self.frames_written += frames
+        self.blocks_written += 1
+        self.callback_time += time.perf_counter() - start
+
+    def read_levels(self):
+        """读取上次调用以来所有块的 (峰值, RMS)，没有新数据时返回 (0.0, 0.0)"""
+        written = self.blocks_written
+        count = written - self.blocks_read
+        if count <= 0:
+            return 0.0, 0.0
+        count = min(count, self.STATS_SIZE)
+        start = (written - count) % self.STATS_SIZE
+        end = start + count
+        if end <= self.STATS_SIZE:
+            peak = self._block_peak[start:end].max()
+            energy = self._block_energy[start:end].sum()
+            samples = self._block_frames[start:end].sum()
+        else:
+            end -= self.STATS_SIZE
+            peak = max(self._block_peak[start:].max(), self._block_peak[:end].max())
+            energy = self._block_energy[start:].sum() + self._block_energy[:end].sum()
+            samples = self._block_frames[start:].sum() + self._block_frames[:end].sum()
+        self.blocks_read = written
+        rms = float(np.sqrt(energy / samples)) if samples > 0 else 0.0
+        return float(peak), rms
+
+    def read_frames(self):
+        """读取上次调用以来的新采样，返回环形缓冲区上的视图列表（最多两段）"""
+        written = self.frames_written
+        capacity = len(self.ring)
+        count = min(written - self.frames_read, capacity)
+        self.frames_read = written
+        if count <= 0:
+            return []
+        start = (written - count) % capacity
+        end = start + count
+        if end <= capacity:
+            return [self.ring[start:end]]
+        return [self.ring[start:], self.ring[:end - capacity]]
+
+    def get_stats(self):
+        """采集统计：回调CPU占用（占实时时长的比例）、块数和异常状态次数"""
+        audio_time = self.frames_written / self.samplerate if self.samplerate else 0.0
+        return {
+            'cpu_load': self.callback_time / audio_time if audio_time > 0 else 0.0,
+            'callback_time': self.callback_time,
+            'blocks': self.blocks_written,
+            'status_errors': self.status_errors,
+        }
@@ -0,0 +1,182 @@
+import wx
+from utils.decision import level_to_db
+from utils.chart_columns import ColumnAggregator, NORMAL, OVER_MAX, UNDER_MIN
+
+
+class LoudnessChart(wx.Panel):
+    """滚动的响度 / 音量曲线
+
+    绘制内容缓存在位图中：每次只把位图左移新增的列数，再画出新的列，
+    绘制代价与显示的时长无关。只有尺寸变化或窗口重新显示时才整幅重画。
+
+    每列显示该时段内输出响度的范围（越界时为红色/橙色）、当时的 max_db/min_db 范围
+    和系统音量（右侧坐标）。
+
+    Args:
+        parent: 父窗口
+        config: 配置（读取 max_db / min_db）
+    """
+
+    # 每列（一个像素）的时长（秒）
+    COLUMN_SECONDS = 0.5
+    # 保留的最大列数（窗口变宽时可以显示更长的历史）
+    MAX_COLUMNS = 2400
+    # 响度坐标范围（dB）和网格间距
+    DB_TOP = 0.0
+    DB_BOTTOM = -70.0
+    DB_GRID = 10
+    # 左右两侧坐标文字的宽度
+    MARGIN_LEFT = 36
+    MARGIN_RIGHT = 36
+
+    BACKGROUND = wx.Colour(255, 255, 255)
+    GRID = wx.Colour(230, 230, 230)
+    BAND = wx.Colour(225, 245, 225)
+    LOUDNESS = wx.Colour(0, 120, 215)
+    OVER_MAX = wx.Colour(255, 0, 0)
+    UNDER_MIN = wx.Colour(255, 165, 0)
+    VOLUME = wx.Colour(80, 80, 80)
+
+    def __init__(self, parent, config):
+        super().__init__(parent)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.SetMinSize((200, 140))
+        self.config = config
+        self.aggregator = ColumnAggregator(self.COLUMN_SECONDS, self.MAX_COLUMNS)
+        self.bitmap = None
+        self.drawn = 0
+        self._dirty = True
+        self._pens = {
+            NORMAL: wx.Pen(self.LOUDNESS),
+            OVER_MAX: wx.Pen(self.OVER_MAX),
+            UNDER_MIN: wx.Pen(self.UNDER_MIN),
+        }
+        self._background_pen = wx.Pen(self.BACKGROUND)
+        self._grid_pen = wx.Pen(self.GRID)
+        self._band_pen = wx.Pen(self.BAND)
+        self._volume_pen = wx.Pen(self.VOLUME)
+        self.Bind(wx.EVT_PAINT, self._on_paint)
+        self.Bind(wx.EVT_SIZE, self._on_size)
+
+    def on_snapshot(self, snapshot):
+        """分析器快照订阅回调（分析线程）"""
+        self.aggregator.on_snapshot(snapshot)
+
+    def update(self, redraw=True):
+        """绘制新完成的列（界面线程），redraw 为 False 时只记下需要重画（窗口隐藏时）"""
+        produced, columns = self.aggregator.get_columns()
+        new = produced - self.drawn
+        if not redraw:
+            self.drawn = produced
+            if new:
+                self._dirty = True
+            return
+        if self.bitmap is None:
+            return
+        width = self.bitmap.GetWidth()
+        if self._dirty or new >= width:
+            self._render_all(produced, columns)
+        elif new > 0:
+            self._scroll(new, columns)
+            self.drawn = produced
+        else:
+            return
+        self.RefreshRect(wx.Rect(self.MARGIN_LEFT, 0, width, self.bitmap.GetHeight()), False)
+
+    def _db_y(self, db, height):
+        db = min(self.DB_TOP, max(self.DB_BOTTOM, db))
+        return int((self.DB_TOP - db) / (self.DB_TOP - self.DB_BOTTOM) * (height - 1))
+
+    def _volume_y(self, volume, height):
+        return int((1.0 - min(1.0, max(0.0, volume))) * (height - 1))
+
+    def _scroll(self, new, columns):
+        """位图左移 new 列，只画最右侧的新列（columns 为 get_columns 取得的副本）"""
+        width, height = self.bitmap.GetWidth(), self.bitmap.GetHeight()
+        dc = wx.MemoryDC(self.bitmap)
+        dc.Blit(0, 0, width - new, height, dc, new, 0)
+        count = len(columns)
+        new = min(new, count)
+        previous = columns[count - new - 1] if count > new else None
+        for i in range(count - new, count):
+            self._draw_column(dc, width - (count - i), height, columns[i], previous)
+            previous = columns[i]
+        dc.SelectObject(wx.NullBitmap)
+
+    def _render_all(self, produced=None, columns=None):
+        """整幅重画（尺寸变化或重新显示时）"""
+        if columns is None:
+            produced, columns = self.aggregator.get_columns()
+        self._dirty = False
+        self.drawn = produced
+        width, height = self.bitmap.GetWidth(), self.bitmap.GetHeight()
+        dc = wx.MemoryDC(self.bitmap)
+        dc.SetBackground(wx.Brush(self.BACKGROUND))
+        dc.Clear()
+        count = len(columns)
+        first = max(0, count - width)
+        previous = None
+        for i in range(first, count):
+            self._draw_column(dc, width - (count - i), height, columns[i], previous)
+            previous = columns[i]
+        # 还没有数据的部分只画网格和当前的响度范围
+        for x in range(0, width - (count - first)):
+            self._draw_background(dc, x, height)
+        dc.SelectObject(wx.NullBitmap)
+
+    def _draw_background(self, dc, x, height):
+        dc.SetPen(self._background_pen)
+        dc.DrawLine(x, 0, x, height)
+        dc.SetPen(self._band_pen)
+        dc.DrawLine(x, self._db_y(self.config.max_db, height), x, self._db_y(self.config.min_db, height) + 1)
+        dc.SetPen(self._grid_pen)
+        for db in range(int(self.DB_TOP) - self.DB_GRID, int(self.DB_BOTTOM), -self.DB_GRID):
+            y = self._db_y(db, height)
+            dc.DrawPoint(x, y)
+
+    def _draw_column(self, dc, x, height, column, previous):
+        low, high, volume, flag = column
+        self._draw_background(dc, x, height)
+        if high is not None:
+            dc.SetPen(self._pens[flag])
+            dc.DrawLine(x, self._db_y(level_to_db(high), height),
+                        x, self._db_y(level_to_db(low), height) + 1)
+        dc.SetPen(self._volume_pen)
+        y = self._volume_y(volume, height)
+        if previous is not None:
+            dc.DrawLine(x - 1, self._volume_y(previous[2], height), x, y)
+        dc.DrawPoint(x, y)
+
+    def _on_size(self, event):
+        event.Skip()
+        width, height = self.GetClientSize()
+        width = max(1, width - self.MARGIN_LEFT - self.MARGIN_RIGHT)
+        height = max(1, height)
+        if self.bitmap is None or (self.bitmap.GetWidth(), self.bitmap.GetHeight()) != (width, height):
+            self.bitmap = wx.Bitmap(width, height)
+            self._render_all()
+        self.Refresh(False)
+
+    def _on_paint(self, event):
+        dc = wx.AutoBufferedPaintDC(self)
+        width, height = self.GetClientSize()
+        if self.bitmap is not None:
+            dc.DrawBitmap(self.bitmap, self.MARGIN_LEFT, 0)
+        # 坐标文字在位图之外，滚动时不在重画区域内
+        if not self.IsExposed(0, 0, self.MARGIN_LEFT, height) and \
+                not self.IsExposed(width - self.MARGIN_RIGHT, 0, self.MARGIN_RIGHT, height):
+            return
+        dc.SetBrush(wx.Brush(self.GetBackgroundColour()))
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        dc.DrawRectangle(0, 0, self.MARGIN_LEFT, height)
+        dc.DrawRectangle(width - self.MARGIN_RIGHT, 0, self.MARGIN_RIGHT, height)
+        dc.SetFont(wx.Font(7, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL))
+        text_height = dc.GetTextExtent("0")[1]
+        dc.SetTextForeground(self.LOUDNESS)
+        for db in range(int(self.DB_TOP), int(self.DB_BOTTOM) - 1, -self.DB_GRID):
+            y = min(max(0, self._db_y(db, height) - text_height // 2), height - text_height)
+            dc.DrawText(f"{db}dB", 2, y)
+        dc.SetTextForeground(self.VOLUME)
+        for percent in (100, 50, 0):
+            y = min(max(0, self._volume_y(percent / 100, height) - text_height // 2), height - text_height)
+            dc.DrawText(f"{percent}%", width - self.MARGIN_RIGHT + 4, y)
@@ -0,0 +1,82 @@
+"""图表的列数据
+
+与界面无关（不导入 wx），分析线程写入、界面线程读取。
+"""
+import threading
+from collections import deque
+
+# 列中的越界标记
+NORMAL = 0
+OVER_MAX = 1
+UNDER_MIN = 2
+
+
+class ColumnAggregator:
+    """把分析器快照按固定时长合并成图表的列
+
+    on_snapshot 在分析线程中调用，只做比较和赋值；完成的列放入有界队列。界面线程通过
+    get_columns 在锁内同时取得 produced 计数和队列的副本，二者总是一致的（锁只在每列结束时
+    由分析线程持有一次）。
+
+    每列为 (最小电平, 最大电平, 音量, 越界标记)，电平为线性幅度，整列静音时为 None。
+
+    Args:
+        seconds: 每列的时长（秒）
+        capacity: 保留的最大列数
+    """
+
+    def __init__(self, seconds=0.5, capacity=2400):
+        self.seconds = seconds
+        self.columns = deque(maxlen=capacity)
+        self.produced = 0
+        self.lock = threading.Lock()
+        self._end = None
+        self._low = None
+        self._high = None
+        self._volume = 0.0
+        self._flag = NORMAL
+
+    def on_snapshot(self, snapshot):
+        timestamp = snapshot.timestamp
+        if self._end is None:
+            self._end = timestamp + self.seconds
+        elif timestamp >= self._end:
+            self._finish(timestamp)
+
+        state = snapshot.state
+        if state != 'silent':
+            level = snapshot.output_level
+            if self._low is None or level < self._low:
+                self._low = level
+            if self._high is None or level > self._high:
+                self._high = level
+            if state == 'over_max':
+                self._flag = OVER_MAX
+            elif state == 'under_min' and self._flag == NORMAL:
+                self._flag = UNDER_MIN
+        self._volume = snapshot.volume
+
+    def get_columns(self):
+        """返回 (累计完成的列数, 当前保留的列的列表)，列表的最后一项是第 produced 列"""
+        with self.lock:
+            return self.produced, list(self.columns)
+
+    def _finish(self, timestamp):
+        """结束当前列；两次快照之间相隔多列时（例如暂停分析）补上空列"""
+        columns = self.columns
+        self._end += self.seconds
+        missing = int((timestamp - self._end) / self.seconds) + 1 if timestamp >= self._end else 0
+        if missing > columns.maxlen:
+            # 空白超过可显示的范围，只补满队列
+            self._end += (missing - columns.maxlen) * self.seconds
+            missing = columns.maxlen
+        empty = (None, None, self._volume, NORMAL)
+        with self.lock:
+            columns.append((self._low, self._high, self._volume, self._flag))
+            for _ in range(missing):
+                columns.append(empty)
+            self.produced += 1 + missing
+        self._end += missing * self.seconds
+        self._low = None
+        self._high = None
+        self._flag = NORMAL
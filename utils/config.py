@@ -1,6 +1,8 @@
 import os
 import json
 import logging
+import time
+import threading
 
 
 class Config:
@@ -16,14 +18,55 @@ class Config:
         'check_interval': 0.5,    # 检查间隔（秒）
         'was_calibrated': False,  # 是否已校准
         'logging_level': 'INFO',   # 日志级别
+        'log_file': True,          # 是否写入日志文件（程序目录下的 logs 目录）
+        'log_file_max_kb': 1024,   # 单个日志文件的最大大小（KB），超过后滚动
+        'log_file_backups': 3,     # 保留的旧日志文件个数
         'interval_max': 2,         # 音量过大调整间隔（秒）
         'interval_min': 8,         # 音量过小调整间隔（秒）
         'volume_change_k': 0.2,        # 渐进式音量调整系数k
+        'control_mode': 'step',    # 音量调整方式: step(固定比例步进) / pi(PI闭环控制)
+        'pi_kp': 0.2,              # PI控制比例系数（作用于误差的变化）
+        'pi_ki': 0.25,             # PI控制积分系数（1/秒，每次调整按 settle_time 秒累计）
+        'settle_time': 3.0,        # PI控制每次调整后的稳定等待时间（秒），应大于 interval_max
+        'volume_ramp': True,       # 音量调整是否渐变（在独立线程中执行）
+        'ramp_step': 0.01,         # 渐变每步的最大音量变化
+        'ramp_interval': 0.02,     # 渐变每步的间隔（秒）
         'device_id': None,       # 设备ID
+        'sample_rate_active': 20.0,  # 有音频时的采样率（Hz）
+        'sample_rate_idle': 2.0,     # 静音时的采样率（Hz）
+        'silence_hold': 10.0,        # 静音多久后降低采样率（秒）
+        'loudness_windows': [0.4, 3.0, 60.0],  # 响度平均的时间窗口（秒）
+        'average_window': 3.0,       # 用于阈值判断的平均窗口（秒）
+        'capture_mode': 'meter',     # 响度数据来源: meter(峰值表) / loopback(回环采集)
+        'channel_metric': 'mono',    # 多声道判断方式: mono(混合峰值) / max(最响声道) / energy(声道能量和)
+        'loudness_metric': 'peak',   # 阈值判断使用的响度指标: peak(平均电平) / lufs(BS.1770短期响度)
+        'control_server': False,     # 是否启动本地控制接口（Unix 套接字 / 命名管道）
+        'control_address': None,     # 控制接口地址，None 表示默认地址
+        'metrics_server': False,     # 是否在本机提供 Prometheus 指标（http://127.0.0.1:端口/metrics）
+        'metrics_port': 9464,        # 指标服务端口
+        'history': False,            # 是否把响度和音量记录到历史文件（程序目录下的 history 目录，7 天约 10MB）
+        'history_interval': 1.0,     # 历史记录间隔（秒）
+        'history_days': 7,           # 历史文件保留的天数（决定文件大小，每天约 1.4MB）
+        'trace_record': False,       # 是否录制原始采样轨迹（程序目录下的 traces 目录，用于 python -m utils.trace 回放）
+        'trace_max_mb': 100,         # 单个轨迹文件的最大大小（MB），达到后停止录制
     }
 
+    # 最后一次修改后等待多久（秒）再写入文件，连续的修改合并为一次写入
+    SAVE_DELAY = 1.0
+
     def __init__(self, base_dir=None):
         self.logger = logging.getLogger('OfficeGuardian.Config')
+        # 后台写入状态：修改立即生效，文件由写入线程在停止修改后统一保存
+        self._save_lock = threading.Lock()
+        self._save_condition = threading.Condition()
+        self._save_thread = None
+        self._save_deadline = None
+        self._pending_changes = 0
+        self.writes = 0          # 实际写入文件的次数
+        self.writes_saved = 0    # 被合并而省去的写入次数
+        self._listeners = []
+        # 只在本次运行中生效的配置项（命令行参数）及其在配置文件中的原值
+        self._overridden = {}
         self.base_dir = base_dir if base_dir else os.path.dirname(os.path.abspath(__file__))
         self.config_dir = self._get_config_dir()
         self.config_file = os.path.join(self.config_dir, 'config.json')
@@ -33,8 +76,8 @@ class Config:
         """获取配置文件目录"""
         # 在程序所在目录下创建配置目录
         config_dir = os.path.join(self.base_dir, 'config')
-        if not os.path.exists(config_dir):
-            os.makedirs(config_dir)
+        # 多个进程可能同时创建同一个目录（参数调优的工作进程）
+        os.makedirs(config_dir, exist_ok=True)
         return config_dir
 
     def _load_config(self):
@@ -70,34 +113,116 @@ class Config:
             setattr(self, key, value)
 
     def save_config(self):
-        """保存配置到文件"""
-        config_data = {}
-        for key in self.DEFAULT_CONFIG.keys():
-            config_data[key] = getattr(self, key)
-
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(config_data, f, indent=4)
-            self.logger.info("配置已保存到文件")
-            return True
-        except Exception as e:
-            self.logger.error(f"保存配置文件失败: {e}")
-            return False
+        """立即保存配置到文件（先写临时文件再替换，写入中途崩溃不会损坏原文件）"""
+        with self._save_condition:
+            pending = self._pending_changes
+            self._pending_changes = 0
+            self._save_deadline = None
+
+        with self._save_lock:
+            config_data = {}
+            for key in self.DEFAULT_CONFIG.keys():
+                config_data[key] = self._overridden.get(key, getattr(self, key))
+
+            temp_file = self.config_file + '.tmp'
+            try:
+                with open(temp_file, 'w') as f:
+                    json.dump(config_data, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.config_file)
+                self.writes += 1
+                self.writes_saved += max(0, pending - 1)
+                self.logger.info("配置已保存到文件")
+                return True
+            except Exception as e:
+                self.logger.error(f"保存配置文件失败: {e}")
+                return False
+
+    def schedule_save(self):
+        """安排后台保存：SAVE_DELAY 秒内没有新的修改时写入文件"""
+        with self._save_condition:
+            self._pending_changes += 1
+            self._save_deadline = time.monotonic() + self.SAVE_DELAY
+            if self._save_thread is None:
+                self._save_thread = threading.Thread(target=self._save_loop, daemon=True)
+                self._save_thread.start()
+            self._save_condition.notify()
+
+    def _save_loop(self):
+        """后台写入线程：等到修改停止 SAVE_DELAY 秒后保存"""
+        while True:
+            with self._save_condition:
+                while self._save_deadline is None:
+                    self._save_condition.wait()
+                delay = self._save_deadline - time.monotonic()
+                if delay > 0:
+                    self._save_condition.wait(delay)
+                    continue
+            self.save_config()
+
+    def flush(self):
+        """立即写入尚未保存的修改（程序退出前调用）"""
+        with self._save_condition:
+            pending = self._save_deadline is not None
+        if pending:
+            return self.save_config()
+        return True
+
+    def override(self, **kwargs):
+        """只在本次运行中生效的修改（例如命令行参数）：不通知订阅者，保存时写入原值"""
+        for key, value in kwargs.items():
+            if key not in self.DEFAULT_CONFIG:
+                raise KeyError(key)
+            self._overridden.setdefault(key, getattr(self, key))
+            setattr(self, key, value)
+
+    def subscribe(self, listener):
+        """订阅配置变化，listener(keys) 在 update/reset_to_default 之后调用，keys 为变化的配置项"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """取消订阅配置变化"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, keys):
+        for listener in self._listeners:
+            try:
+                listener(keys)
+            except Exception as e:
+                self.logger.error(f"通知配置变化失败: {e}")
 
     def update(self, **kwargs):
-        """更新配置"""
+        """更新配置（立即生效，文件在后台延迟保存），返回是否有配置项发生变化
+
+        值与当前相同的配置项不计入变化；只有发生变化时才通知订阅者并安排保存。
+        """
+        changed = []
         for key, value in kwargs.items():
-            if key in self.DEFAULT_CONFIG:
-                setattr(self, key, value)
-                self.logger.info(f"配置已更新: {key}={value}")
-            else:
+            if key not in self.DEFAULT_CONFIG:
                 self.logger.warning(f"未知配置项: {key}")
+                continue
+            # 临时值（override）被明确设置时需要写入文件，即使数值相同
+            if getattr(self, key) == value and key not in self._overridden:
+                continue
+            setattr(self, key, value)
+            # 明确修改的配置项不再是临时值
+            self._overridden.pop(key, None)
+            changed.append(key)
+            self.logger.info(f"配置已更新: {key}={value}")
 
-        # 保存更新后的配置
-        return self.save_config()
+        if not changed:
+            return False
+        self._notify(changed)
+        # 安排保存更新后的配置
+        self.schedule_save()
+        return True
 
     def reset_to_default(self):
         """重置为默认配置"""
         self._apply_default_config()
+        self._overridden.clear()
         self.logger.info("配置已重置为默认值")
+        self._notify(list(self.DEFAULT_CONFIG))
         return self.save_config()
@@ -0,0 +1,326 @@
+"""本地控制接口
+
+协议：每行一个 JSON 请求，服务端每行返回一个 JSON 响应。
+请求 {"cmd": "...", ...}，可带 "id"，响应中原样返回。
+响应 {"ok": true, "result": ...} 或 {"ok": false, "error": "..."}。
+
+命令:
+    status                       当前响度、音量、状态、设备和采样统计
+    get [key]                    读取配置（不带 key 时返回全部）
+    set values={key: value}      修改配置（与界面相同，经 Config.update 生效）
+    pause / resume               暂停 / 恢复自动调节
+    devices                      列出音频设备
+    device id=<设备ID或null>     切换设备
+
+用法:
+    python -m utils.control status
+    python -m utils.control set max_db=-12 min_db=-35
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 单行请求的最大长度
+MAX_LINE = 64 * 1024
+
+
+def default_address():
+    """默认监听地址：Windows 为命名管道，其他系统为临时目录下的 Unix 套接字"""
+    if sys.platform == 'win32':
+        return r'\\.\pipe\OfficeGuardian'
+    return os.path.join(tempfile.gettempdir(), f'office_guardian-{os.getuid()}.sock')
+
+
+async def open_connection(address):
+    """连接控制接口，返回 (reader, writer)"""
+    if sys.platform == 'win32':
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_LINE)
+        protocol = asyncio.StreamReaderProtocol(reader)
+        transport, _ = await loop.create_pipe_connection(lambda: protocol, address)
+        writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+        return reader, writer
+    return await asyncio.open_unix_connection(address, limit=MAX_LINE)
+
+
+class ControlServer:
+    """基于 asyncio 的本地控制服务
+
+    在独立线程中运行事件循环，一个线程即可服务大量并发客户端。状态查询只读取分析器
+    发布的不可变快照，不与分析线程争用锁；会阻塞的操作（暂停、切换设备）放到线程池中执行。
+    访问音频设备的命令在单独的设备线程中执行，该线程启动时调用后端的 init_thread（初始化COM）。
+
+    Args:
+        engine: 音频均衡引擎（utils.engine.Engine）
+        address: 监听地址，默认见 default_address()
+    """
+
+    def __init__(self, engine, address=None):
+        self.logger = logging.getLogger('OfficeGuardian.Control')
+        self.engine = engine
+        self.config = engine.config
+        self.address = address or default_address()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.clients = 0
+        self.requests = 0
+        self._ready = threading.Event()
+        self._device_executor = None
+        self._commands = {
+            'status': self._cmd_status,
+            'get': self._cmd_get,
+            'set': self._cmd_set,
+            'pause': self._cmd_pause,
+            'resume': self._cmd_resume,
+            'devices': self._cmd_devices,
+            'device': self._cmd_device,
+        }
+
+    def start(self):
+        """在后台线程中启动服务，返回是否启动成功"""
+        if self.thread is not None:
+            return True
+        self._device_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='og-control-device',
+            initializer=self.engine.backend.init_thread)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self._ready.wait(5.0)
+        return self.server is not None
+
+    def stop(self):
+        """停止服务并关闭所有连接"""
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        if self._device_executor is not None:
+            # 只有一个线程，排在最后的 exit_thread 在该线程中执行
+            self._device_executor.submit(self.engine.backend.exit_thread)
+            self._device_executor.shutdown(wait=False)
+            self._device_executor = None
+
+    def _run(self):
+        if sys.platform == 'win32':
+            self.loop = asyncio.ProactorEventLoop()
+        else:
+            self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._serve())
+        except Exception as e:
+            self.logger.error(f"控制接口启动失败: {e}")
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self._close()
+
+    async def _serve(self):
+        if sys.platform == 'win32':
+            def factory():
+                reader = asyncio.StreamReader(limit=MAX_LINE)
+                return asyncio.StreamReaderProtocol(reader, self._handle_client)
+            servers = await self.loop.start_serving_pipe(factory, self.address)
+            self.server = servers[0] if servers else None
+        else:
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            # 套接字文件创建时即为 0600，不存在其他用户可以连接的时间窗口
+            old_umask = os.umask(0o177)
+            try:
+                self.server = await asyncio.start_unix_server(self._handle_client, self.address, limit=MAX_LINE)
+            finally:
+                os.umask(old_umask)
+        self.logger.info(f"控制接口已启动: {self.address}")
+
+    def _close(self):
+        if self.server is not None:
+            self.server.close()
+        if sys.platform != 'win32' and os.path.exists(self.address):
+            os.unlink(self.address)
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+        self.logger.info("控制接口已停止")
+
+    async def _handle_client(self, reader, writer):
+        self.clients += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(b'{"ok": false, "error": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                response = await self._dispatch(line)
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def _dispatch(self, line):
+        self.requests += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("请求必须是 JSON 对象")
+            request_id = request.get('id')
+            handler = self._commands.get(request.get('cmd'))
+            if handler is None:
+                raise ValueError(f"未知命令: {request.get('cmd')}")
+            response = {'ok': True, 'result': await handler(request)}
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)}
+        if request_id is not None:
+            response['id'] = request_id
+        return response
+
+    async def _cmd_status(self, request):
+        analyzer = self.engine.audio_analyzer
+        snapshot = analyzer.get_snapshot()
+        return {
+            'current_db': snapshot.current_db,
+            'real_db': snapshot.real_db,
+            'volume': snapshot.volume,
+            'state': snapshot.state,
+            'timestamp': snapshot.timestamp,
+            'running': self.engine.worker.running,
+            'device_id': self.engine.device_hub.device_id,
+            'sampling': analyzer.get_sampling_stats(),
+        }
+
+    async def _cmd_get(self, request):
+        key = request.get('key')
+        if key is None:
+            return {name: getattr(self.config, name) for name in self.config.DEFAULT_CONFIG}
+        if key not in self.config.DEFAULT_CONFIG:
+            raise ValueError(f"未知配置项: {key}")
+        return {key: getattr(self.config, key)}
+
+    async def _cmd_set(self, request):
+        """修改配置
+
+        config.update 在控制接口的线程中通知订阅者（与界面线程修改配置时相同）。分析器的
+        订阅者只重新计算阈值并赋值，分析线程最多有一个周期看到新旧混合的阈值。
+        """
+        values = request.get('values')
+        if not isinstance(values, dict) or not values:
+            raise ValueError("set 需要 values 对象")
+        for key, value in values.items():
+            if key not in self.config.DEFAULT_CONFIG:
+                raise ValueError(f"未知配置项: {key}")
+            if not _valid_value(self.config.DEFAULT_CONFIG[key], value):
+                raise TypeError(f"配置项 {key} 的类型不正确: {value!r}")
+        # 最小响度不低于最大响度时判断内核的上下限会颠倒
+        max_db = values.get('max_db', self.config.max_db)
+        min_db = values.get('min_db', self.config.min_db)
+        if min_db >= max_db:
+            raise ValueError(f"min_db ({min_db}) 必须小于 max_db ({max_db})")
+        self.config.update(**values)
+        return {key: getattr(self.config, key) for key in values}
+
+    async def _cmd_pause(self, request):
+        if self.engine.worker.running:
+            await self.loop.run_in_executor(None, self.engine.worker.stop)
+        return {'running': self.engine.worker.running}
+
+    async def _cmd_resume(self, request):
+        if not self.engine.worker.running:
+            await self.loop.run_in_executor(None, self.engine.worker.start)
+        return {'running': self.engine.worker.running}
+
+    async def _cmd_devices(self, request):
+        devices = await self.loop.run_in_executor(self._device_executor, self.engine.backend.list_devices)
+        return [{'id': device_id, 'name': name} for device_id, name in devices]
+
+    async def _cmd_device(self, request):
+        device_id = request.get('id')
+        await self.loop.run_in_executor(self._device_executor, self.engine.device_hub.switch, device_id)
+        self.config.update(device_id=device_id)
+        return {'device_id': self.engine.device_hub.device_id}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _valid_value(default, value):
+    """值的类型是否与默认值一致
+
+    默认值为 None 的配置项（设备ID、控制接口地址）接受字符串或 None；
+    列表类的配置项（时间窗口）必须是非空的正数列表。
+    """
+    if isinstance(default, bool) or isinstance(value, bool):
+        return isinstance(value, bool) and isinstance(default, bool)
+    if isinstance(default, (int, float)):
+        return _is_number(value)
+    if default is None:
+        return value is None or isinstance(value, str)
+    if isinstance(default, list):
+        return isinstance(value, list) and bool(value) and all(_is_number(v) and v > 0 for v in value)
+    return isinstance(value, type(default))
+
+
+async def request(address, message):
+    """发送一条请求并返回响应（每次新建连接）"""
+    reader, writer = await open_connection(address)
+    try:
+        writer.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        await writer.drain()
+        return json.loads(await reader.readline())
+    finally:
+        writer.close()
+
+
+def _parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='办公室的大盾 - 本地控制接口客户端')
+    parser.add_argument('--address', default=None, help='控制接口地址')
+    parser.add_argument('cmd', help='status / get / set / pause / resume / devices / device')
+    parser.add_argument('args', nargs='*', help='get: 配置项; set: key=value ...; device: 设备ID')
+    args = parser.parse_args(argv)
+
+    message = {'cmd': args.cmd}
+    if args.cmd == 'get' and args.args:
+        message['key'] = args.args[0]
+    elif args.cmd == 'set':
+        message['values'] = dict((k, _parse_value(v)) for k, v in (a.split('=', 1) for a in args.args))
+    elif args.cmd == 'device':
+        message['id'] = args.args[0] if args.args else None
+
+    try:
+        response = asyncio.run(request(args.address or default_address(), message))
+    except OSError as e:
+        print(f"无法连接控制接口: {e}")
+        return 1
+    print(json.dumps(response, ensure_ascii=False, indent=2))
+    return 0 if response.get('ok') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import math
+
+# 分贝下限：电平为0时显示的分贝值
+FLOOR_DB = -100.0
+
+
+def db_to_level(db):
+    """分贝转换为线性幅度"""
+    return 10 ** (db / 20)
+
+
+def level_to_db(level, floor=FLOOR_DB):
+    """线性幅度转换为分贝，电平为0时返回 floor"""
+    return 20 * math.log10(level) if level > 0 else floor
+
+
+class DecisionKernel:
+    """响度阈值判断内核
+
+    阈值在配置变化时预先换算成线性幅度，每个采样周期只做比较和加法，
+    不做对数/指数运算，也不创建新对象。状态全部放在 __slots__ 中。
+
+    step() 返回 NONE、OVER_MAX 或 UNDER_MIN；需要分贝值时由调用方按需换算。
+    """
+
+    __slots__ = ('audio_threshold', 'max_level', 'min_level', 'interval_max', 'interval_min',
+                 'over_max_duration', 'under_min_duration', 'last_time', 'playing')
+
+    NONE = 0
+    OVER_MAX = 1
+    UNDER_MIN = 2
+
+    def __init__(self, config):
+        self.over_max_duration = 0.0
+        self.under_min_duration = 0.0
+        self.last_time = 0.0
+        self.playing = False
+        self.configure(config)
+
+    def configure(self, config):
+        """从配置重新计算线性阈值（配置变化时调用）"""
+        self.audio_threshold = db_to_level(config.audio_threshold)
+        self.max_level = db_to_level(config.max_db)
+        self.min_level = db_to_level(config.min_db)
+        self.interval_max = config.interval_max
+        self.interval_min = config.interval_min
+
+    def reset(self, now):
+        """清除持续时间，从 now 开始计时"""
+        self.over_max_duration = 0.0
+        self.under_min_duration = 0.0
+        self.last_time = now
+
+    def step(self, peak, level, now):
+        """处理一个采样
+
+        Args:
+            peak: 原始峰值（线性幅度），用于判断是否有音频播放
+            level: 判断窗口内的平均输出电平（线性幅度）
+            now: 采样时间（秒）
+        """
+        event = 0
+        if peak > self.audio_threshold:
+            self.playing = True
+            elapsed = now - self.last_time
+            if level > self.max_level:
+                self.under_min_duration = 0.0
+                self.over_max_duration += elapsed
+                if self.over_max_duration >= self.interval_max:
+                    self.over_max_duration = 0.0
+                    event = 1
+            elif level < self.min_level:
+                self.over_max_duration = 0.0
+                self.under_min_duration += elapsed
+                if self.under_min_duration >= self.interval_min:
+                    self.under_min_duration = 0.0
+                    event = 2
+            else:
+                self.over_max_duration = 0.0
+                self.under_min_duration = 0.0
+        else:
+            self.playing = False
+            self.over_max_duration = 0.0
+            self.under_min_duration = 0.0
+        self.last_time = now
+        return event
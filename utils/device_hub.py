@@ -0,0 +1,122 @@
+import queue
+import logging
+import threading
+
+
+class DeviceHub:
+    """音频设备中心
+
+    分析器和音量控制共用同一个音频后端，由设备中心统一切换设备并通知所有使用者，
+    避免两者驱动不同的设备。后端按设备ID缓存已激活的接口，切换时不需要重新枚举设备。
+    系统默认设备变化、设备插入和移除通过后端的设备通知处理：通知在COM线程中到达，
+    只放入队列，由设备中心自己的线程完成切换。
+
+    Args:
+        backend: 音频后端
+        device_id: 首选设备ID，None 表示跟随系统默认设备
+    """
+
+    def __init__(self, backend, device_id=None):
+        self.logger = logging.getLogger('OfficeGuardian.DeviceHub')
+        self.backend = backend
+        self.preferred_id = device_id
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.device_list_listeners = []
+        self._events = queue.Queue()
+        self._thread = None
+        self.device_id = backend.open(device_id)
+
+    def subscribe(self, listener):
+        """订阅设备切换，listener(device_id) 在切换完成后调用"""
+        self.listeners.append(listener)
+
+    def subscribe_device_list(self, listener):
+        """订阅设备列表变化（设备插入或移除），listener() 无参数"""
+        self.device_list_listeners.append(listener)
+
+    def start(self):
+        """开始接收系统设备变化通知"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._event_loop, daemon=True)
+        self._thread.start()
+        if self.backend.watch(self):
+            self.logger.debug("已注册设备变化通知")
+
+    def stop(self):
+        """停止接收设备变化通知"""
+        self.backend.stop_watching()
+        if self._thread is not None:
+            self._events.put(None)
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def switch(self, device_id):
+        """切换到指定设备（None 表示系统默认设备），所有使用者一起切换"""
+        with self.lock:
+            self.preferred_id = device_id
+            self._switch(device_id)
+
+    def _switch(self, device_id):
+        previous = self.device_id
+        self.device_id = self.backend.open(device_id)
+        if self.device_id != previous:
+            self.logger.info(f"音频设备已切换: {self.device_id}")
+        for listener in self.listeners:
+            try:
+                listener(self.device_id)
+            except Exception as e:
+                self.logger.error(f"通知设备切换失败: {e}")
+
+    # 设备通知（在COM通知线程中调用，只做入队）
+
+    def on_default_device_changed(self, device_id):
+        self._events.put(('default', device_id))
+
+    def on_device_added(self, device_id):
+        self._events.put(('added', device_id))
+
+    def on_device_removed(self, device_id):
+        self._events.put(('removed', device_id))
+
+    def _event_loop(self):
+        # 切换设备需要在本线程中打开设备，先初始化COM
+        self.backend.init_thread()
+        try:
+            while True:
+                event = self._events.get()
+                try:
+                    if event is None:
+                        return
+                    self._handle_event(*event)
+                except Exception as e:
+                    self.logger.error(f"处理设备变化失败: {e}")
+                finally:
+                    self._events.task_done()
+        finally:
+            self.backend.exit_thread()
+
+    def _handle_event(self, kind, device_id):
+        with self.lock:
+            if kind == 'default':
+                # 跟随系统默认设备时切换到新的默认设备
+                if self.preferred_id is None and device_id != self.device_id:
+                    self._switch(None)
+                return
+
+            if kind == 'removed':
+                if device_id == self.device_id:
+                    self.logger.warning(f"当前设备已移除，改用默认设备: {device_id}")
+                    self._switch(None)
+                self.backend.forget(device_id)
+            elif kind == 'added':
+                # 首选设备重新插入时切换回去
+                if device_id == self.preferred_id and device_id != self.device_id:
+                    self._switch(device_id)
+
+        for listener in self.device_list_listeners:
+            try:
+                listener()
+            except Exception as e:
+                self.logger.error(f"通知设备列表变化失败: {e}")
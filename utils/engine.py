@@ -0,0 +1,248 @@
+import os
+import sys
+import signal
+import logging
+import threading
+from utils.audio_analyzer import AudioAnalyzer
+from utils.audio_backend import PycawBackend, FakeBackend
+from utils.device_hub import DeviceHub
+from utils.volume_controller import VolumeController
+from utils.metrics import REGISTRY
+
+
+def _demo_program(index, rate=20.0):
+    """模拟后端播放的合成节目：响 30 秒、轻 30 秒、静音 10 秒循环（按读取次数计时）"""
+    seconds = (index / rate) % 70.0
+    if seconds < 30.0:
+        return 0.8
+    if seconds < 60.0:
+        return 0.02
+    return 0.0
+
+
+def create_backend(name='pycaw'):
+    """按名称创建音频后端
+
+    Args:
+        name: 'pycaw'（系统音频，仅 Windows）或 'fake'（内存模拟，播放合成节目，
+            用于在没有音频硬件的机器上冒烟运行）
+    """
+    if name == 'fake':
+        return FakeBackend(peaks=_demo_program)
+    if name == 'pycaw':
+        return PycawBackend()
+    raise ValueError(f"未知音频后端: {name}")
+
+
+class OfficeGuardianWorker:
+    """音频均衡器工作类
+
+    Args:
+        on_volume_change: 音量调整后的回调 on_volume_change(volume)，在分析线程中调用
+    """
+
+    def __init__(self, audio_analyzer, volume_controller, config, on_volume_change=None):
+        self.logger = logging.getLogger('OfficeGuardian.Worker')
+        self.audio_analyzer = audio_analyzer
+        self.volume_controller = volume_controller
+        self.config = config
+        self.on_volume_change = on_volume_change
+        self.running = False
+
+    def start(self):
+        """开始音频均衡处理"""
+        self.running = True
+        self.audio_analyzer.start_analyzing(callback=self.on_audio_event)
+        self.logger.debug("音频均衡处理已启动")
+
+    def stop(self):
+        """停止音频均衡处理"""
+        self.running = False
+        self.audio_analyzer.stop_analyzing()
+        self.logger.info("音频均衡处理已停止")
+
+    def on_audio_event(self, event_type, current_db):
+        """音频事件回调"""
+        if not self.running:
+            return
+
+        if event_type == "over_max":
+            self.logger.debug(
+                "响度过高: %.2f dB > %.2f dB", current_db, self.config.max_db)
+            new_volume = self.volume_controller.adjust_volume_for_db(
+                current_db, self.config.max_db)
+            if self.on_volume_change:
+                self.on_volume_change(new_volume)
+
+        elif event_type == "under_min":
+            self.logger.debug(
+                "响度过低: %.2f dB < %.2f dB", current_db, self.config.min_db)
+            new_volume = self.volume_controller.adjust_volume_for_db(
+                current_db, self.config.min_db)
+            if self.on_volume_change:
+                self.on_volume_change(new_volume)
+
+
+class Engine:
+    """音频均衡引擎：音频后端、设备中心、分析器、音量控制和工作类
+
+    不依赖 wx，界面版本和无界面版本共用。
+
+    Args:
+        config: 配置
+        backend: 音频后端，默认使用 pycaw
+        registry: 指标注册表（也是 --metrics 导出的注册表）
+    """
+
+    def __init__(self, config, backend=None, registry=REGISTRY):
+        self.logger = logging.getLogger('OfficeGuardian.Engine')
+        self.config = config
+        self.registry = registry
+        # 分析器和音量控制共用同一个音频后端
+        self.backend = backend if backend is not None else PycawBackend()
+        self.device_hub = DeviceHub(self.backend, config.device_id)
+        self.volume_controller = VolumeController(config, self.backend, registry=registry)
+        self.audio_analyzer = AudioAnalyzer(config, self.backend, registry=registry)
+        self.device_hub.subscribe(self.audio_analyzer.on_device_changed)
+        self.device_hub.subscribe(self.volume_controller.on_device_changed)
+        self.worker = OfficeGuardianWorker(self.audio_analyzer, self.volume_controller, config)
+        self.history = None
+        if config.history:
+            self._open_history()
+        self.recorder = None
+        if config.trace_record:
+            from utils.trace import TraceRecorder, default_path
+            try:
+                self.recorder = TraceRecorder(default_path(config.base_dir),
+                                              max_bytes=int(config.trace_max_mb * 1024 * 1024))
+                self.audio_analyzer.recorder = self.recorder
+            except OSError as e:
+                self.logger.warning(f"创建采样轨迹文件失败: {e}")
+        self.control_server = None
+        self.metrics_server = None
+        self.stop_event = threading.Event()
+
+    def _open_history(self):
+        """打开响度历史文件，由分析线程在每个快照后按间隔写入"""
+        from utils.history import HistoryWriter, default_path
+        interval = max(0.05, self.config.history_interval)
+        capacity = int(self.config.history_days * 86400 / interval)
+        try:
+            self.history = HistoryWriter(default_path(self.config.base_dir), capacity, interval)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"打开响度历史文件失败: {e}")
+            return
+        self.audio_analyzer.subscribe_snapshot(self.history.on_snapshot)
+
+    def start(self):
+        """开始接收设备通知并启动音频均衡处理"""
+        self.device_hub.start()
+        self.worker.start()
+        if self.config.control_server:
+            # 只有启用时才加载 asyncio
+            from utils.control import ControlServer
+            self.control_server = ControlServer(self, self.config.control_address)
+            if not self.control_server.start():
+                self.control_server = None
+        if self.config.metrics_server:
+            from utils.metrics import MetricsServer
+            self.metrics_server = MetricsServer(self.registry, port=self.config.metrics_port)
+            if not self.metrics_server.start():
+                self.metrics_server = None
+
+    def stop(self):
+        """停止处理并释放资源"""
+        self.stop_event.set()
+        if self.control_server is not None:
+            self.control_server.stop()
+            self.control_server = None
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        self.worker.stop()
+        self.device_hub.stop()
+        self.volume_controller.close()
+        if self.history is not None:
+            self.history.close()
+        if self.recorder is not None:
+            self.audio_analyzer.recorder = None
+            self.recorder.close()
+
+    def run(self):
+        """阻塞到 stop_event 被设置（收到停止信号或调用 request_stop），然后停止引擎"""
+        try:
+            # 带超时等待，保证 Windows 上也能及时响应 Ctrl+C
+            while not self.stop_event.wait(0.5):
+                pass
+        finally:
+            self.stop()
+
+    def request_stop(self, *args):
+        """请求停止（可作为信号处理函数）"""
+        self.stop_event.set()
+
+    def install_signal_handlers(self):
+        """SIGINT/SIGTERM（Windows 上还有 SIGBREAK）触发停止，只能在主线程中调用"""
+        signals = [signal.SIGINT, signal.SIGTERM]
+        if hasattr(signal, 'SIGBREAK'):  # Windows 控制台的 Ctrl+Break / 关闭
+            signals.append(signal.SIGBREAK)
+        for signum in signals:
+            signal.signal(signum, self.request_stop)
+
+
+def get_memory_usage():
+    """当前进程的常驻内存（字节），无法获取时返回 0"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return 0
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def report_startup(logger, trace, mode, print_report=False):
+    """记录启动耗时和常驻内存，print_report 为 True 时打印各阶段和模块导入耗时"""
+    logger.info("%s启动完成: 耗时 %.0f ms, 常驻内存 %.1f MB",
+                mode, trace.elapsed() * 1000, get_memory_usage() / 1024 / 1024)
+    if print_report:
+        print(trace.format_report(), flush=True)
+
+
+def run_headless(config, trace, print_report=False, backend=None):
+    """无界面运行音频均衡引擎，直到收到停止信号，返回退出码
+
+    Args:
+        trace: 启动计时（StartupTrace）
+        print_report: 是否在第一个采样后打印启动报告
+        backend: 音频后端，默认使用 pycaw
+    """
+    logger = logging.getLogger('OfficeGuardian')
+    trace.mark("导入引擎模块")
+    engine = Engine(config, backend)
+    trace.mark("创建引擎（打开音频设备）")
+    engine.install_signal_handlers()
+    engine.start()
+    trace.mark("启动分析线程")
+    if engine.audio_analyzer.first_sample.wait(1.0):
+        trace.mark("第一个采样")
+    report_startup(logger, trace, "无界面模式", print_report)
+    engine.run()
+    logger.info("无界面模式已停止")
+    return 0
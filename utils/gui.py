@@ -1,90 +1,122 @@
 import wx
 import wx.adv
 import logging
-from utils.calibration import CalibrationDialog
-from pycaw.pycaw import AudioUtilities
-from utils.about_dialog import AboutDialog
+from collections import deque
+from utils.logger import add_handler, remove_handler
+from utils.chart import LoudnessChart
 
 class LogHandler(logging.Handler):
-    """自定义日志处理器，支持带颜色的日志显示"""
-    def __init__(self, text_ctrl):
+    """界面日志处理器：记录先放入有界缓冲区，由界面线程定时批量取走
+
+    emit 在后台日志线程中调用，只做追加，不触发界面操作。
+    """
+
+    def __init__(self, capacity=1000):
         super().__init__()
-        self.text_ctrl = text_ctrl
-        
-        # 为不同级别定义更易区分的颜色
-        self.colors = {
-            logging.DEBUG: wx.Colour(120, 120, 120),    # 较深的灰色
-            logging.INFO: wx.Colour(0, 128, 255),       # 天蓝色
-            logging.WARNING: wx.Colour(255, 128, 0),    # 橙色
-            logging.ERROR: wx.Colour(255, 0, 0),        # 红色
-            logging.CRITICAL: wx.Colour(153, 0, 0)      # 深红色
-        }
+        self.capacity = capacity
+        self._pending = deque(maxlen=capacity)
+        self.dropped = 0
 
     def emit(self, record):
         try:
             msg = self.format(record)
-            wx.CallAfter(self._write_log, record, msg)
+            # Handler.handle 已持有 self.lock
+            for line in msg.splitlines() or ['']:
+                if len(self._pending) == self.capacity:
+                    self.dropped += 1
+                self._pending.append((record.levelno, line))
         except Exception:
             self.handleError(record)
 
-    def _write_log(self, record, msg):
-        """在GUI线程中写入日志"""
+    def drain(self):
+        """取走上次调用以来的所有记录（界面线程调用）"""
+        self.acquire()
         try:
-            # 设置文本属性
-            attr = wx.TextAttr()
-            attr.SetTextColour(self.colors.get(record.levelno, wx.Colour(0, 0, 0)))
-            
-            # 根据日志级别设置字体样式
-            if record.levelno >= logging.ERROR:
-                font = wx.Font(wx.NORMAL_FONT.GetPointSize(), wx.FONTFAMILY_DEFAULT,
-                             wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD)
-            else:
-                font = wx.Font(wx.NORMAL_FONT.GetPointSize(), wx.FONTFAMILY_DEFAULT,
-                             wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
-                
-            attr.SetFont(font)
-            
-            # 保存当前位置
-            current_pos = self.text_ctrl.GetLastPosition()
-            
-            # 写入日志文本
-            self.text_ctrl.AppendText(msg + '\n')
-            
-            # 应用样式到新添加的文本
-            self.text_ctrl.SetStyle(current_pos, self.text_ctrl.GetLastPosition(), attr)
-            
-            # 确保最新的日志可见
-            self.text_ctrl.ShowPosition(self.text_ctrl.GetLastPosition())
-            
-            # 添加额外的换行以提高可读性
-            self.text_ctrl.AppendText('\n')
-            
-            # 如果文本过长，保留最后的1000行
-            self._trim_log()
-            
-        except Exception as e:
-            print(f"Error writing log: {e}")  # 用于调试
-
-    def _trim_log(self):
-        """保持日志在合理的长度范围内"""
-        try:
-            max_lines = 1000
-            text = self.text_ctrl.GetValue()
-            lines = text.split('\n')
-            
-            if len(lines) > max_lines:
-                # 保留最后的max_lines行
-                new_text = '\n'.join(lines[-max_lines:])
-                self.text_ctrl.SetValue(new_text)
-                # 移动光标到末尾
-                self.text_ctrl.SetInsertionPointEnd()
-        except Exception:
-            pass
+            if not self._pending:
+                return []
+            records = list(self._pending)
+            self._pending.clear()
+            return records
+        finally:
+            self.release()
+
+
+class LogListCtrl(wx.ListCtrl):
+    """虚拟列表日志视图，只绘制可见行，绘制代价与历史长度无关
+
+    Args:
+        parent: 父窗口
+        capacity: 保留的最大行数
+    """
+
+    def __init__(self, parent, capacity=1000):
+        super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_NO_HEADER | wx.LC_SINGLE_SEL)
+        self.rows = deque(maxlen=capacity)
+        self.InsertColumn(0, "")
+
+        # 为不同级别定义更易区分的颜色，错误以上使用粗体
+        colors = {
+            logging.DEBUG: wx.Colour(120, 120, 120),    # 较深的灰色
+            logging.INFO: wx.Colour(0, 128, 255),       # 天蓝色
+            logging.WARNING: wx.Colour(255, 128, 0),    # 橙色
+            logging.ERROR: wx.Colour(255, 0, 0),        # 红色
+            logging.CRITICAL: wx.Colour(153, 0, 0)      # 深红色
+        }
+        bold = wx.Font(9, wx.FONTFAMILY_TELETYPE, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD)
+        self.attrs = {}
+        for level, color in colors.items():
+            attr = wx.ItemAttr()
+            attr.SetTextColour(color)
+            if level >= logging.ERROR:
+                attr.SetFont(bold)
+            self.attrs[level] = attr
+        self.Bind(wx.EVT_SIZE, self._on_size)
+
+    def append(self, records, redraw=True):
+        """批量追加记录，redraw 为 False 时只更新数据（窗口隐藏时）"""
+        if not records:
+            return
+        self.rows.extend(records)
+        if redraw:
+            self.redraw()
+
+    def redraw(self):
+        """按当前数据更新行数并滚动到最新一行"""
+        count = len(self.rows)
+        self.SetItemCount(count)
+        if count:
+            self.EnsureVisible(count - 1)
+        self.Refresh()
+
+    def OnGetItemText(self, item, column):
+        return self.rows[item][1]
+
+    def OnGetItemAttr(self, item):
+        return self.attrs.get(self.rows[item][0])
+
+    def _on_size(self, event):
+        event.Skip()
+        self.SetColumnWidth(0, max(self.GetClientSize().width, 100))
+
 
 class MainFrame(wx.Frame):
     """主窗口"""
 
-    def __init__(self, parent, audio_analyzer, volume_controller, config, service_manager):
+    # 状态显示刷新间隔（秒），更快的快照会被合并
+    REFRESH_INTERVAL = 0.1
+    # 日志视图保留的行数和批量刷新间隔（毫秒）
+    LOG_CAPACITY = 1000
+    LOG_REFRESH_MS = 200
+
+    STATUS_TEXT = {
+        'over_max': ("响度过高", wx.Colour(255, 0, 0)),
+        'under_min': ("响度过低", wx.Colour(255, 165, 0)),
+        'normal': ("正常", wx.Colour(0, 255, 0)),
+        'silent': ("无音频", wx.Colour(128, 128, 128)),
+    }
+
+    def __init__(self, parent, audio_analyzer, volume_controller, config, service_manager,
+                 device_hub=None):
         super().__init__(parent, title="办公室的大盾 - 音频响度均衡器", 
                         size=(1000, 650))
         
@@ -92,6 +124,7 @@ class MainFrame(wx.Frame):
         self.volume_controller = volume_controller
         self.config = config
         self.service_manager = service_manager
+        self.device_hub = device_hub
         self.logger = logging.getLogger('OfficeGuardian.GUI')
         self.worker = None  # 添加 worker 属性
 
@@ -102,18 +135,31 @@ class MainFrame(wx.Frame):
         self._init_ui()
         self._create_tray_icon()
         
-        # 创建定时器用于更新显示
-        self.update_timer = wx.Timer(self)
-        self.Bind(wx.EVT_TIMER, self._on_timer, self.update_timer)
-        self.update_timer.Start(100)  # 100ms更新一次
+        # 分析线程每个周期推送状态快照，合并后在界面线程刷新（取代定时轮询）
+        self._labels = {}
+        self._refresh_pending = False
+        self._last_refresh = 0.0
+        self._visible = False
+        self.Bind(wx.EVT_SHOW, self._on_show)
+        self.Bind(wx.EVT_ICONIZE, self._on_show)
+        self.audio_analyzer.subscribe_snapshot(self._on_snapshot)
+        self.audio_analyzer.subscribe_snapshot(self.chart.on_snapshot)
 
         # 绑定关闭事件
         self.Bind(wx.EVT_CLOSE, self.on_close)
 
-        # 设置日志处理器
-        log_handler = LogHandler(self.log_text)
-        log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        logging.getLogger('OfficeGuardian').addHandler(log_handler)
+        # 设备插入或移除时刷新设备列表（通知来自设备中心线程）
+        if self.device_hub is not None:
+            self.device_hub.subscribe_device_list(
+                lambda: wx.CallAfter(self._populate_device_list))
+
+        # 设置日志处理器（日志先进入缓冲区，定时批量显示）
+        self.log_handler = LogHandler(self.LOG_CAPACITY)
+        self.log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        add_handler(self.log_handler)
+        self.log_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self._on_log_timer, self.log_timer)
+        self.log_timer.Start(self.LOG_REFRESH_MS)
 
     def set_worker(self, worker):
         """设置 worker 实例"""
@@ -146,7 +192,7 @@ class MainFrame(wx.Frame):
         left_panel = self._create_left_panel(panel)
         main_sizer.Add(left_panel, 3, wx.EXPAND | wx.ALL, 5)
 
-        # 右侧日志面板
+        # 右侧响度曲线和日志面板
         right_panel = self._create_right_panel(panel)
         main_sizer.Add(right_panel, 2, wx.EXPAND | wx.ALL, 5)
 
@@ -162,6 +208,7 @@ class MainFrame(wx.Frame):
         device_sizer = wx.StaticBoxSizer(device_box, wx.VERTICAL)
         self.device_combo = wx.Choice(panel)
         self._populate_device_list()
+        self.device_combo.Bind(wx.EVT_CHOICE, self._on_device_changed)
         device_sizer.Add(self.device_combo, 0, wx.EXPAND | wx.ALL, 5)
         sizer.Add(device_sizer, 0, wx.EXPAND | wx.ALL, 5)
 
@@ -289,21 +336,28 @@ class MainFrame(wx.Frame):
         return panel
 
     def _create_right_panel(self, parent):
-        """创建右侧日志面板"""
+        """创建右侧面板：响度曲线和运行日志"""
         panel = wx.Panel(parent)
         sizer = wx.BoxSizer(wx.VERTICAL)
 
-        # 日志文本框
+        # 响度曲线（最近几分钟的响度、响度范围和系统音量）
+        chart_box = wx.StaticBox(panel, label="响度曲线")
+        chart_sizer = wx.StaticBoxSizer(chart_box, wx.VERTICAL)
+        self.chart = LoudnessChart(panel, self.config)
+        chart_sizer.Add(self.chart, 1, wx.EXPAND)
+        sizer.Add(chart_sizer, 1, wx.EXPAND | wx.ALL, 5)
+
+        # 日志列表（虚拟列表，只绘制可见行）
         log_box = wx.StaticBox(panel, label="运行日志")
         log_sizer = wx.StaticBoxSizer(log_box, wx.VERTICAL)
         
         # 使用等宽字体来改善日志显示效果
         font = wx.Font(9, wx.FONTFAMILY_TELETYPE, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
-        self.log_text = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.TE_RICH2)
-        self.log_text.SetFont(font)
-        self.log_text.SetBackgroundColour(wx.Colour(250, 250, 250))  # 略微灰白的背景色
+        self.log_view = LogListCtrl(panel, self.LOG_CAPACITY)
+        self.log_view.SetFont(font)
+        self.log_view.SetBackgroundColour(wx.Colour(250, 250, 250))  # 略微灰白的背景色
         
-        log_sizer.Add(self.log_text, 1, wx.EXPAND)
+        log_sizer.Add(self.log_view, 1, wx.EXPAND)
         sizer.Add(log_sizer, 1, wx.EXPAND | wx.ALL, 5)
 
         panel.SetSizer(sizer)
@@ -427,12 +481,11 @@ class MainFrame(wx.Frame):
     def _on_tray_left_click(self, event):
         """托盘左键单击"""
         # 显示简单的状态提示
-        current_volume = self.volume_controller.get_volume()
-        current_db = self.audio_analyzer.get_current_db()
+        snapshot = self.audio_analyzer.get_snapshot()
         self.tbicon.ShowBalloon(
             "音频响度状态",
-            f"系统音量: {int(current_volume * 100)}%\n"
-            f"当前响度: {current_db:.1f} dB",
+            f"系统音量: {int(snapshot.volume * 100)}%\n"
+            f"当前响度: {snapshot.current_db:.1f} dB",
             2000
         )
 
@@ -455,6 +508,8 @@ class MainFrame(wx.Frame):
 
     def _on_about(self, event):
         """显示关于对话框"""
+        # 对话框在第一次打开时才加载，缩短启动时间
+        from utils.about_dialog import AboutDialog
         dlg = AboutDialog(self)
         dlg.ShowModal()
         dlg.Destroy()
@@ -464,27 +519,32 @@ class MainFrame(wx.Frame):
         dlg = wx.MessageDialog(self, "确定要退出程序吗？",
                              "确认", wx.YES_NO | wx.NO_DEFAULT | wx.ICON_QUESTION)
         if dlg.ShowModal() == wx.ID_YES:
-            self.tbicon.Destroy()
-            self.Destroy()
+            self._shutdown()
         dlg.Destroy()
 
     def _populate_device_list(self):
         """填充设备列表"""
-        self.audio_devices = AudioUtilities.GetAllDevices()
+        self.audio_devices = self.audio_analyzer.backend.list_devices()
         self.device_combo.Clear()
+        current_id = self.device_hub.device_id if self.device_hub else self.config.device_id
         default_index = 0
-        for i, device in enumerate(self.audio_devices):
-            self.device_combo.Append(device.FriendlyName, device.id)
-            if device.id == self.config.device_id:
+        for i, (device_id, device_name) in enumerate(self.audio_devices):
+            self.device_combo.Append(device_name, device_id)
+            if device_id == current_id:
                 default_index = i
-        self.device_combo.SetSelection(default_index)
-        self.device_combo.Bind(wx.EVT_CHOICE, self._on_device_changed)
+        if self.audio_devices:
+            self.device_combo.SetSelection(default_index)
 
     def _on_device_changed(self, event):
         """设备选择改变"""
         device_id = self.device_combo.GetClientData(event.GetSelection())
         self.config.update(device_id=device_id)
-        self.audio_analyzer.set_device(device_id)
+        if self.device_hub is not None:
+            # 分析器和音量控制一起切换
+            self.device_hub.switch(device_id)
+        else:
+            self.audio_analyzer.set_device(device_id)
+            self.volume_controller.set_device(device_id)
         self.logger.info(f"选择设备: {device_id}")
 
     def _on_max_db_changed(self, event):
@@ -519,32 +579,50 @@ class MainFrame(wx.Frame):
     def _on_minimize_changed(self, event):
         self.config.update(start_minimized=event.IsChecked())
 
-    def _on_timer(self, event):
-        """定时器事件，更新显示"""
-        current_db = self.audio_analyzer.get_current_db()
-        current_volume = self.volume_controller.get_volume()
-        
-        # 更新显示
-        self.db_label.SetLabel(f"当前响度: {current_db:.1f} dB")
-        self.volume_label.SetLabel(f"系统音量: {int(current_volume * 100)}%")
-        
-        # 更新音频状态
-        if self.audio_analyzer.is_playing():
-            if current_db > self.config.max_db:
-                status = "响度过高"
-                color = wx.Colour(255, 0, 0)
-            elif current_db < self.config.min_db:
-                status = "响度过低"
-                color = wx.Colour(255, 165, 0)
-            else:
-                status = "正常"
-                color = wx.Colour(0, 255, 0)
-        else:
-            status = "无音频"
-            color = wx.Colour(128, 128, 128)
-            
-        self.status_label.SetLabel(f"音频状态: {status}")
-        self.status_label.SetForegroundColour(color)
+    def _on_snapshot(self, snapshot):
+        """分析线程推送的快照：窗口隐藏时不刷新，已有待处理的刷新时直接合并"""
+        if not self._visible or self._refresh_pending:
+            return
+        if snapshot.timestamp - self._last_refresh < self.REFRESH_INTERVAL:
+            return
+        self._refresh_pending = True
+        self._last_refresh = snapshot.timestamp
+        wx.CallAfter(self._refresh_status)
+
+    def _on_show(self, event):
+        """窗口显示/隐藏/最小化时更新刷新状态，重新显示时立即刷新一次"""
+        event.Skip()
+        self._visible = self.IsShown() and not self.IsIconized()
+        if self._visible:
+            self._refresh_status()
+            self.log_view.append(self.log_handler.drain(), redraw=False)
+            self.log_view.redraw()
+            self.chart.update()
+
+    def _on_log_timer(self, event):
+        """批量取走缓冲的日志并画出响度曲线的新列，窗口隐藏时不重绘"""
+        self.log_view.append(self.log_handler.drain(), redraw=self._visible)
+        self.chart.update(redraw=self._visible)
+
+    def _refresh_status(self):
+        """用最新的快照更新显示（界面线程）"""
+        self._refresh_pending = False
+        if not self._visible:
+            return
+        snapshot = self.audio_analyzer.get_snapshot()
+        self._set_label(self.db_label, f"当前响度: {snapshot.current_db:.1f} dB")
+        self._set_label(self.volume_label, f"系统音量: {int(snapshot.volume * 100)}%")
+        status, color = self.STATUS_TEXT[snapshot.state]
+        if self._set_label(self.status_label, f"音频状态: {status}"):
+            self.status_label.SetForegroundColour(color)
+
+    def _set_label(self, label, text):
+        """仅在文字变化时调用 SetLabel，返回是否有变化"""
+        if self._labels.get(label.GetId()) == text:
+            return False
+        self._labels[label.GetId()] = text
+        label.SetLabel(text)
+        return True
 
     def _on_reset_clicked(self, event):
         """重置按钮点击"""
@@ -566,10 +644,12 @@ class MainFrame(wx.Frame):
 
     def update_volume(self, volume):
         """更新音量显示"""
-        self.volume_label.SetLabel(f"系统音量: {int(volume * 100)}%")
+        if self._visible:
+            self._set_label(self.volume_label, f"系统音量: {int(volume * 100)}%")
 
     def show_calibration_dialog(self, event):
         """显示校准对话框"""
+        from utils.calibration import CalibrationDialog
         dlg = CalibrationDialog(self, self.audio_analyzer, self.volume_controller)
         if dlg.ShowModal() == wx.ID_OK:
             max_db, min_db, audio_threshold = dlg.get_calibration_results()
@@ -615,5 +695,18 @@ class MainFrame(wx.Frame):
                 2000
             )
         else:
-            self.tbicon.Destroy()
-            self.Destroy()
+            self._shutdown()
+
+    def _shutdown(self):
+        """销毁窗口前取消订阅分析器并停止日志刷新
+
+        快照监听器在分析线程中调用，先取消订阅，避免 wx.CallAfter 落到已销毁的窗口上；
+        分析线程可能仍在遍历取消订阅前的列表，同时把窗口标记为不可见，让这一次回调直接返回。
+        """
+        self._visible = False
+        self.audio_analyzer.unsubscribe_snapshot(self._on_snapshot)
+        self.audio_analyzer.unsubscribe_snapshot(self.chart.on_snapshot)
+        self.log_timer.Stop()
+        remove_handler(self.log_handler)
+        self.tbicon.Destroy()
+        self.Destroy()
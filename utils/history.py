@@ -0,0 +1,263 @@
+"""响度历史：固定大小的内存映射环形文件
+
+文件由 64 字节的文件头和 capacity 条 16 字节的记录组成。记录按写入顺序循环覆盖，
+文件头中的 count 是累计写入的记录数（第 i 条记录位于第 i % capacity 格）。
+
+写入方（分析线程）只做内存写入，不产生系统调用；写完一条记录后才更新 count。
+读取方（可以是其他进程）不加锁：先读 count，复制记录，再读一次 count，
+丢弃期间可能被覆盖的记录。
+
+用法:
+    python -m utils.history              最近 24 小时的逐小时统计
+    python -m utils.history --hours 2 --raw
+"""
+import os
+import sys
+import mmap
+import time
+import struct
+import logging
+from collections import namedtuple
+from utils.decision import db_to_level, level_to_db
+
+# 文件头: 魔数, 版本, 记录大小, 容量, 累计写入数, 创建时间
+HEADER = struct.Struct('<8sIIQQd')
+HEADER_SIZE = 64
+MAGIC = b'OGHIST\x00\x01'
+VERSION = 1
+COUNT_OFFSET = 24
+COUNT = struct.Struct('<Q')
+
+# 记录: 时间戳(Unix 秒), 响度(0.01 dB), 音量(1/65535), 状态
+RECORD = struct.Struct('<dhHB3x')
+RECORD_SIZE = RECORD.size
+
+_pack_record = RECORD.pack_into
+_pack_count = COUNT.pack_into
+
+STATES = ('silent', 'normal', 'over_max', 'under_min')
+STATE_CODES = {name: code for code, name in enumerate(STATES)}
+
+HistoryRecord = namedtuple('HistoryRecord', ['timestamp', 'db', 'volume', 'state'])
+
+
+def default_path(base_dir):
+    return os.path.join(base_dir, 'history', 'loudness.ring')
+
+
+class HistoryWriter:
+    """追加写入响度历史
+
+    作为分析器的快照订阅者使用（on_snapshot 在分析线程中调用），每隔 interval 秒记录一条。
+    文件已存在且格式相同时接着写入，否则重新创建。
+
+    Args:
+        path: 文件路径
+        capacity: 记录条数（文件大小 = 64 + 16 × capacity 字节）
+        interval: 记录间隔（秒），0 表示每个快照都记录
+    """
+
+    def __init__(self, path, capacity, interval=1.0):
+        if capacity < 1:
+            raise ValueError(f"历史记录容量必须至少为 1: {capacity}")
+        self.logger = logging.getLogger('OfficeGuardian.History')
+        self.path = path
+        self.capacity = capacity
+        self.interval = interval
+        self.size = HEADER_SIZE + RECORD.size * capacity
+        self.mm = None
+        self.count = 0
+        self.next_time = 0.0
+        # 快照时间戳是单调时钟，换算为 Unix 时间的偏移量
+        self.wall_offset = time.time() - time.monotonic()
+        self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        fresh = True
+        if os.path.exists(self.path) and os.path.getsize(self.path) == self.size:
+            with open(self.path, 'rb') as f:
+                header = f.read(HEADER.size)
+            magic, version, record_size, capacity, count, _ = HEADER.unpack(header)
+            if (magic, version, record_size, capacity) == (MAGIC, VERSION, RECORD.size, self.capacity):
+                self.count = count
+                fresh = False
+            else:
+                self.logger.warning(f"历史文件格式不同，重新创建: {self.path}")
+        elif os.path.exists(self.path):
+            self.logger.info(f"历史文件容量变化，重新创建: {self.path}")
+
+        if fresh:
+            with open(self.path, 'wb') as f:
+                f.truncate(self.size)
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, self.capacity, 0, time.time()))
+            self.count = 0
+        with open(self.path, 'r+b') as f:
+            self.mm = mmap.mmap(f.fileno(), self.size)
+        self.logger.debug(f"历史文件已打开: {self.path} ({self.count} 条记录)")
+
+    def append(self, timestamp, db, volume, state):
+        """写入一条记录（timestamp 为 Unix 时间）"""
+        mm = self.mm
+        if mm is None:
+            return
+        count = self.count
+        # 量化：响度 0.01 dB（-327.68 ~ 327.67），音量 1/65535；用比较代替 max/min 调用
+        db = db * 100 - 0.5 if db < 0 else db * 100 + 0.5
+        db = -32768 if db < -32768 else (32767 if db > 32767 else int(db))
+        volume = 0 if volume < 0 else (65535 if volume > 1 else int(volume * 65535 + 0.5))
+        _pack_record(mm, HEADER_SIZE + (count % self.capacity) * RECORD_SIZE,
+                     timestamp, db, volume, STATE_CODES.get(state, 0))
+        # 记录写完后再更新 count，读取方不会看到写了一半的记录
+        count += 1
+        _pack_count(mm, COUNT_OFFSET, count)
+        self.count = count
+
+    def on_snapshot(self, snapshot):
+        """分析器快照订阅回调：每隔 interval 秒记录一次当前的平均输出响度"""
+        if snapshot.timestamp < self.next_time:
+            return
+        self.next_time = snapshot.timestamp + self.interval
+        self.append(snapshot.timestamp + self.wall_offset, level_to_db(snapshot.output_level),
+                    snapshot.volume, snapshot.state)
+
+    def close(self):
+        """把内存中的修改写回文件并关闭"""
+        mm, self.mm = self.mm, None
+        if mm is not None:
+            mm.flush()
+            mm.close()
+
+
+class HistoryReader:
+    """读取响度历史（只读映射，可与写入进程同时使用）"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, capacity, _, self.created = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.mm.close()
+            raise ValueError(f"不是响度历史文件: {path}")
+        self.capacity = capacity
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _count(self):
+        return COUNT.unpack_from(self.mm, COUNT_OFFSET)[0]
+
+    def _timestamp(self, index):
+        return struct.unpack_from('<d', self.mm, HEADER_SIZE + (index % self.capacity) * RECORD.size)[0]
+
+    def read(self, since=None, until=None):
+        """按时间顺序返回 [since, until) 内的记录（HistoryRecord 列表，时间为 Unix 秒）"""
+        count = self._count()
+        first = max(0, count - self.capacity)
+        if since is not None:
+            # 记录按时间顺序写入，二分查找起点
+            low, high = first, count
+            while low < high:
+                middle = (low + high) // 2
+                if self._timestamp(middle) < since:
+                    low = middle + 1
+                else:
+                    high = middle
+            first = low
+
+        # 复制记录（环形缓冲区最多分两段）
+        chunks = []
+        start = first
+        while start < count:
+            slot = start % self.capacity
+            length = min(count - start, self.capacity - slot)
+            offset = HEADER_SIZE + slot * RECORD.size
+            chunks.append(self.mm[offset:offset + length * RECORD.size])
+            start += length
+
+        # 复制期间写入方可能已覆盖最旧的记录（以及正在写入的那一格）
+        overwritten = self._count() - self.capacity + 1
+        skip = max(0, overwritten - first)
+
+        data = b''.join(chunks)[skip * RECORD.size:]
+        states = STATES + ('silent',) * (256 - len(STATES))
+        records = [HistoryRecord(timestamp, db / 100, volume / 65535, states[state])
+                   for timestamp, db, volume, state in RECORD.iter_unpack(data)]
+        if until is not None:
+            while records and records[-1].timestamp >= until:
+                records.pop()
+        return records
+
+
+def summarize(records, bucket=3600.0):
+    """按时间段统计：平均/最大响度（只计有音频的记录）、平均音量、各状态记录数"""
+    buckets = {}
+    for record in records:
+        key = int(record.timestamp // bucket) * bucket
+        stats = buckets.get(key)
+        if stats is None:
+            stats = buckets[key] = {'start': key, 'records': 0, 'playing': 0, 'level': 0.0,
+                                    'max_db': None, 'volume': 0.0, 'over_max': 0, 'under_min': 0}
+        stats['records'] += 1
+        stats['volume'] += record.volume
+        if record.state != 'silent':
+            stats['playing'] += 1
+            # 在线性幅度域平均（与分析器的滑动平均一致）
+            stats['level'] += db_to_level(record.db)
+            if stats['max_db'] is None or record.db > stats['max_db']:
+                stats['max_db'] = record.db
+        if record.state in ('over_max', 'under_min'):
+            stats[record.state] += 1
+    result = []
+    for key in sorted(buckets):
+        stats = buckets[key]
+        stats['mean_db'] = level_to_db(stats['level'] / stats['playing']) if stats['playing'] else None
+        stats['volume'] /= stats['records']
+        result.append(stats)
+    return result
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='办公室的大盾 - 响度历史')
+    parser.add_argument('--file', default=None, help='历史文件路径（默认为程序目录下的 history/loudness.ring）')
+    parser.add_argument('--hours', type=float, default=24.0, help='显示最近多少小时')
+    parser.add_argument('--raw', action='store_true', help='逐条输出记录')
+    args = parser.parse_args(argv)
+
+    path = args.file or default_path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        reader = HistoryReader(path)
+    except (OSError, ValueError) as e:
+        print(f"无法读取历史文件: {e}")
+        return 1
+    with reader:
+        records = reader.read(since=time.time() - args.hours * 3600)
+
+    if args.raw:
+        for record in records:
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.timestamp))} "
+                  f"{record.db:7.2f} dB  音量 {record.volume * 100:5.1f}%  {record.state}")
+        return 0
+
+    print("时间段              有音频    平均响度   最大响度   平均音量  过响  过轻")
+    for stats in summarize(records):
+        mean = f"{stats['mean_db']:7.1f} dB" if stats['mean_db'] is not None else "      - "
+        peak = f"{stats['max_db']:7.1f} dB" if stats['max_db'] is not None else "      - "
+        print(f"{time.strftime('%Y-%m-%d %H:00', time.localtime(stats['start']))}  "
+              f"{stats['playing'] / stats['records'] * 100:6.1f}%  {mean}  {peak}  "
+              f"{stats['volume'] * 100:6.1f}%  {stats['over_max']:4d}  {stats['under_min']:4d}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,27 @@
+import os
+import queue
 import logging
+import logging.handlers
+
+# 后台日志线程；各线程只把记录放入队列，格式化和输出都在这个线程中完成
+_listener = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """只把记录原样放入进程内队列，消息的格式化留给后台日志线程"""
+
+    def prepare(self, record):
+        return record
 
 
 def setup_logger(config):
-    """设置日志系统"""
+    """设置日志系统
+
+    'OfficeGuardian' 日志记录器只挂一个 QueueHandler，控制台、日志文件和界面等
+    输出处理器由后台的 QueueListener 调用，分析线程记录日志时不会阻塞在输出上。
+    """
+    global _listener
+
     # 获取日志级别
     log_level_str = getattr(config, 'logging_level', 'INFO')
     log_level = getattr(logging, log_level_str, logging.INFO)
@@ -12,21 +31,72 @@ def setup_logger(config):
     logger.setLevel(log_level)
 
     # 清除现有处理器
+    shutdown_logger()
     if logger.handlers:
         logger.handlers = []
 
-    # 创建控制台处理器
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(log_level)
-
     # 创建格式化器
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # 创建控制台处理器
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
+    handlers = [console_handler]
 
-    # 添加处理器到日志记录器
-    logger.addHandler(console_handler)
+    # 按大小滚动的日志文件，便于无人值守的机器排查问题
+    if getattr(config, 'log_file', False):
+        try:
+            log_dir = os.path.join(config.base_dir, 'logs')
+            os.makedirs(log_dir, exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                os.path.join(log_dir, 'office_guardian.log'),
+                maxBytes=int(config.log_file_max_kb * 1024),
+                backupCount=config.log_file_backups,
+                encoding='utf-8')
+            file_handler.setLevel(log_level)
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+        except OSError as e:
+            console_handler.handle(logging.makeLogRecord({
+                'name': 'OfficeGuardian', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"无法创建日志文件: {e}"}))
 
-    logger.info(f"日志系统初始化完成，级别: {log_level_str}")
+    # 添加队列处理器到日志记录器
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(_QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    logger.info("日志系统初始化完成，级别: %s", log_level_str)
 
     return logger
+
+
+def add_handler(handler):
+    """添加输出处理器（例如界面日志视图），在后台日志线程中调用"""
+    if _listener is None:
+        logging.getLogger('OfficeGuardian').addHandler(handler)
+    else:
+        _listener.handlers = _listener.handlers + (handler,)
+
+
+def remove_handler(handler):
+    """移除输出处理器"""
+    if _listener is None:
+        logging.getLogger('OfficeGuardian').removeHandler(handler)
+    else:
+        _listener.handlers = tuple(h for h in _listener.handlers if h is not handler)
+
+
+def shutdown_logger():
+    """输出队列中剩余的日志并停止后台日志线程（程序退出前调用）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.flush()
+            if isinstance(handler, logging.FileHandler):
+                handler.close()
+        _listener = None
@@ -0,0 +1,251 @@
+import math
+import wave
+from collections import deque
+import numpy as np
+
+
+def k_weighting_coefficients(samplerate):
+    """按 ITU-R BS.1770 计算K加权两级双二阶滤波器系数 [(b, a), (b, a)]"""
+    # 第一级：高架滤波器（模拟头部声学效应）
+    f0 = 1681.974450955533
+    gain = 3.999843853973347
+    q = 0.7071752369554196
+    k = math.tan(math.pi * f0 / samplerate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = ((
+        (vh + vb * k / q + k * k) / a0,
+        2 * (k * k - vh) / a0,
+        (vh - vb * k / q + k * k) / a0,
+    ), (
+        1.0,
+        2 * (k * k - 1) / a0,
+        (1 - k / q + k * k) / a0,
+    ))
+
+    # 第二级：RLB高通滤波器
+    f0 = 38.13547087602444
+    q = 0.5003270373238773
+    k = math.tan(math.pi * f0 / samplerate)
+    a0 = 1 + k / q + k * k
+    highpass = ((1.0, -2.0, 1.0), (
+        1.0,
+        2 * (k * k - 1) / a0,
+        (1 - k / q + k * k) / a0,
+    ))
+    return [shelf, highpass]
+
+
+class _PoleSection:
+    """一阶全极点递推 y[n] = x[n] + p*y[n-1] 的向量化实现
+
+    把块切成长度为 L 的子块，每个子块内用 y[n] = p^n * cumsum(x[k] * p^-k) 一次算完，
+    L 的选取保证 |p|^-L 不超过 1e6，避免精度损失。
+    """
+
+    def __init__(self, pole, channels):
+        self.pole = pole
+        magnitude = abs(pole)
+        length = int(6 / -math.log10(magnitude)) if 0 < magnitude < 1 else 4096
+        self.length = max(1, min(length, 4096))
+        n = np.arange(self.length)
+        self.powers = pole ** (n + 1)  # p^(n+1)
+        self.inverse = pole ** -n.astype(float) if pole != 0 else None  # p^-n
+        self.state = np.zeros(channels, dtype=complex)
+
+    def process(self, x):
+        if self.pole == 0:
+            return x.astype(complex)
+        out = np.empty(x.shape, dtype=complex)
+        length = self.length
+        for start in range(0, len(x), length):
+            chunk = x[start:start + length]
+            n = len(chunk)
+            powers = self.powers[:n, None]
+            acc = np.cumsum(chunk * self.inverse[:n, None], axis=0)
+            y = powers * (acc / self.pole + self.state)
+            out[start:start + n] = y
+            self.state = y[-1]
+        return out
+
+
+class Biquad:
+    """可流式处理多声道采样块的双二阶IIR滤波器（向量化实现）
+
+    先算分子（FIR部分），再处理分母：共轭复极点时按部分分式只需一次复数递推，
+    y = 2 * Re(A * u)，A = p / (p - conj(p))；实极点时用两个一阶递推级联。
+    """
+
+    def __init__(self, b, a, channels):
+        self.b = [c / a[0] for c in b]
+        a1, a2 = a[1] / a[0], a[2] / a[0]
+        disc = complex(a1 * a1 - 4 * a2) ** 0.5
+        poles = ((-a1 + disc) / 2, (-a1 - disc) / 2)
+        if disc.imag != 0:
+            self.sections = [_PoleSection(poles[0], channels)]
+            self.residue = poles[0] / (poles[0] - poles[1])
+        else:
+            self.sections = [_PoleSection(p, channels) for p in poles]
+            self.residue = None
+        self.history = np.zeros((2, channels))
+
+    def process(self, x):
+        """x: (帧数, 声道数)，返回同形状的滤波结果"""
+        b0, b1, b2 = self.b
+        padded = np.concatenate((self.history, x), axis=0)
+        w = b0 * padded[2:] + b1 * padded[1:-1] + b2 * padded[:-2]
+        self.history = padded[-2:]
+        if self.residue is not None:
+            u = self.sections[0].process(w)
+            return 2 * (self.residue * u).real
+        y = w
+        for section in self.sections:
+            y = section.process(y)
+        return y.real
+
+
+class LufsMeter:
+    """ITU-R BS.1770 / EBU R128 流式响度计
+
+    支持瞬时响度（400ms）、短期响度（3s）和带门限的综合响度。
+    采样块可以来自回环采集、文件或其他任意来源，块长度任意。
+    综合响度用 0.1 LU 分辨率的直方图累计，内存占用恒定。
+
+    Args:
+        samplerate: 采样率
+        channels: 声道数
+        weights: 各声道权重，默认按 BS.1770（5.1 环绕声道 1.41，LFE 为 0）
+    """
+
+    ABSOLUTE_GATE = -70.0
+    RELATIVE_GATE = -10.0
+    HIST_MIN = -70.0
+    HIST_MAX = 10.0
+    HIST_STEP = 0.1
+    # 功率换算为等效线性幅度的系数，对应 BS.1770 的 -0.691 dB 偏移
+    LEVEL_SCALE = 10 ** (-0.691 / 20)
+
+    def __init__(self, samplerate, channels, weights=None):
+        self.samplerate = samplerate
+        self.channels = channels
+        if weights is None:
+            weights = [1.0] * channels
+            if channels == 6:  # L R C LFE Ls Rs
+                weights = [1.0, 1.0, 1.0, 0.0, 1.41, 1.41]
+        self.weights = np.asarray(weights, dtype=float)
+        self.filters = [Biquad(b, a, channels) for b, a in k_weighting_coefficients(samplerate)]
+
+        # 100ms 为一个步长，瞬时响度取4个步长，短期响度取30个步长
+        self.hop_frames = int(round(samplerate * 0.1))
+        self.hop_energy = np.zeros(channels)
+        self.hop_filled = 0
+        self.hops = deque(maxlen=30)
+
+        bins = int(round((self.HIST_MAX - self.HIST_MIN) / self.HIST_STEP))
+        self.hist_count = np.zeros(bins, dtype=np.int64)
+        self.hist_power = np.zeros(bins)
+
+    def reset(self):
+        """清空所有测量结果"""
+        self.__init__(self.samplerate, self.channels, self.weights)
+
+    def process(self, block):
+        """处理一个采样块，block 形状为 (帧数, 声道数)"""
+        block = np.asarray(block, dtype=float)
+        if block.ndim == 1:
+            block = block[:, None]
+        for filt in self.filters:
+            block = filt.process(block)
+        squared = block * block
+
+        pos = 0
+        total = len(squared)
+        while pos < total:
+            take = min(self.hop_frames - self.hop_filled, total - pos)
+            self.hop_energy += squared[pos:pos + take].sum(axis=0)
+            self.hop_filled += take
+            pos += take
+            if self.hop_filled == self.hop_frames:
+                power = float(np.dot(self.weights, self.hop_energy)) / self.hop_frames
+                self.hops.append(power)
+                self.hop_energy[:] = 0.0
+                self.hop_filled = 0
+                if len(self.hops) >= 4:
+                    self._add_gating_block(self._mean_power(4))
+
+    def _mean_power(self, count):
+        hops = list(self.hops)[-count:]
+        return sum(hops) / len(hops)
+
+    def _add_gating_block(self, power):
+        """把一个400ms门限块计入综合响度直方图"""
+        loudness = self._to_lufs(power)
+        if loudness <= self.ABSOLUTE_GATE:
+            return
+        index = int((loudness - self.HIST_MIN) / self.HIST_STEP)
+        index = min(index, len(self.hist_count) - 1)
+        self.hist_count[index] += 1
+        self.hist_power[index] += power
+
+    @staticmethod
+    def _to_lufs(power):
+        return -0.691 + 10 * math.log10(power) if power > 0 else -math.inf
+
+    def momentary(self):
+        """瞬时响度（LUFS，最近400ms）"""
+        if len(self.hops) < 4:
+            return -math.inf
+        return self._to_lufs(self._mean_power(4))
+
+    def short_term(self):
+        """短期响度（LUFS，最近3s，不足3s时取已有数据）"""
+        if not self.hops:
+            return -math.inf
+        return self._to_lufs(self._mean_power(30))
+
+    def short_term_level(self):
+        """短期响度对应的等效线性幅度（20*log10 即为 LUFS），供不做对数运算的阈值比较使用"""
+        if not self.hops:
+            return 0.0
+        return self.LEVEL_SCALE * math.sqrt(self._mean_power(30))
+
+    def integrated(self):
+        """带绝对门限（-70 LUFS）和相对门限（-10 LU）的综合响度"""
+        count = self.hist_count.sum()
+        if count == 0:
+            return -math.inf
+        threshold = self._to_lufs(self.hist_power.sum() / count) + self.RELATIVE_GATE
+        start = max(0, int(math.ceil((threshold - self.HIST_MIN) / self.HIST_STEP)))
+        count = self.hist_count[start:].sum()
+        if count == 0:
+            return -math.inf
+        return self._to_lufs(self.hist_power[start:].sum() / count)
+
+
+def read_wav_blocks(path, blocksize=4800):
+    """从PCM WAV文件按块读取采样，生成 (采样率, 声道数, 块) """
+    with wave.open(path, 'rb') as wav:
+        samplerate = wav.getframerate()
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+        scale = float(2 ** (8 * width - 1))
+        while True:
+            data = wav.readframes(blocksize)
+            if not data:
+                break
+            block = np.frombuffer(data, dtype=dtype).reshape(-1, channels).astype(float)
+            if width == 1:
+                block -= 128.0
+            yield samplerate, channels, block / scale
+
+
+def measure_file(path):
+    """计算WAV文件的综合响度（LUFS）"""
+    meter = None
+    for samplerate, channels, block in read_wav_blocks(path):
+        if meter is None:
+            meter = LufsMeter(samplerate, channels)
+        meter.process(block)
+    return meter.integrated() if meter is not None else -math.inf
@@ -0,0 +1,224 @@
+"""进程内指标：计数器、仪表和固定分桶直方图，以 Prometheus 文本格式输出
+
+同一个序列可能由多个线程写入（例如音量写入次数来自工作线程、界面线程、控制接口和
+渐变执行线程），计数器和直方图的更新各自持有一把锁，不会丢失计数；锁只在单个指标内
+竞争，开销约为一次无竞争加锁。读取方在抓取时直接读数值，偶尔看到直方图的 sum 与分桶
+之间差一次观测是可以接受的。注册（get-or-create）在初始化时进行，由注册表的锁保护。
+"""
+import logging
+import threading
+from bisect import bisect_left
+
+# 耗时类直方图的默认分桶（秒）：10µs ~ 1s
+DURATION_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class Counter:
+    """单调递增的计数器"""
+
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Gauge:
+    """可任意设置的数值；给定 func 时在抓取时调用 func() 取值"""
+
+    __slots__ = ('value', 'func')
+
+    def __init__(self, func=None):
+        self.value = 0.0
+        self.func = func
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        if self.func is not None:
+            return self.func()
+        return self.value
+
+
+class Histogram:
+    """固定分桶的直方图
+
+    observe() 只做一次二分查找和加锁的两次加法。counts 的最后一格对应 +Inf，
+    总观测次数由各分桶相加得到。
+    """
+
+    __slots__ = ('bounds', 'counts', 'sum', 'lock')
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        # bisect_left: 第一个 >= value 的上界，即 Prometheus 的 le 语义
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class MetricsRegistry:
+    """指标注册表
+
+    同名同标签的指标只创建一次，重复注册返回已有对象（多个组件可以共用一个序列）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 指标名 -> (类型, 说明, {标签元组: 指标对象})
+        self._families = {}
+
+    def _get(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (kind, help_text, {})
+            elif family[0] != kind:
+                raise ValueError(f"指标 {name} 已注册为 {family[0]}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = factory()
+            return metric
+
+    def counter(self, name, help_text, **labels):
+        return self._get('counter', name, help_text, labels, Counter)
+
+    def gauge(self, name, help_text, func=None, **labels):
+        gauge = self._get('gauge', name, help_text, labels, Gauge)
+        if func is not None:
+            # 重新注册时以最新的取值函数为准（例如引擎重建后）
+            gauge.func = func
+        return gauge
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS, **labels):
+        return self._get('histogram', name, help_text, labels, lambda: Histogram(buckets))
+
+    def render(self):
+        """Prometheus 文本格式（0.0.4）"""
+        with self._lock:
+            families = sorted((name, kind, help_text, list(series.items()))
+                              for name, (kind, help_text, series) in self._families.items())
+        lines = []
+        for name, kind, help_text, series in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in series:
+                if kind == 'histogram':
+                    counts = list(metric.counts)
+                    total = 0
+                    for bound, count in zip(metric.bounds, counts):
+                        total += count
+                        lines.append(f"{name}_bucket{_labels(key, ('le', _number(bound)))} {total}")
+                    total += counts[-1]
+                    lines.append(f"{name}_bucket{_labels(key, ('le', '+Inf'))} {total}")
+                    lines.append(f"{name}_sum{_labels(key)} {_number(metric.sum)}")
+                    lines.append(f"{name}_count{_labels(key)} {total}")
+                else:
+                    try:
+                        value = metric.get() if kind == 'gauge' else metric.value
+                    except Exception:
+                        continue
+                    lines.append(f"{name}{_labels(key)} {_number(value)}")
+        lines.append('')
+        return '\n'.join(lines)
+
+
+def _number(value):
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), float('-inf')):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+def _labels(key, extra=None):
+    pairs = list(key)
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+# 默认注册表，各组件的指标都注册在这里
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """在本机回环地址上以 HTTP 提供 /metrics（Prometheus 抓取）
+
+    Args:
+        registry: 指标注册表
+        port: 监听端口（只绑定 127.0.0.1）
+    """
+
+    def __init__(self, registry=REGISTRY, port=9464):
+        self.logger = logging.getLogger('OfficeGuardian.Metrics')
+        self.registry = registry
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """在后台线程中启动 HTTP 服务，返回是否启动成功"""
+        # 只有启用时才加载 http.server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+        logger = self.logger
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        try:
+            self.server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        except OSError as e:
+            self.logger.error(f"指标服务启动失败: {e}")
+            return False
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.logger.info(f"指标服务已启动: http://127.0.0.1:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        """停止 HTTP 服务"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            self.thread = None
+            self.logger.info("指标服务已停止")
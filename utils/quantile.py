@@ -0,0 +1,89 @@
+"""流式分位数估计
+
+QuantileSketch 把分贝值计入固定分辨率的直方图：内存固定（与采样数无关），每个采样 O(1)，
+任意分位数的误差不超过一个分箱宽度（默认 0.1 dB）。分贝值的范围有界，固定分箱比
+t-digest 等通用结构更简单，也没有合并误差。
+
+add 在分析线程中调用，quantile / histogram 在界面线程中读取计数的副本，不需要加锁。
+没有清零方法：需要重新开始统计时换用新的对象，避免清零与 add 交错使 count 和各分箱不一致。
+"""
+
+
+class QuantileSketch:
+    """分贝值的流式分位数估计
+
+    Args:
+        low / high: 分箱范围（dB），范围外的值计入两端的分箱
+        resolution: 分箱宽度（dB）
+    """
+
+    def __init__(self, low=-100.0, high=0.0, resolution=0.1):
+        self.low = low
+        self.high = high
+        self.resolution = resolution
+        self.bins = int(round((high - low) / resolution))
+        self._scale = self.bins / (high - low)
+        self.counts = [0] * self.bins
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, db):
+        index = int((db - self.low) * self._scale)
+        if index < 0:
+            index = 0
+        elif index >= self.bins:
+            index = self.bins - 1
+        self.counts[index] += 1
+        self.count += 1
+        if self.minimum is None or db < self.minimum:
+            self.minimum = db
+        if self.maximum is None or db > self.maximum:
+            self.maximum = db
+
+    def quantiles(self, qs):
+        """多个分位数（0~100 的百分数，升序），没有采样时返回 None 列表
+
+        与 numpy.percentile 的线性插值一致到分箱宽度以内：分箱内的值视为均匀分布。
+        """
+        counts = self.counts[:]
+        total = sum(counts)
+        if not total:
+            return [None] * len(qs)
+        results = []
+        cumulative = 0
+        index = 0
+        width = 1.0 / self._scale
+        for q in qs:
+            rank = q / 100.0 * total
+            while index < self.bins - 1 and cumulative + counts[index] < rank:
+                cumulative += counts[index]
+                index += 1
+            count = counts[index]
+            fraction = (rank - cumulative) / count if count else 0.5
+            value = self.low + (index + fraction) * width
+            # 分箱内插值不会超出实际出现过的范围
+            if self.minimum is not None and value < self.minimum:
+                value = self.minimum
+            if self.maximum is not None and value > self.maximum:
+                value = self.maximum
+            results.append(value)
+        return results
+
+    def quantile(self, q):
+        """单个分位数（0~100 的百分数）"""
+        return self.quantiles([q])[0]
+
+    def histogram(self, low, high, bins):
+        """把 [low, high) 重新分成 bins 个分箱，返回各分箱的计数（用于显示）"""
+        counts = self.counts[:]
+        result = [0] * bins
+        scale = bins / (high - low)
+        width = 1.0 / self._scale
+        for index, count in enumerate(counts):
+            if not count:
+                continue
+            target = int((self.low + (index + 0.5) * width - low) * scale)
+            if 0 <= target < bins:
+                result[target] += count
+        return result
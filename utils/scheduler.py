@@ -0,0 +1,104 @@
+import time
+
+
+class AdaptiveScheduler:
+    """基于单调时钟截止时间的自适应采样调度器
+
+    有音频时以 active_rate 采样；连续静音超过 silence_hold 秒后降到 idle_rate，
+    减少空闲时的CPU唤醒次数。截止时间按周期累加而不是在处理后 sleep 固定时长，
+    因此处理耗时不会让实际采样率漂移。
+    """
+
+    def __init__(self, active_rate=20.0, idle_rate=2.0, silence_hold=10.0,
+                 clock=time.monotonic):
+        self.clock = clock
+        self.active_rate = active_rate
+        self.idle_rate = idle_rate
+        self.silence_hold = silence_hold
+        self.active = True
+        self.period = 1.0 / active_rate
+        self.next_deadline = None
+        self.last_activity = None
+        self.last_wake = None
+        # 统计数据（指数滑动平均）
+        self.avg_interval = self.period
+        self.avg_jitter = 0.0
+        self.max_jitter = 0.0
+        self.ticks = 0
+        self.missed = 0
+
+    def configure(self, active_rate=None, idle_rate=None, silence_hold=None):
+        """更新采样参数"""
+        if active_rate:
+            self.active_rate = active_rate
+        if idle_rate:
+            self.idle_rate = idle_rate
+        if silence_hold is not None:
+            self.silence_hold = silence_hold
+        self.period = 1.0 / (self.active_rate if self.active else self.idle_rate)
+
+    def start(self):
+        """重置调度状态，从当前时刻开始计时"""
+        now = self.clock()
+        self.active = True
+        self.period = 1.0 / self.active_rate
+        self.next_deadline = now
+        self.last_activity = now
+        self.last_wake = now
+        self.avg_interval = self.period
+        self.avg_jitter = 0.0
+        self.max_jitter = 0.0
+        self.ticks = 0
+        self.missed = 0
+
+    def update(self, has_audio):
+        """根据是否有音频切换采样率，返回是否发生了切换"""
+        now = self.clock()
+        if has_audio:
+            self.last_activity = now
+            active = True
+        else:
+            active = now - self.last_activity < self.silence_hold
+
+        if active == self.active:
+            return False
+        self.active = active
+        self.period = 1.0 / (self.active_rate if active else self.idle_rate)
+        return True
+
+    def wait(self, stop_event):
+        """等待到下一个截止时间，stop_event 被设置时返回 False"""
+        self.next_deadline += self.period
+        now = self.clock()
+        if self.next_deadline < now:
+            # 已错过截止时间，丢弃落后的周期而不是连续补采
+            self.missed += 1
+            self.next_deadline = now
+        elif stop_event.wait(self.next_deadline - now):
+            return False
+
+        wake = self.clock()
+        jitter = wake - self.next_deadline
+        if jitter > self.max_jitter:
+            self.max_jitter = jitter
+        self.avg_jitter += (abs(jitter) - self.avg_jitter) * 0.05
+        self.avg_interval += (wake - self.last_wake - self.avg_interval) * 0.05
+        self.last_wake = wake
+        self.ticks += 1
+        return not stop_event.is_set()
+
+    @property
+    def rate(self):
+        """当前目标采样率 (Hz)"""
+        return 1.0 / self.period
+
+    def get_stats(self):
+        """获取采样统计：实际采样率、平均/最大抖动（秒）"""
+        return {
+            'target_rate': self.rate,
+            'achieved_rate': 1.0 / self.avg_interval if self.avg_interval > 0 else 0.0,
+            'jitter': self.avg_jitter,
+            'max_jitter': self.max_jitter,
+            'ticks': self.ticks,
+            'missed': self.missed,
+        }
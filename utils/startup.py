@@ -0,0 +1,126 @@
+import sys
+import time
+import threading
+import importlib.abc
+
+
+class StartupTrace:
+    """冷启动阶段计时：记录从进程启动到第一个采样之间各阶段的时间点
+
+    Args:
+        started_at: 启动时刻（time.perf_counter()）
+        import_timer: 可选的 ImportTimer，报告中附带模块导入耗时
+    """
+
+    def __init__(self, started_at, import_timer=None):
+        self.started_at = started_at
+        self.import_timer = import_timer
+        self.marks = []
+
+    def mark(self, name):
+        """记录一个阶段完成的时间点"""
+        self.marks.append((name, time.perf_counter()))
+
+    def elapsed(self):
+        """从启动到现在的时长（秒）"""
+        return time.perf_counter() - self.started_at
+
+    def format_report(self, top=25):
+        """格式化启动报告：各阶段时间点，以及（如果启用）导入耗时最多的模块"""
+        lines = ["启动阶段 (距启动 / 本阶段):"]
+        previous = self.started_at
+        for name, at in self.marks:
+            lines.append(f"  {(at - self.started_at) * 1000:8.1f} ms {(at - previous) * 1000:8.1f} ms  {name}")
+            previous = at
+        if self.import_timer is not None:
+            lines.append("")
+            lines.extend(self.import_timer.format_report(top))
+        return '\n'.join(lines)
+
+
+class _TimedLoader:
+    """包装模块加载器，记录 exec_module 的耗时，其他属性转发给原加载器"""
+
+    def __init__(self, loader, timer):
+        self._loader = loader
+        self._timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        # 扩展模块的初始化发生在 create_module 中
+        self._timer._enter()
+        try:
+            return self._loader.create_module(spec)
+        finally:
+            self._timer._leave(spec.name)
+
+    def exec_module(self, module):
+        self._timer._enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer._leave(module.__name__)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """记录每个模块的导入耗时（类似 python -X importtime）
+
+    累计耗时包含该模块导入的子模块，自身耗时不包含。只在 --startup-report 时安装。
+    """
+
+    def __init__(self):
+        self.times = {}   # 模块名 -> (自身耗时, 累计耗时)
+        self._local = threading.local()  # 每个线程的导入栈 [开始时间, 子模块累计耗时]
+
+    @property
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def _enter(self):
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def _leave(self, name):
+        stack = self._stack
+        start, children = stack.pop()
+        cumulative = time.perf_counter() - start
+        own, total = self.times.get(name, (0.0, 0.0))
+        self.times[name] = (own + cumulative - children, total + cumulative)
+        if stack:
+            stack[-1][1] += cumulative
+
+    def total(self):
+        """所有顶层导入的总耗时（秒）"""
+        return sum(own for own, _ in self.times.values())
+
+    def format_report(self, top=25):
+        lines = [f"模块导入: 共 {len(self.times)} 个, {self.total() * 1000:.1f} ms "
+                 f"(按累计耗时排序，前 {top} 个):",
+                 "   累计(ms)   自身(ms)  模块"]
+        ranked = sorted(self.times.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (own, cumulative) in ranked[:top]:
+            lines.append(f"  {cumulative * 1000:9.1f} {own * 1000:10.1f}  {name}")
+        return lines
@@ -0,0 +1,260 @@
+"""采样轨迹的录制与回放
+
+录制：分析线程把每个原始采样（单调时钟时间、峰值、RMS、主音量、各声道峰值）追加到
+二进制轨迹文件，写入经过缓冲，不是每个采样一次系统调用。
+
+回放：用虚拟时钟把轨迹重新送入 AudioAnalyzer 和 OfficeGuardianWorker，音量由
+VolumeController 写入内存后端（闭环），结果只取决于轨迹和配置，可以精确复现，
+速度为实时的数千倍。
+
+文件格式: 文件头 '<8sHHd'（魔数, 版本, 保留, Unix 时间与单调时钟的差），
+之后每条记录 '<dfffB'（时间, 峰值, 音量, RMS 或 NaN, 声道数）加声道数个 float32。
+
+用法:
+    python -m utils.trace info trace.ogtrace
+    python -m utils.trace replay trace.ogtrace --set max_db=-12 control_mode=pi
+"""
+import os
+import sys
+import time
+import struct
+import itertools
+import logging
+from utils.audio_backend import AudioSample
+
+HEADER = struct.Struct('<8sHHd')
+MAGIC = b'OGTRACE\x01'
+VERSION = 1
+RECORD = struct.Struct('<dfffB')
+NAN = float('nan')
+
+# 各声道数对应的声道峰值格式
+_CHANNELS = [struct.Struct(f'<{n}f') for n in range(256)]
+
+
+def default_path(base_dir):
+    return os.path.join(base_dir, 'traces', time.strftime('trace-%Y%m%d-%H%M%S.ogtrace'))
+
+
+class TraceRecorder:
+    """把原始采样追加到轨迹文件（在分析线程中调用 record）
+
+    Args:
+        path: 文件路径
+        buffer_size: 写缓冲区大小（字节），缓冲区满时才写入文件
+        max_bytes: 文件的最大大小（字节），达到后停止录制；None 表示不限制
+    """
+
+    def __init__(self, path, buffer_size=64 * 1024, max_bytes=None):
+        self.logger = logging.getLogger('OfficeGuardian.Trace')
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.file = open(path, 'wb', buffering=buffer_size)
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, time.time() - time.monotonic()))
+        self.samples = 0
+        self.size = HEADER.size
+        self.max_bytes = max_bytes
+        self.logger.info(f"开始录制采样轨迹: {path}")
+
+    def record(self, sample):
+        file = self.file
+        if file is None:
+            return
+        channel_peaks = sample.channel_peaks
+        count = len(channel_peaks) if channel_peaks is not None else 0
+        file.write(RECORD.pack(sample.timestamp, sample.peak, sample.volume,
+                               NAN if sample.rms is None else sample.rms, count))
+        if count:
+            file.write(_CHANNELS[count].pack(*channel_peaks))
+        self.samples += 1
+        self.size += RECORD.size + 4 * count
+        if self.max_bytes is not None and self.size >= self.max_bytes:
+            self.logger.warning(f"采样轨迹达到大小上限 {self.max_bytes / 1024 / 1024:.0f} MB，停止录制")
+            self.close()
+
+    def close(self):
+        file, self.file = self.file, None
+        if file is not None:
+            file.close()
+            self.logger.info(f"采样轨迹已保存: {self.path} ({self.samples} 个采样)")
+
+
+def read_trace(path):
+    """读取轨迹文件，返回 (Unix 时间与单调时钟的差, AudioSample 迭代器)
+
+    文件末尾不完整的记录（例如录制中途断电）会被忽略。
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"不是采样轨迹文件: {path}")
+    magic, version, _, wall_offset = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"不是采样轨迹文件: {path}")
+    return wall_offset, _iter_samples(data, HEADER.size)
+
+
+def _iter_samples(data, offset):
+    end = len(data)
+    record_size = RECORD.size
+    unpack = RECORD.unpack_from
+    while offset + record_size <= end:
+        timestamp, peak, volume, rms, count = unpack(data, offset)
+        offset += record_size
+        channel_peaks = None
+        if count:
+            channels = _CHANNELS[count]
+            if offset + channels.size > end:
+                return
+            channel_peaks = list(channels.unpack_from(data, offset))
+            offset += channels.size
+        yield AudioSample(peak, volume, timestamp, None if rms != rms else rms, channel_peaks)
+
+
+def replay(samples, config, closed_loop=True):
+    """用虚拟时钟把采样送入分析器和工作类，返回统计和每个采样的轨迹
+
+    Args:
+        samples: AudioSample 序列（例如 read_trace 的结果）
+        config: 配置（不会被修改；回放中不使用音量渐变，音量同步写入）
+        closed_loop: True 时音量由控制器决定（从轨迹的初始音量开始），
+            False 时使用录制时的音量（只复现分析器的判断）
+
+    Returns:
+        dict: ticks, duration, adjustments, events, out_of_band, volume_writes,
+            elapsed（回放耗时）, speed（相对实时的倍数）, trajectory [(时间, 输出响度, 音量, 状态), ...]
+    """
+    from utils.audio_backend import FakeBackend
+    from utils.audio_analyzer import AudioAnalyzer
+    from utils.volume_controller import VolumeController
+    from utils.engine import OfficeGuardianWorker
+    from utils.metrics import MetricsRegistry
+
+    samples = iter(samples)
+    first = next(samples, None)
+    if first is None:
+        return {'ticks': 0, 'duration': 0.0, 'adjustments': 0, 'events': {'over_max': 0, 'under_min': 0},
+                'out_of_band': {'over_max': 0.0, 'under_min': 0.0}, 'volume_writes': 0,
+                'elapsed': 0.0, 'speed': 0.0, 'trajectory': []}
+
+    now = [first.timestamp]
+    # 回放中同步写入音量；结束后恢复调用方的设置（可能是程序正在使用的配置）
+    volume_ramp = config.volume_ramp
+    config.volume_ramp = False
+    try:
+        backend = FakeBackend(volume=first.volume)
+        # 回放的指标记在独立的注册表中，不计入程序导出的指标
+        registry = MetricsRegistry()
+        controller = VolumeController(config, backend, clock=lambda: now[0], registry=registry)
+        analyzer = AudioAnalyzer(config, backend, registry=registry)
+        worker = OfficeGuardianWorker(analyzer, controller, config)
+        worker.running = True
+        events = {'over_max': 0, 'under_min': 0}
+
+        def on_event(event_type, current_db):
+            events[event_type] += 1
+            worker.on_audio_event(event_type, current_db)
+
+        analyzer.callback = on_event
+        analyzer.kernel.reset(first.timestamp)
+        out_of_band = {'over_max': 0.0, 'under_min': 0.0}
+        trajectory = []
+        previous = first.timestamp
+        process_tick = analyzer.process_tick
+        start = time.perf_counter()
+        for sample in itertools.chain((first,), samples):
+            now[0] = sample.timestamp
+            if closed_loop:
+                sample = sample._replace(volume=backend.volume)
+            else:
+                backend.volume = sample.volume
+            process_tick(sample)
+            snapshot = analyzer.snapshot
+            if snapshot.state in out_of_band:
+                out_of_band[snapshot.state] += sample.timestamp - previous
+            previous = sample.timestamp
+            trajectory.append((sample.timestamp, snapshot.current_db, snapshot.volume, snapshot.state))
+        elapsed = time.perf_counter() - start
+        # 同一个配置可能被反复用于回放（参数调优），不保留对本次分析器的引用
+        config.unsubscribe(analyzer._on_config_changed)
+    finally:
+        config.volume_ramp = volume_ramp
+
+    duration = trajectory[-1][0] - first.timestamp
+    return {
+        'ticks': len(trajectory),
+        'duration': duration,
+        'adjustments': controller.adjust_count,
+        'events': events,
+        'out_of_band': out_of_band,
+        'volume_writes': backend.volume_writes,
+        'elapsed': elapsed,
+        'speed': duration / elapsed if elapsed > 0 else 0.0,
+        'trajectory': trajectory,
+    }
+
+
+def main(argv=None):
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description='办公室的大盾 - 采样轨迹回放')
+    parser.add_argument('cmd', choices=['info', 'replay'])
+    parser.add_argument('file', help='轨迹文件')
+    parser.add_argument('--set', nargs='*', default=[], metavar='KEY=VALUE', help='覆盖配置项（不会保存）')
+    parser.add_argument('--open-loop', action='store_true', help='使用录制时的音量，不由控制器调节')
+    parser.add_argument('--csv', default=None, help='把每个采样的回放结果写入 CSV 文件')
+    args = parser.parse_args(argv)
+
+    try:
+        wall_offset, samples = read_trace(args.file)
+    except (OSError, ValueError) as e:
+        print(f"无法读取轨迹文件: {e}")
+        return 1
+
+    if args.cmd == 'info':
+        samples = list(samples)
+        if not samples:
+            print("轨迹为空")
+            return 0
+        started = samples[0].timestamp + wall_offset
+        duration = samples[-1].timestamp - samples[0].timestamp
+        channels = max(len(s.channel_peaks) if s.channel_peaks else 0 for s in samples)
+        print(f"开始时间 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started))}, "
+              f"时长 {duration:.1f}s, {len(samples)} 个采样 ({len(samples) / max(duration, 1e-9):.1f}Hz), "
+              f"声道数 {channels}, RMS {'有' if any(s.rms is not None for s in samples) else '无'}")
+        return 0
+
+    # 使用程序目录下的当前配置，命令行覆盖的配置项只在本次回放中生效
+    from utils.config import Config
+    config = Config(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for item in args.set:
+        key, _, value = item.partition('=')
+        if key not in config.DEFAULT_CONFIG:
+            print(f"未知配置项: {key}")
+            return 1
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+        setattr(config, key, value)
+    logging.getLogger('OfficeGuardian').setLevel(logging.WARNING)
+
+    result = replay(samples, config, closed_loop=not args.open_loop)
+    print(f"回放 {result['ticks']} 个采样, 时长 {result['duration']:.1f}s, "
+          f"耗时 {result['elapsed'] * 1000:.0f} ms ({result['speed']:.0f}x 实时)")
+    print(f"  事件: 过响 {result['events']['over_max']} 次, 过轻 {result['events']['under_min']} 次; "
+          f"音量调整 {result['adjustments']} 次, 写入 {result['volume_writes']} 次")
+    print(f"  超出范围: 过响 {result['out_of_band']['over_max']:.1f}s, "
+          f"过轻 {result['out_of_band']['under_min']:.1f}s")
+    if args.csv:
+        with open(args.csv, 'w') as f:
+            f.write('time,output_db,volume,state\n')
+            for timestamp, db, volume, state in result['trajectory']:
+                f.write(f"{timestamp:.3f},{db:.2f},{volume:.4f},{state}\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""参数调优：在录制的采样轨迹上搜索控制参数
+
+每组参数用 utils.trace.replay 在所有轨迹上回放（与程序运行时相同的分析器判断和
+adjust_volume_for_db 调节），按目标响度范围评分，多进程并行，输出排名表和可直接使用的配置文件。
+
+评分（越低越好，只统计有音频的时间）:
+    超出目标范围的时间百分比
+    + overshoot_weight × 平均越界幅度（dB，过响和过轻都计入）
+    + adjustment_weight × 每小时音量调整次数
+
+目标范围默认取当前配置的 max_db / min_db，与被调优的阈值无关，避免通过放宽阈值“刷分”。
+
+用法:
+    python -m utils.tuner traces/ --random 200
+    python -m utils.tuner traces/ --grid interval_max=1,2,3 volume_change_k=0.1,0.2,0.3
+"""
+import os
+import sys
+import json
+import random
+import logging
+import tempfile
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+# 默认的搜索范围（随机搜索时在范围内均匀取值，整数范围取整数）
+DEFAULT_SPACE = {
+    'interval_max': (1, 5),
+    'interval_min': (2, 15),
+    'volume_change_k': (0.1, 0.4),
+    'max_db': (-16.0, -6.0),
+    'min_db': (-45.0, -30.0),
+}
+
+# 工作进程中的轨迹和配置（由 _init_worker 加载，每个进程只读一次）
+_traces = None
+_config = None
+_base = None
+
+
+def load_traces(directory):
+    """目录下的所有轨迹文件路径（按文件名排序）"""
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith('.ogtrace'))
+
+
+def _init_worker(paths, base, config_dir):
+    global _traces, _config, _base
+    from utils.config import Config
+    from utils.trace import read_trace
+
+    logging.getLogger('OfficeGuardian').setLevel(logging.WARNING)
+    _traces = [list(read_trace(path)[1]) for path in paths]
+    # 回放只读取配置属性，不保存；使用主进程的临时目录避免碰到程序的配置文件
+    _config = Config(config_dir)
+    _base = base
+
+
+def score_trajectory(trajectory, target_max, target_min):
+    """统计有音频的时长、超出目标范围的时长和越界幅度（dB·秒）"""
+    playing = 0.0
+    outside = 0.0
+    overshoot = 0.0
+    previous = None
+    for timestamp, db, _, state in trajectory:
+        dt = timestamp - previous if previous is not None else 0.0
+        previous = timestamp
+        if state == 'silent':
+            continue
+        playing += dt
+        if db > target_max:
+            outside += dt
+            overshoot += (db - target_max) * dt
+        elif db < target_min:
+            outside += dt
+            overshoot += (target_min - db) * dt
+    return playing, outside, overshoot
+
+
+def evaluate(params, target_max, target_min, overshoot_weight=5.0, adjustment_weight=0.1):
+    """在工作进程中用一组参数回放所有轨迹，返回 (评分, 参数, 统计)"""
+    from utils.trace import replay
+
+    playing = outside = overshoot = duration = 0.0
+    adjustments = 0
+    for samples in _traces:
+        for key, value in _base.items():
+            setattr(_config, key, value)
+        for key, value in params.items():
+            setattr(_config, key, value)
+        result = replay(samples, _config)
+        p, o, s = score_trajectory(result['trajectory'], target_max, target_min)
+        playing += p
+        outside += o
+        overshoot += s
+        duration += result['duration']
+        adjustments += result['adjustments']
+
+    stats = {
+        'out_of_band': outside / playing * 100 if playing else 0.0,
+        'overshoot': overshoot / playing if playing else 0.0,
+        'adjustments_per_hour': adjustments / duration * 3600 if duration else 0.0,
+        'playing': playing,
+    }
+    score = (stats['out_of_band'] + overshoot_weight * stats['overshoot']
+             + adjustment_weight * stats['adjustments_per_hour'])
+    return score, params, stats
+
+
+def grid_candidates(grid):
+    """网格搜索：grid 为 {配置项: [取值, ...]}"""
+    keys = list(grid)
+    for values in itertools.product(*(grid[key] for key in keys)):
+        yield dict(zip(keys, values))
+
+
+def random_candidates(space, count, seed=0):
+    """随机搜索：space 为 {配置项: (下限, 上限)}，整数上下限时取整数"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        params = {}
+        for key, (low, high) in space.items():
+            if isinstance(low, int) and isinstance(high, int):
+                params[key] = rng.randint(low, high)
+            else:
+                params[key] = round(rng.uniform(low, high), 3)
+        if 'max_db' in params and 'min_db' in params and params['min_db'] >= params['max_db']:
+            continue
+        yield params
+
+
+def tune(paths, candidates, base, target_max, target_min, workers=None,
+         overshoot_weight=5.0, adjustment_weight=0.1):
+    """并行评估所有候选参数，返回按评分排序的 [(评分, 参数, 统计), ...]
+
+    第一个候选固定为当前配置（空参数），便于对比。
+    """
+    candidates = [{}] + list(candidates)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(candidates) // (workers * 4))
+    # 各工作进程共用的配置目录，由主进程在结束后删除
+    with tempfile.TemporaryDirectory(prefix='og-tuner-') as config_dir, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(paths, base, config_dir)) as executor:
+        results = list(executor.map(
+            evaluate, candidates, itertools.repeat(target_max), itertools.repeat(target_min),
+            itertools.repeat(overshoot_weight), itertools.repeat(adjustment_weight),
+            chunksize=chunksize))
+    results.sort(key=lambda result: result[0])
+    return results
+
+
+def _parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(argv=None):
+    import time
+    import argparse
+    parser = argparse.ArgumentParser(description='办公室的大盾 - 在录制的采样轨迹上调优控制参数')
+    parser.add_argument('traces', help='轨迹文件目录（*.ogtrace）')
+    parser.add_argument('--grid', nargs='*', default=None, metavar='KEY=V1,V2,...', help='网格搜索')
+    parser.add_argument('--random', type=int, default=100, help='随机搜索的候选数（未指定 --grid 时）')
+    parser.add_argument('--range', nargs='*', default=[], metavar='KEY=LOW:HIGH', help='修改随机搜索的范围')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--target-max', type=float, default=None, help='评分用的目标上限（默认为当前 max_db）')
+    parser.add_argument('--target-min', type=float, default=None, help='评分用的目标下限（默认为当前 min_db）')
+    parser.add_argument('--overshoot-weight', type=float, default=5.0, help='平均越界幅度（dB）的权重')
+    parser.add_argument('--adjustment-weight', type=float, default=0.1, help='每小时调整次数的权重')
+    parser.add_argument('--workers', type=int, default=None, help='进程数（默认为 CPU 核数）')
+    parser.add_argument('--top', type=int, default=15, help='显示前几名')
+    parser.add_argument('--output', default='tuned_config.json', help='最佳参数合并到当前配置后写入的文件')
+    args = parser.parse_args(argv)
+
+    paths = load_traces(args.traces) if os.path.isdir(args.traces) else []
+    if not paths:
+        print(f"没有找到轨迹文件: {args.traces}")
+        return 1
+
+    from utils.config import Config
+    config = Config(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    base = {key: getattr(config, key) for key in config.DEFAULT_CONFIG}
+    target_max = args.target_max if args.target_max is not None else config.max_db
+    target_min = args.target_min if args.target_min is not None else config.min_db
+
+    if args.grid:
+        grid = {}
+        for item in args.grid:
+            key, _, values = item.partition('=')
+            grid[key] = [_parse_value(value) for value in values.split(',')]
+        candidates = list(grid_candidates(grid))
+    else:
+        space = dict(DEFAULT_SPACE)
+        for item in args.range:
+            key, _, bounds = item.partition('=')
+            low, _, high = bounds.partition(':')
+            space[key] = (_parse_value(low), _parse_value(high))
+        candidates = list(random_candidates(space, args.random, args.seed))
+    unknown = {key for params in candidates for key in params} - set(config.DEFAULT_CONFIG)
+    if unknown:
+        print(f"未知配置项: {', '.join(sorted(unknown))}")
+        return 1
+
+    print(f"{len(paths)} 个轨迹, {len(candidates)} 组候选参数 + 当前配置, "
+          f"目标范围 {target_min:.1f} ~ {target_max:.1f} dB")
+    start = time.perf_counter()
+    results = tune(paths, candidates, base, target_max, target_min, args.workers,
+                   args.overshoot_weight, args.adjustment_weight)
+    print(f"耗时 {time.perf_counter() - start:.1f}s")
+
+    print(f"{'排名':>4} {'评分':>8} {'超出范围':>8} {'越界(dB)':>8} {'调整/小时':>9}  参数")
+    for rank, (score, params, stats) in enumerate(results[:args.top], 1):
+        text = ', '.join(f"{key}={value}" for key, value in params.items()) or '(当前配置)'
+        print(f"{rank:4d} {score:8.2f} {stats['out_of_band']:7.1f}% {stats['overshoot']:8.2f} "
+              f"{stats['adjustments_per_hour']:9.1f}  {text}")
+    current = next(i for i, result in enumerate(results) if not result[1])
+    print(f"当前配置排名第 {current + 1}（评分 {results[current][0]:.2f}）")
+
+    best = dict(base)
+    best.update(results[0][1])
+    with open(args.output, 'w') as f:
+        json.dump(best, f, indent=4)
+    print(f"最佳参数已合并到当前配置并写入 {args.output}（复制到 config/config.json 即可使用）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
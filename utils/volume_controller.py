@@ -1,53 +1,234 @@
+import math
+import time
 import logging
-import platform
-from ctypes import cast, POINTER
+import threading
+from utils.audio_backend import PycawBackend
+from utils.metrics import REGISTRY
 
-# Windows音量控制
-if platform.system() == 'Windows':
-    from comtypes import CLSCTX_ALL
-    from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+# 音量修正量（分贝）直方图的分桶
+CORRECTION_BUCKETS = (0.5, 1.0, 2.0, 3.0, 6.0, 10.0, 20.0, 40.0)
+
+
+class PIController:
+    """分贝域的PI音量控制器（速度形式），带输出限幅
+
+    被控对象近似为 输出响度 = 原始响度 + 20*log10(音量)，因此控制量取音量的分贝值。
+    当前音量已经包含此前所有的修正，所以每次只计算增益的变化量：
+    kp * (误差 - 上次误差) + ki * 误差 * period。比例项只响应误差的变化，
+    误差的累积只由积分项完成，不会出现两重积分。调整由越界事件触发、间隔不固定，
+    积分按每次调整一个采样周期 period 秒计算。
+
+    新的调整过程（复位后或两次调整间隔过长）的上次误差按 0 计，第一次调整补偿
+    (kp + ki * period) 倍的误差。状态只有上次误差，输出被限幅时没有需要释放的积分。
+
+    Args:
+        kp: 比例系数（作用于误差的变化）
+        ki: 积分系数（1/秒）
+        period: 每次调整对应的采样周期（秒）
+        min_volume: 输出音量下限
+        max_volume: 输出音量上限
+        margin: 目标值向响度范围内侧收缩的分贝数，避免停在边界上反复触发
+    """
+
+    # 两次调整间隔超过该时长（秒）时视为新的调整过程
+    INTEGRAL_RESET = 30.0
+
+    def __init__(self, kp=0.2, ki=0.25, period=3.0, min_volume=0.01, max_volume=1.0, margin=1.0):
+        self.kp = kp
+        self.ki = ki
+        self.period = period
+        self.min_volume = min_volume
+        self.max_volume = max_volume
+        self.margin = margin
+        self.reset()
+
+    def reset(self):
+        """清空历史，下一次调整视为新的调整过程"""
+        self.last_error = None
+        self.last_time = None
+
+    def update(self, error_db, now, volume):
+        """根据误差（目标 - 当前，dB）计算新的音量"""
+        if error_db > 0:
+            error_db += self.margin
+        elif error_db < 0:
+            error_db -= self.margin
+
+        last_error = self.last_error
+        if last_error is None or now - self.last_time > self.INTEGRAL_RESET:
+            last_error = 0.0
+        self.last_time = now
+        self.last_error = error_db
+
+        gain_db = 20 * math.log10(max(volume, self.min_volume))
+        gain_db += self.kp * (error_db - last_error) + self.ki * error_db * self.period
+        new_volume = 10 ** (gain_db / 20)
+        if new_volume > self.max_volume:
+            return self.max_volume
+        if new_volume < self.min_volume:
+            return self.min_volume
+        return new_volume
+
+
+class VolumeActuator:
+    """异步音量执行器
+
+    在独立线程中把音量以小步长渐变到目标值。新目标会覆盖尚未完成的旧目标（只保留最新的），
+    数值不变时不写入，调用方不会因音量写入而阻塞。
+
+    Args:
+        backend: 音频后端
+        step: 每步最大音量变化
+        interval: 两步之间的间隔（秒）
+        on_change: 每次写入后的回调 on_change(volume)
+        registry: 指标注册表
+    """
+
+    def __init__(self, backend, step=0.01, interval=0.02, on_change=None, registry=REGISTRY):
+        self.logger = logging.getLogger('OfficeGuardian.VolumeActuator')
+        self.backend = backend
+        self.step = step
+        self.interval = interval
+        self.on_change = on_change
+        self.condition = threading.Condition()
+        self.target = None
+        self.running = False
+        self.thread = None
+        self.writes = 0
+        self.dropped = 0
+        self.m_writes = registry.counter('og_volume_writes_total', '写入系统音量的次数', path='ramp')
+        self.m_write_seconds = registry.histogram('og_backend_write_seconds', '写入系统音量（COM调用）的耗时')
+
+    def start(self):
+        """启动执行线程"""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止执行线程（未完成的目标会被丢弃）"""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+
+    def request(self, volume_level):
+        """提交目标音量，覆盖尚未完成的旧目标"""
+        if not self.running:
+            self.start()
+        with self.condition:
+            if self.target is not None:
+                self.dropped += 1
+            self.target = volume_level
+            self.condition.notify()
+
+    def cancel(self):
+        """丢弃尚未完成的目标（例如切换设备后，旧设备的目标不再适用）"""
+        with self.condition:
+            if self.target is not None:
+                self.dropped += 1
+                self.target = None
+            self.condition.notify()
+
+    def pending_target(self):
+        """尚未完成的目标音量，没有时返回 None"""
+        return self.target
+
+    def _run(self):
+        # 渐变过程中的当前音量；空闲后重新从后端读取，以便感知用户手动调节
+        current = None
+        while True:
+            with self.condition:
+                while self.running and self.target is None:
+                    current = None
+                    self.condition.wait()
+                if not self.running:
+                    return
+                target = self.target
+
+            try:
+                if current is None:
+                    current = self.backend.get_volume()
+                diff = target - current
+                if abs(diff) < 0.0005:
+                    # 已到达目标，清除目标（除非期间又提交了新目标）
+                    with self.condition:
+                        if self.target == target:
+                            self.target = None
+                    continue
+
+                current += max(-self.step, min(self.step, diff))
+                started = time.perf_counter()
+                self.backend.set_volume(current)
+                self.m_write_seconds.observe(time.perf_counter() - started)
+                self.m_writes.inc()
+                self.writes += 1
+                if self.on_change:
+                    self.on_change(current)
+            except Exception as e:
+                self.logger.error("设置音量失败: %s", e)
+                with self.condition:
+                    if self.target == target:
+                        self.target = None
+                current = None
+                continue
+
+            with self.condition:
+                if self.running:
+                    self.condition.wait(self.interval)
 
 
 class VolumeController:
-    """控制系统音量"""
+    """控制系统音量
+
+    Args:
+        config: 配置
+        backend: 音频后端，默认使用 pycaw
+        clock: 时钟（回放时为虚拟时钟）
+        registry: 指标注册表；离线使用时传入独立的注册表
+    """
 
-    def __init__(self, config):
+    def __init__(self, config, backend=None, clock=time.monotonic, registry=REGISTRY):
         self.config = config
+        self.registry = registry
         self.logger = logging.getLogger('OfficeGuardian.VolumeController')
-        self.os_type = platform.system()
+        self.clock = clock
         self.current_volume = 0
+        # PI控制器（control_mode 为 pi 时使用）及上次调整时间
+        self.pi = PIController()
+        self.last_adjust_time = None
+        self.adjust_count = 0
+        self.m_adjustments = {
+            mode: registry.counter('og_volume_adjustments_total', '音量调整次数', mode=mode)
+            for mode in ('step', 'pi')}
+        self.m_correction_db = registry.histogram(
+            'og_volume_correction_db', '每次调整时响度与目标的差（分贝，绝对值）', CORRECTION_BUCKETS)
+        self.m_writes = registry.counter('og_volume_writes_total', '写入系统音量的次数', path='direct')
+        self.m_requests = registry.counter('og_volume_requests_total', '提交给渐变执行器的目标音量数')
+        self.m_write_seconds = registry.histogram('og_backend_write_seconds', '写入系统音量（COM调用）的耗时')
+        # 异步音量执行器（volume_ramp 启用时音量写入在独立线程中渐变完成）
+        self.actuator = None
         self.device_id = config.device_id
-        self.volume = None
+        # 音频后端，默认使用 pycaw
+        self.backend = backend if backend is not None else PycawBackend()
         self._initialize_volume_controller()
 
     def _initialize_volume_controller(self):
         """初始化音量控制接口"""
         try:
-            if self.os_type == 'Windows':
-                if self.device_id is None:
-                    # 使用默认设备
-                    speakers = AudioUtilities.GetSpeakers()
-                    self.logger.debug("使用默认音频设备")
-                else:
-                    # 尝试找到指定ID的设备
-                    device_enumerator = AudioUtilities.GetDeviceEnumerator()
-                    try:
-                        speakers = device_enumerator.GetDevice(self.device_id)
-                        self.logger.debug(f"使用设备ID: {self.device_id}")
-                    except Exception as e:
-                        self.logger.warning(
-                            f"找不到指定设备({self.device_id})，使用默认设备: {e}")
-                        speakers = AudioUtilities.GetSpeakers()
-
-                interface = speakers.Activate(
-                    IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-                self.volume = cast(interface, POINTER(IAudioEndpointVolume))
-                self.current_volume = self.volume.GetMasterVolumeLevelScalar()
-                self.device_id = speakers.GetId()  # 更新设备ID
-                self.logger.debug("音量控制接口初始化成功")
-            else:
-                self.logger.error(f"不支持的操作系统: {self.os_type}")
-                raise NotImplementedError(f"不支持的操作系统: {self.os_type}")
+            self.device_id = self.backend.open(self.device_id)
+            if not self.backend.is_ready():
+                raise RuntimeError(f"音频后端不可用: {self.backend.name}")
+            self.current_volume = self.backend.get_volume()
+            if self.config.volume_ramp and self.actuator is None:
+                self.actuator = VolumeActuator(
+                    self.backend, step=self.config.ramp_step, interval=self.config.ramp_interval,
+                    registry=self.registry)
+            self.logger.debug("音量控制接口初始化成功")
         except Exception as e:
             self.logger.error(f"初始化音量控制失败: {e}")
             raise
@@ -61,18 +242,27 @@ class VolumeController:
             self._initialize_volume_controller()
             self.logger.info(f"已切换到设备: {device_id}")
 
+    def on_device_changed(self, device_id):
+        """设备中心切换设备后的回调（后端已切换）"""
+        self.device_id = device_id
+        self.pi.reset()
+        self.last_adjust_time = None
+        # 旧设备尚未完成的渐变目标不能继续作用在新设备上
+        if self.actuator is not None:
+            self.actuator.cancel()
+        self.logger.info(f"已切换到设备: {device_id}")
+
     def get_volume(self):
         """获取当前系统音量 (0.0 到 1.0)"""
         try:
-            if self.os_type == 'Windows':
-                self.current_volume = self.volume.GetMasterVolumeLevelScalar()
-                # 特殊情况：当音量小于0.8%时，将音量调整为1%
-                if self.current_volume < 0.008:
-                    self.set_volume(0.01)
-                    self.logger.warning("音量过低，自动调整至1%")
-                return self.current_volume
+            self.current_volume = self.backend.get_volume()
+            # 特殊情况：当音量小于0.8%时，将音量调整为1%
+            if self.current_volume < 0.008:
+                self.set_volume(0.01)
+                self.logger.warning("音量过低，自动调整至1%")
+            return self.current_volume
         except Exception as e:
-            self.logger.error(f"获取音量失败: {e}")
+            self.logger.error("获取音量失败: %s", e)
             return 0.0
 
     def set_volume(self, volume_level):
@@ -86,14 +276,34 @@ class VolumeController:
         volume_level = max(0.0, min(1.0, volume_level))
 
         try:
-            if self.os_type == 'Windows':
-                self.volume.SetMasterVolumeLevelScalar(volume_level, None)
-                self.current_volume = volume_level
-                self.logger.info(f"系统音量已设置为: {volume_level:.2f}")
+            # 与当前音量（或尚未完成的目标）相同时不写入
+            if abs(volume_level - self.get_target_volume()) < 0.0005:
+                return
+            if self.actuator is not None:
+                self.actuator.request(volume_level)
+                self.m_requests.inc()
             else:
-                self.logger.error(f"不支持的操作系统: {self.os_type}")
+                started = time.perf_counter()
+                self.backend.set_volume(volume_level)
+                self.m_write_seconds.observe(time.perf_counter() - started)
+                self.m_writes.inc()
+            self.current_volume = volume_level
+            self.logger.info("系统音量已设置为: %.2f", volume_level)
         except Exception as e:
-            self.logger.error(f"设置音量失败: {e}")
+            self.logger.error("设置音量失败: %s", e)
+
+    def get_target_volume(self):
+        """获取目标音量：渐变尚未完成时返回目标值，否则返回当前音量"""
+        if self.actuator is not None:
+            target = self.actuator.pending_target()
+            if target is not None:
+                return target
+        return self.backend.get_volume()
+
+    def close(self):
+        """停止异步音量执行器"""
+        if self.actuator is not None:
+            self.actuator.stop()
 
     def increase_volume(self):
         """增加系统音量"""
@@ -115,6 +325,9 @@ class VolumeController:
             current_db: 当前音频输出的分贝值
             target_db: 目标分贝值
         """
+        if self.config.control_mode == 'pi':
+            return self._adjust_volume_pi(current_db, target_db)
+
         # 简单线性调整 - 可以根据实际情况优化算法
         db_diff = target_db - current_db
 
@@ -127,13 +340,42 @@ class VolumeController:
         volume_change = (db_diff / 20.0) * \
             self.config.volume_change_k  # 简单比例关系，需要调整
 
-        # 获取当前音量并应用变化
-        current_volume = self.get_volume()
-        new_volume = current_volume + volume_change
+        # 获取当前音量（渐变未完成时以目标值为准）并应用变化
+        current_volume = self.get_target_volume()
+        # 与 PI 模式相同的下限：音量不会被调到 0（原先由 get_volume 把低于 0.8% 的音量恢复到 1%）
+        new_volume = min(self.pi.max_volume, max(self.pi.min_volume, current_volume + volume_change))
 
         # 应用新的音量
         self.set_volume(new_volume)
+        self.adjust_count += 1
+        self.m_adjustments['step'].inc()
+        self.m_correction_db.observe(abs(db_diff))
         self.logger.info(
-            f"调整音量: 当前 {current_db:.2f}dB, 目标 {target_db:.2f}dB, 音量从 {current_volume:.2f} 调整到 {new_volume:.2f}")
+            "调整音量: 当前 %.2fdB, 目标 %.2fdB, 音量从 %.2f 调整到 %.2f",
+            current_db, target_db, current_volume, new_volume)
+
+        return new_volume
 
+    def _adjust_volume_pi(self, current_db, target_db):
+        """PI控制模式：每次调整后等待 settle_time 秒，让平均响度反映新的音量"""
+        now = self.clock()
+        current_volume = self.get_target_volume()
+        if self.last_adjust_time is not None and now - self.last_adjust_time < self.config.settle_time:
+            return current_volume
+
+        self.pi.kp = self.config.pi_kp
+        self.pi.ki = self.config.pi_ki
+        self.pi.period = self.config.settle_time
+        new_volume = self.pi.update(target_db - current_db, now, current_volume)
+        if abs(new_volume - current_volume) < 0.005:
+            return current_volume
+
+        self.set_volume(new_volume)
+        self.last_adjust_time = now
+        self.adjust_count += 1
+        self.m_adjustments['pi'].inc()
+        self.m_correction_db.observe(abs(target_db - current_db))
+        self.logger.info(
+            "PI调整音量: 当前 %.2fdB, 目标 %.2fdB, 音量从 %.2f 调整到 %.2f",
+            current_db, target_db, current_volume, new_volume)
         return new_volume